@@ -0,0 +1,103 @@
+"""Benchmark of the compiled XPath queries of
+:py:mod:`freeports_analysis.formats_utils.pdf_filter.xml.font` against the same
+queries compiled at each call (``xpath()`` on the element), on the ``xml``
+rappresentation of the pages of the test reports (the one used by the unit tests
+and by the notebooks). The header text and the fonts queried are the ones of the
+`FilterPlan` of each format.
+
+Usage:
+    ```python devtools/bench_xml_queries.py [FORMAT ...]```
+"""
+
+import sys
+import importlib
+import timeit
+from pathlib import Path
+import pymupdf as pypdf
+from lxml import etree
+from freeports_analysis.formats_utils.pdf_filter.xml import font
+
+DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+REPEAT = 20
+NUMBER = 10
+
+
+def _uncached_lines_with_fonts(tree, fonts):
+    conditions = " or ".join(f"font[@name=$font{i}]" for i in range(len(fonts)))
+    return tree.xpath(
+        f"./descendant-or-self::line[{conditions}]",
+        **{f"font{i}": f for i, f in enumerate(sorted(fonts))},
+    )
+
+
+def _uncached_lines_with_txt_font(tree, txt, font_name):
+    return tree.xpath(
+        "./descendant-or-self::line[contains(@text, $txt) and font[@name=$font]]",
+        txt=txt,
+        font=font_name,
+    )
+
+
+def _uncached_line_fonts(lines):
+    return [line.xpath(".//font/@name") for line in lines]
+
+
+def _compiled_line_fonts(lines):
+    return [font.FONT_NAMES(line) for line in lines]
+
+
+def _time(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def bench_format(fmt: str) -> None:
+    module = importlib.import_module(f"freeports_analysis.formats.{fmt.lower()}")
+    plan = getattr(module.pdf_filter, "plan", None)
+    if plan is None:
+        print(f"{fmt:<14} no standard filter plan, skipped")
+        return
+    pdf = pypdf.Document(DATA_DIR / fmt / "report.pdf")
+    pages = sorted(
+        int(p.stem.split("-")[1]) for p in (DATA_DIR / fmt).glob("pdf_blks-*.pkl")
+    )
+    parser = etree.XMLParser(recover=True)
+    for page in pages:
+        xml_str = pdf[page].get_text("xml")
+        tree = etree.fromstring(xml_str.encode(), parser=parser)
+        lines = font.get_lines_with_font(tree, plan.body_fonts)
+        assert lines == _uncached_lines_with_fonts(tree, plan.body_fonts)
+        queries = {
+            "lines with fonts": (
+                lambda: font.get_lines_with_font(tree, plan.body_fonts),
+                lambda: _uncached_lines_with_fonts(tree, plan.body_fonts),
+            ),
+            "lines with text": (
+                lambda: font.get_lines_with_txt_font(
+                    tree, plan.header_txt, plan.header_font, all_elem=True
+                ),
+                lambda: _uncached_lines_with_txt_font(
+                    tree, plan.header_txt, plan.header_font
+                ),
+            ),
+            "fonts of lines": (
+                lambda: _compiled_line_fonts(lines),
+                lambda: _uncached_line_fonts(lines),
+            ),
+        }
+        for name, (compiled, uncached) in queries.items():
+            compiled_s = _time(compiled)
+            uncached_s = _time(uncached)
+            print(
+                f"{fmt:<14} page {page:>4} {name:<17}: "
+                f"compiled {compiled_s * 1000:8.3f} ms, "
+                f"uncached {uncached_s * 1000:8.3f} ms "
+                f"(x{uncached_s / compiled_s:.2f})"
+            )
+
+
+if __name__ == "__main__":
+    formats = sys.argv[1:] or [
+        p.name for p in sorted(DATA_DIR.iterdir()) if (p / "report.pdf").exists()
+    ]
+    for fmt in formats:
+        bench_format(fmt)
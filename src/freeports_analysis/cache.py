@@ -0,0 +1,353 @@
+"""On-disk cache of the results of the pipeline on the batches of pages of the reports.
+
+Each entry is addressed by the content of what produced it: the ``sha256`` of the pdf
+file, the range of pages, the digest of the source code of the format (and of the code
+shared by all the formats) and the digest of the list of targets. Changing the targets
+or a format makes the old entries unreachable, while re-running the same reports
+with the same code reads the results back without extracting any page.
+
+The blocks extracted by `pdf_filter` are stored too, for each document and format, so
+that a change of the targets only requires to replay `text_extract` and `deserialize`,
+and so are the digest and the number of pages of each document (by url, or by path,
+size and modification time), so that a report whose batches are all in the cache is
+neither downloaded nor opened.
+Entries are pickled and compressed with ``zlib`` (the text of the blocks and their
+metadata are very repetitive).
+"""
+
+import os
+import hashlib
+import pickle
+import tempfile
+import zlib
+import logging as log
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import pymupdf as pypdf
+from freeports_analysis.i18n import _
+from freeports_analysis.consts import (
+    _get_module,
+    FinancialData,
+    PromisesResolutionContext,
+)
+from freeports_analysis.formats import PdfBlock
+from freeports_analysis.formats_utils.text_extract.match import TargetSet
+
+logger = log.getLogger(__name__)
+
+_PACKAGE_DIR = Path(__file__).parent
+
+SHARED_SOURCES = [
+    "consts.py",
+    "main.py",
+    "pdf_page.py",
+    "formats/__init__.py",
+    "formats_utils",
+]
+"""Sources (relative to the package) used by the pipeline of every format, part of the
+digest of each format together with the sources of the format itself"""
+
+
+def file_digest(path: Path) -> str:
+    """Compute the ``sha256`` of a file
+
+    Parameters
+    ----------
+    path : Path
+        file to hash
+
+    Returns
+    -------
+    str
+        hexadecimal digest
+    """
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _sources_digest(paths: List[Path]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        files = sorted(path.rglob("*.py")) if path.is_dir() else [path]
+        for source in files:
+            digest.update(source.relative_to(_PACKAGE_DIR).as_posix().encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+@lru_cache
+def format_digest(module_name: str) -> str:
+    """Compute the digest of the code producing the results of a format: the sources
+    of the format module, the ones in `SHARED_SOURCES` and the version of PyMuPDF
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module containing format-specific parsing functions
+
+    Returns
+    -------
+    str
+        hexadecimal digest
+    """
+    module_file = Path(_get_module(module_name).__file__)
+    if module_file.name == "__init__.py":
+        module_file = module_file.parent
+    paths = [_PACKAGE_DIR / s for s in SHARED_SOURCES] + [module_file]
+    return _sources_digest(paths) + pypdf.VersionBind
+
+
+def targets_digest(targets: Iterable[str]) -> str:
+    """Compute the digest of a list of targets (and of their aliases and codes,
+    if a `TargetSet`)
+
+    Parameters
+    ----------
+    targets : Iterable[str]
+        relevant company names
+
+    Returns
+    -------
+    str
+        hexadecimal digest
+    """
+    lines = list(targets)
+    if isinstance(targets, TargetSet):
+        lines += ["\t".join((n, *a)) for n, a in targets.aliases.items()]
+        lines += ["\t".join((n, "#", *c)) for n, c in targets.codes.items()]
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def _load(entry: Path):
+    try:
+        return pickle.loads(zlib.decompress(entry.read_bytes()))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Besides corrupted files, entries written by another version of the
+        # code can refer to classes since renamed or moved: all are misses
+        logger.warning(_("Ignoring unreadable cache entry '%s': %s"), entry, e)
+        return None
+
+
+def _store(entry: Path, obj):
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=entry.parent, suffix=".tmp", delete=False
+        ) as f:
+            f.write(zlib.compress(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(f.name, entry)
+    except OSError as e:
+        logger.warning(_("Cannot write cache entry '%s': %s"), entry, e)
+
+
+class PageCache:
+    """Cache of the results of `pipeline_batch` stored in a directory, safe to be
+    shared by different processes. Besides the results, it stores the blocks
+    extracted by `pdf_filter` from each batch of pages (that do not depend on
+    the targets) in a directory for each document, so that the results for
+    new targets can be obtained replaying only the later stages of the pipeline.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        directory of the cache, created if not existent
+    targets : Iterable[str]
+        relevant company names the results refer to
+    from_blocks : bool, optional
+        if the stored blocks are used even if the format changed since they
+        were extracted, by default `False`
+    """
+
+    def __init__(
+        self, cache_dir: Path, targets: Iterable[str], from_blocks: bool = False
+    ):
+        """Initialize the cache
+
+        Parameters
+        ----------
+        cache_dir : Path
+            directory of the cache, created if not existent
+        targets : Iterable[str]
+            relevant company names the results refer to
+        from_blocks : bool, optional
+            if the stored blocks are used even if the format changed since they
+            were extracted, by default `False`
+        """
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.from_blocks = from_blocks
+        self._targets_digest = targets_digest(targets)
+
+    def _entry(
+        self, pdf_digest: str, start_page: int, end_page: int, module_name: str
+    ) -> Path:
+        key = hashlib.sha256(
+            ":".join(
+                [
+                    pdf_digest,
+                    str(start_page),
+                    str(end_page),
+                    format_digest(module_name),
+                    self._targets_digest,
+                ]
+            ).encode()
+        ).hexdigest()
+        return self.cache_dir / "pages" / key[:2] / f"{key}.pickle"
+
+    def _blocks_entry(
+        self, pdf_digest: str, start_page: int, end_page: int, module_name: str
+    ) -> Path:
+        document_dir = self.cache_dir / "blocks" / pdf_digest / module_name
+        return document_dir / f"{start_page}-{end_page}.pickle"
+
+    def _document_entry(self, document_key: str) -> Path:
+        key = hashlib.sha256(document_key.encode()).hexdigest()
+        return self.cache_dir / "documents" / f"{key}.pickle"
+
+    def get_document(self, document_key: str) -> Optional[Tuple[str, int]]:
+        """Return the digest and the number of pages of a document if stored in
+        the cache, so that a document whose batches are all in the cache is never
+        downloaded or opened
+
+        Parameters
+        ----------
+        document_key : str
+            identity of the document: its url, or its path with its size and
+            modification time
+
+        Returns
+        -------
+        Optional[Tuple[str, int]]
+            ``sha256`` of the pdf file and number of its pages, `None` if not in
+            the cache
+        """
+        return _load(self._document_entry(document_key))
+
+    def put_document(self, document_key: str, pdf_digest: str, n_pages: int):
+        """Store the digest and the number of pages of a document in the cache
+
+        Parameters
+        ----------
+        document_key : str
+            identity of the document: its url, or its path with its size and
+            modification time
+        pdf_digest : str
+            ``sha256`` of the pdf file, as given by `file_digest`
+        n_pages : int
+            number of pages of the document
+        """
+        _store(self._document_entry(document_key), (pdf_digest, n_pages))
+
+    def get(
+        self, pdf_digest: str, start_page: int, end_page: int, module_name: str
+    ) -> Optional[List[FinancialData | PromisesResolutionContext]]:
+        """Return the results of a batch of pages if present in the cache
+
+        Parameters
+        ----------
+        pdf_digest : str
+            ``sha256`` of the pdf file, as given by `file_digest`
+        start_page : int
+            First page of the batch (0-based index)
+        end_page : int
+            Page at which the batch stops (excluded)
+        module_name : str
+            Name of the module containing format-specific parsing functions
+
+        Returns
+        -------
+        Optional[List[FinancialData | PromisesResolutionContext]]
+            results of the batch, `None` if not in the cache
+        """
+        return _load(self._entry(pdf_digest, start_page, end_page, module_name))
+
+    def put(
+        self,
+        pdf_digest: str,
+        start_page: int,
+        end_page: int,
+        module_name: str,
+        results: List[FinancialData | PromisesResolutionContext],
+    ):
+        """Store the results of a batch of pages in the cache
+
+        Parameters
+        ----------
+        pdf_digest : str
+            ``sha256`` of the pdf file, as given by `file_digest`
+        start_page : int
+            First page of the batch (0-based index)
+        end_page : int
+            Page at which the batch stops (excluded)
+        module_name : str
+            Name of the module containing format-specific parsing functions
+        results : List[FinancialData | PromisesResolutionContext]
+            results of the batch
+        """
+        _store(self._entry(pdf_digest, start_page, end_page, module_name), results)
+
+    def get_blocks(
+        self, pdf_digest: str, start_page: int, end_page: int, module_name: str
+    ) -> Optional[Tuple[str, List[PdfBlock]]]:
+        """Return the blocks extracted from a batch of pages if stored in the cache
+        by the same version of the format (or by any version if `from_blocks`),
+        together with the digest of the format that extracted them (see
+        `format_digest`): the results obtained from blocks of another version
+        of the format must not be stored as results of the current one
+
+        Parameters
+        ----------
+        pdf_digest : str
+            ``sha256`` of the pdf file, as given by `file_digest`
+        start_page : int
+            First page of the batch (0-based index)
+        end_page : int
+            Page at which the batch stops (excluded)
+        module_name : str
+            Name of the module containing format-specific parsing functions
+
+        Returns
+        -------
+        Optional[Tuple[str, List[PdfBlock]]]
+            digest of the format that extracted the blocks and blocks of the batch,
+            `None` if not in the cache
+        """
+        entry = _load(self._blocks_entry(pdf_digest, start_page, end_page, module_name))
+        if entry is None:
+            return None
+        digest, _pdf_blocks = entry
+        if self.from_blocks or digest == format_digest(module_name):
+            return entry
+        return None
+
+    def put_blocks(
+        self,
+        pdf_digest: str,
+        start_page: int,
+        end_page: int,
+        module_name: str,
+        pdf_blocks: List[PdfBlock],
+    ):
+        """Store the blocks extracted from a batch of pages in the cache,
+        replacing the ones stored by other versions of the format
+
+        Parameters
+        ----------
+        pdf_digest : str
+            ``sha256`` of the pdf file, as given by `file_digest`
+        start_page : int
+            First page of the batch (0-based index)
+        end_page : int
+            Page at which the batch stops (excluded)
+        module_name : str
+            Name of the module containing format-specific parsing functions
+        pdf_blocks : List[PdfBlock]
+            blocks of the batch
+        """
+        _store(
+            self._blocks_entry(pdf_digest, start_page, end_page, module_name),
+            (format_digest(module_name), pdf_blocks),
+        )
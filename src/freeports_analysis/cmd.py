@@ -67,6 +67,19 @@ def _create_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--config", type=str, help=_("Custom configuration file location")
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help=_("Directory of the cache of the results (by default no cache)"),
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help=_("Don't use the cache of the results")
+    )
+    parser.add_argument(
+        "--from-blocks",
+        action="store_true",
+        help=_("Replay only target matching on the pdf blocks stored in the cache"),
+    )
     out_csv = DEFAULT_CONFIG["OUT_CSV"]
     parser.add_argument(
         "--out",
@@ -126,6 +139,7 @@ def overwrite_with_args(args, config: dict, config_location: dict) -> Tuple[dict
         ("OUT_CSV", args.out, Path),
         ("BATCH", args.batch, Path),
         ("N_WORKERS", args.workers, int),
+        ("CACHE_DIR", args.cache_dir, Path),
     ]:
         config, config_location = _set_str_arg(
             name_conf, value, config, config_location, cast_func
@@ -134,6 +148,12 @@ def overwrite_with_args(args, config: dict, config_location: dict) -> Tuple[dict
     if args.no_download:
         config["SAVE_PDF"] = False
         config_location["SAVE_PDF"] = PossibleLocationConfig.CMD_ARG
+    if args.no_cache:
+        config["CACHE_DIR"] = None
+        config_location["CACHE_DIR"] = PossibleLocationConfig.CMD_ARG
+    if args.from_blocks:
+        config["FROM_BLOCKS"] = True
+        config_location["FROM_BLOCKS"] = PossibleLocationConfig.CMD_ARG
     increase_verbosity = 0
     if args.v is not None:
         increase_verbosity = args.v
@@ -106,6 +106,12 @@ def _find_config():
     return None
 
 
+def _path_or_none(value) -> Path | None:
+    if value is None or str(value).strip() == "":
+        return None
+    return Path(value)
+
+
 DEFAULT_CONFIG = {
     "VERBOSITY": 2,
     # `SEPARATE_OUT_FILES` default to `False` because command line args permits to set only to `True`
@@ -124,6 +130,8 @@ DEFAULT_CONFIG = {
     "PDF": None,
     "FORMAT": None,
     "CONFIG_FILE": _find_config(),
+    "CACHE_DIR": None,
+    "FROM_BLOCKS": False,
 }
 
 
@@ -137,6 +145,8 @@ schema_yaml_config = {
     "out_path": ("OUT_CSV", Path),
     "save_pdf": ("SAVE_PDF", bool),
     "format": ("FORMAT", lambda x: PdfFormats.__members__[x.strip()]),
+    "cache_dir": ("CACHE_DIR", _path_or_none),
+    "from_blocks": ("FROM_BLOCKS", bool),
 }
 
 
@@ -166,6 +176,8 @@ schema_env_config = {
     f"{ENV_PREFIX}FORMAT": ("FORMAT", lambda x: PdfFormats.__members__[x.strip()]),
     f"{ENV_PREFIX}PDF": ("PDF", Path),
     f"{ENV_PREFIX}CONFIG_FILE": ("CONFIG_FILE", Path),
+    f"{ENV_PREFIX}CACHE_DIR": ("CACHE_DIR", _path_or_none),
+    f"{ENV_PREFIX}FROM_BLOCKS": ("FROM_BLOCKS", _str_to_bool),
 }
 
 schema_job_csv_config = {
@@ -323,6 +335,8 @@ def validate_conf(config: dict):
         invalid batch file path
     ValueError
         if in `BATCH MODE` out path has to be directory or `.tar.gz` archive
+    ValueError
+        replaying the stored blocks requires the cache
     """
     verb = config["VERBOSITY"]
     if verb > 5 or verb < 0:
@@ -334,6 +348,10 @@ def validate_conf(config: dict):
         string = _("You have to specify at least one input option: ")
         string += _("the url or the resource, the pdf file path or both")
         raise ValueError(string)
+    if config["FROM_BLOCKS"] and config["CACHE_DIR"] is None:
+        raise ValueError(
+            _("`FROM_BLOCKS` requires `CACHE_DIR`, where the blocks are stored")
+        )
     if not out_path.parent.exists():
         raise ValueError(
             _("Out path is not valid because directory '{}' doesn't exists").format(
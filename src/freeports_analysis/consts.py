@@ -5,7 +5,7 @@ should facilitate avoiding circular imports
 from abc import ABC, abstractmethod
 import datetime
 from enum import Enum, auto
-from typing import List, TypeAlias, Any
+from typing import Collection, TypeAlias, Any
 import logging as log
 import importlib
 
@@ -13,7 +13,6 @@ import yaml
 from importlib_resources import files
 from freeports_analysis import data
 from freeports_analysis.i18n import _
-from freeports_analysis.i18n import _
 
 
 logger = log.getLogger(__name__)
@@ -263,8 +262,9 @@ class FinancialData(ABC):
     ----------
     page : int
         The page number where the financial data appears (must be positive).
-    targets: List[str]
-        The list of companies to search for, used as company validation
+    targets: Collection[str]
+        The companies to search for, used as company validation
+        (a `TargetSet` checks them with a hash set)
     company : str | CompanyPromise
         The name of the company or issuer.
     market_value : float | MarketValuePromise
@@ -292,7 +292,7 @@ class FinancialData(ABC):
     def __init__(
         self,
         page: int,
-        targets: List[str],
+        targets: Collection[str],
         company: str | CompanyPromise,
         subfund: str | SubfundPromise,
         nominal_quantity: int | NominalQuantityPromise,
@@ -375,14 +375,14 @@ class FinancialData(ABC):
                 )
             )
 
-    def _validate_company(self, company: str, targets: List[str]):
+    def _validate_company(self, company: str, targets: Collection[str]):
         if company not in targets:
             raise ValueError(
                 _("company should be between targets, not {}").format(company)
             )
 
     def fulfill_promises(
-        self, mapping: PromisesResolutionMap, targets: List[str]
+        self, mapping: PromisesResolutionMap, targets: Collection[str]
     ) -> None:
         """Resolve all promise objects in this financial data instance.
 
@@ -393,8 +393,8 @@ class FinancialData(ABC):
         ----------
         mapping : PromisesResolutionMap
             Dictionary containing values to resolve promises from.
-        targets : List[str]
-            List of valid company names for validation.
+        targets : Collection[str]
+            Valid company names for validation.
 
         Notes
         -----
@@ -528,7 +528,7 @@ class Bond(FinancialData):
     def __init__(
         self,
         page: int,
-        targets: List[str],
+        targets: Collection[str],
         company: str,
         subfund: str,
         nominal_quantity: int,
@@ -545,8 +545,8 @@ class Bond(FinancialData):
         ----------
         page : int
             The page number where the bond appears.
-        targets: List[str]
-            The list of companies to search for, used as company validation
+        targets: Collection[str]
+            The companies to search for, used as company validation
         company : str
             The issuer of the bond.
         market_value : float
@@ -1,14 +1,17 @@
 """Module common to each format, it contains the definitions used by all the formats"""
 
 from enum import Enum
-from typing import Optional, List, Callable
+from typing import Optional, List, Callable, Iterable
 import logging as log
 from lxml import etree
 from freeports_analysis.consts import FinancialData, PromisesResolutionContext
+from freeports_analysis.pdf_page import PdfPage, PdfLine
 from freeports_analysis.i18n import _
 
 logger = log.getLogger(__name__)
 
+_CHARS = etree.XPath(".//char/@c")
+
 
 class LogFormatterWithPage(log.Formatter):
     """Formatter that inherit the behaviour from
@@ -47,6 +50,27 @@ class LogFormatterWithPage(log.Formatter):
         return string
 
 
+def _page_log_formatter() -> LogFormatterWithPage:
+    """Return the formatter that adds the page number to the records of this module,
+    installing the corresponding handler only the first time it is requested
+    (`pdf_filter_exec` is called once for each batch of pages)
+
+    Returns
+    -------
+    LogFormatterWithPage
+        formatter to update with the page under processing
+    """
+    for handler in logger.handlers:
+        if isinstance(handler.formatter, LogFormatterWithPage):
+            return handler.formatter
+    logger.propagate = False
+    std_err_log = log.StreamHandler()
+    page_format_log = LogFormatterWithPage(logger.parent.handlers[0].formatter)
+    std_err_log.setFormatter(page_format_log)
+    logger.addHandler(std_err_log)
+    return page_format_log
+
+
 def _str_blocks(blk) -> str:
     """Basic function to format both PdfBlock and TextBlock
     for string rappresentation
@@ -73,6 +97,43 @@ def _str_blocks(blk) -> str:
     return text
 
 
+def _line_text(line: etree.Element) -> str:
+    # MuPDF writes the text of the line as attribute, with U+FFFD in place of
+    # the characters it cannot write there: only then the characters are joined
+    text = line.get("text")
+    if text is None or "\ufffd" in text:
+        text = "".join(_CHARS(line))
+    return text
+
+
+def _block_text(
+    ele: etree.Element | PdfPage | PdfLine | List[etree.Element | PdfPage | PdfLine],
+) -> str:
+    """Assemble the text of the content of a block, each line followed by a newline
+
+    Parameters
+    ----------
+    ele : etree.Element | PdfPage | PdfLine | List[etree.Element | PdfPage | PdfLine]
+        XML element(s) (or native pages or lines) to extract the text from
+
+    Returns
+    -------
+    str
+        the text of the lines
+    """
+    if isinstance(ele, PdfLine):
+        return ele.text + "\n"
+    if isinstance(ele, list):
+        return "".join(_block_text(e) for e in ele)
+    if isinstance(ele, PdfPage):
+        texts = [line.text for line in ele.lines]
+    elif ele.tag == "line":
+        texts = [_line_text(ele)]
+    else:
+        texts = [_line_text(line) for line in ele.findall("line")]
+    return "".join(text + "\n" for text in texts)
+
+
 def _eq_blocks(a, b) -> bool:
     equal = True
     equal = equal and a.type_block == b.type_block
@@ -91,39 +152,13 @@ class PdfBlock:
         The type of the PDF block.
     metadata : Optional[dict]
         Additional metadata associated with the block.
-    content : Optional[str]
-        The textual content extracted from the block.
+    content : str
+        The textual content extracted from the block, assembled from its lines
+        only when first read.
     """
 
     type_block: Enum
     metadata: Optional[dict]
-    content: Optional[str]
-
-    def _text_form_element(self, ele: etree.Element) -> str:
-        """Extracts text content from an XML element representing a PDF block.
-
-        Args
-        ----
-        ele : etree.Element
-            The XML element to extract text from.
-
-        Returns
-        -------
-        str
-            The extracted text content.
-        """
-        text = ""
-        if ele.tag == "line":
-            lines = [ele]
-        else:
-            lines = ele.findall("line")
-        for line in lines:
-            for e in line.findall(".//char"):
-                c = e.get("c")
-                if c is not None:
-                    text += c
-            text += "\n"
-        return text
 
     def __eq__(self, other):
         """Compares two PdfBlock instances for equality.
@@ -145,7 +180,7 @@ class PdfBlock:
         self,
         type_block: Enum,
         metadata: dict,
-        xml_ele: etree.Element | List[etree.Element],
+        xml_ele: etree.Element | PdfLine | List[etree.Element | PdfLine],
     ):
         """Initializes a PdfBlock instance.
 
@@ -155,18 +190,56 @@ class PdfBlock:
             The type of the PDF block.
         metadata : dict
             Additional metadata for the block.
-        xml_ele : etree.Element | List[etree.Element]
-            The XML element(s) containing the block's content.
+        xml_ele : etree.Element | PdfLine | List[etree.Element | PdfLine]
+            The XML element(s) (or native lines) containing the block's content.
         """
         self.type_block = type_block
         self.metadata = metadata
-        txt = ""
-        if isinstance(xml_ele, list):
-            for ele in xml_ele:
-                txt += self._text_form_element(ele)
-        else:
-            txt = self._text_form_element(xml_ele)
-        self.content = txt
+        self._source = xml_ele
+        self._content = None
+
+    @property
+    def content(self) -> str:
+        """str: textual content of the block, assembled from its lines the first
+        time it is read (most of the blocks of a page are never read after the
+        match of the targets)"""
+        if self._content is None:
+            self._content = _block_text(self._source)
+            self._source = None
+        return self._content
+
+    @content.setter
+    def content(self, content: str):
+        self._content = content
+        self._source = None
+
+    def __getstate__(self) -> dict:
+        """Return the state of the block to pickle, with its content assembled
+        (the XML elements cannot be pickled)
+
+        Returns
+        -------
+        dict
+            type, metadata and content of the block
+        """
+        return {
+            "type_block": self.type_block,
+            "metadata": self.metadata,
+            "content": self.content,
+        }
+
+    def __setstate__(self, state: dict):
+        """Restore a pickled block
+
+        Parameters
+        ----------
+        state : dict
+            type, metadata and content of the block
+        """
+        self.type_block = state["type_block"]
+        self.metadata = state["metadata"]
+        self._source = None
+        self._content = state["content"]
 
     def __str__(self) -> str:
         """Returns a string representation of the PdfBlock.
@@ -245,46 +318,59 @@ class TextBlock:
 
 
 def pdf_filter_exec(
-    batch_pages: List[str],
+    batch_pages: Iterable[etree.Element | PdfPage | None],
     i_batch_page: int,
     n_pages: int,
-    pdf_filter_func: Callable[[List[str]], List[PdfBlock]],
+    pdf_filter_func: Callable[[etree.Element | PdfPage], List[PdfBlock]],
 ) -> List[PdfBlock]:
     """Processes a PDF document through a filter function to extract relevant blocks.
 
     Args
     ----
 
-    document : List[str]
-        The PDF document to process as a list of xml pages.
+    batch_pages : Iterable[etree.Element | PdfPage | None]
+        The pages of the PDF document to process, as xml trees or native pages.
+        `None` stands for a page already discarded by the pre-screen of the filter.
     i_batch_page : int
         Starting page of the batch processed by the instance of `pdf_filter_exec` function,
         used for informative purposes
     n_pages : int
         Total number of pages in the document, used for informative purposes.
-    pdf_filter_func : Callable[[List[str]], List[PdfBlock]]
-        A function that takes an XML element and returns a list of relevant PdfBlock.
+    pdf_filter_func : Callable[[etree.Element | PdfPage], List[PdfBlock]]
+        A function that takes a page and returns a list of relevant PdfBlock.
 
     Returns
     -------
     List[PdfBlock]
         PdfBlock objects containing the filtered content.
     """
+    # The state kept by the filter from a page to the next ones is restarted,
+    # so that the blocks of a batch depend only on its pages (batches are
+    # cached and run in any order)
+    column_layouts = getattr(pdf_filter_func, "column_layouts", None)
+    if column_layouts is not None:
+        column_layouts.clear()
     batch_results = []
-    logger.propagate = False
-    std_err_log = log.StreamHandler()
-    page_format_log = LogFormatterWithPage(logger.parent.handlers[0].formatter)
-    std_err_log.setFormatter(page_format_log)
-    logger.addHandler(std_err_log)
+    page_format_log = _page_log_formatter()
+    n_screened = 0
+    n_batch_pages = 0
 
     for page_number, page in enumerate(batch_pages, start=i_batch_page + 1):
         page_format_log.page = page_number
+        n_batch_pages += 1
         if (page_number + i_batch_page) % (n_pages // min(10, n_pages)) == 0:
             logger.info(_("Still filtering..."))
+        if page is None:
+            n_screened += 1
+            continue
 
         for r in pdf_filter_func(page):
             r.metadata["page"] = page_number
             batch_results.append(r)
+    if n_screened > 0:
+        logger.info(
+            _("%i pages of %i skipped by the pre-screen"), n_screened, n_batch_pages
+        )
     return batch_results
 
 
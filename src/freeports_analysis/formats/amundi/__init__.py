@@ -6,7 +6,7 @@ from freeports_analysis.formats_utils.pdf_filter import (
     OnePdfBlockType,
     standard_pdf_filtering,
 )
-from freeports_analysis.formats_utils.pdf_filter.xml.font import get_lines_with_font
+from freeports_analysis.formats_utils.pdf_filter.line_index import line_index
 from freeports_analysis.formats_utils.pdf_filter.select_position import select_inside
 from freeports_analysis.formats_utils.text_extract import (
     standard_text_extraction,
@@ -14,7 +14,7 @@ from freeports_analysis.formats_utils.text_extract import (
 )
 from freeports_analysis.formats_utils.deserialize import standard_deserialization
 from freeports_analysis.formats_utils.pdf_filter.pdf_parts.position import YRange
-from freeports_analysis.formats_utils.pdf_filter.pdf_parts import ExtractedPdfLine
+from freeports_analysis.formats_utils.pdf_filter.pdf_parts import ExtractedPdfLines
 from freeports_analysis.consts import Currency
 
 logger = getLogger(__name__)
@@ -34,10 +34,10 @@ TextBlockType: TypeAlias = EquityBondTextBlockType
 )
 def pdf_filter(xml_root) -> dict:
     """Add currency metadata taking it from ceratin area"""
-    lines = get_lines_with_font(xml_root, "ArialNarrow")
-    lines = [ExtractedPdfLine(line) for line in lines]
+    index = line_index(xml_root)
+    lines = ExtractedPdfLines.from_index(index, index.with_fonts(["ArialNarrow"]))
     y_range = YRange(None, 208)
-    currency = select_inside(lines, y_range)[0].xml_blk.xpath(".//@text")[0]
+    currency = select_inside(lines, y_range)[0].text
     return {"currency": currency}
 
 
@@ -6,6 +6,9 @@ from freeports_analysis.formats_utils.pdf_filter import (
     OnePdfBlockType,
     standard_pdf_filtering,
     is_present_txt_font,
+    screen_page_if_txt,
+    screen_page_if_fonts,
+    index_page_lines,
 )
 from freeports_analysis.formats_utils.text_extract import (
     standard_text_extraction,
@@ -46,6 +49,9 @@ def _filter_short_pages(xml_root) -> dict:
     pass
 
 
+@screen_page_if_fonts(options["header_font"], options["body_font"])
+@screen_page_if_txt(options["header_txt"])
+@index_page_lines
 def pdf_filter(xml_root) -> List[PdfBlock]:
     if is_present_txt_font(xml_root, "Futures contracts", "Helvetica-Bold"):
         return _filter_short_pages(xml_root)
@@ -12,8 +12,9 @@ from freeports_analysis.formats_utils.text_extract import (
 )
 from freeports_analysis.formats_utils.deserialize import standard_deserialization
 from freeports_analysis.formats_utils.text_extract.match import (
-    target_fuzzy_match,
-    target_prefix_match,
+    AllOf,
+    FuzzyMatch,
+    PrefixMatch,
 )
 from freeports_analysis.formats_utils.pdf_filter.pdf_parts.position import YRange
 
@@ -42,8 +43,7 @@ def pdf_filter(xml_root) -> dict:
     perc_net_assets_pos=+4,
     currency=+1,
     acquisition_cost_pos=None,
-    match_func=lambda x, y: target_fuzzy_match(x, y, 0.8)
-    and target_prefix_match(x, y, 0.3),
+    match_func=AllOf(PrefixMatch(0.3), FuzzyMatch(0.8)),
 )
 def text_extract(pdf_blocks, targets):
     pass
@@ -27,6 +27,7 @@ TextBlockType: TypeAlias = EquityBondTextBlockType
     subfund_font="Frutiger-Black",
     body_font="Frutiger-Light",
     y_range=(160, 765),
+    header_height=YRange(105, 135),
 )
 def pdf_filter(xml_root) -> dict:
     pass
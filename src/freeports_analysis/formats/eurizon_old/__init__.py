@@ -12,6 +12,7 @@ from freeports_analysis.formats_utils.deserialize import standard_deserializatio
     subfund_font="ArialMT",
     body_font="Verdana",
     y_range=(195, 710),
+    header_height=YRange(180, 205),
 )
 def pdf_filter(xml_root):
     pass
@@ -13,8 +13,9 @@ from freeports_analysis.formats_utils.text_extract import (
 )
 from freeports_analysis.formats_utils.deserialize import standard_deserialization
 from freeports_analysis.formats_utils.text_extract.match import (
-    target_fuzzy_match,
-    target_prefix_match,
+    AllOf,
+    FuzzyMatch,
+    PrefixMatch,
 )
 from freeports_analysis.consts import Currency
 
@@ -44,8 +45,7 @@ def pdf_filter(xml_root) -> dict:
     perc_net_assets_pos=+3,
     currency=Currency.EUR,
     acquisition_cost_pos=None,
-    match_func=lambda x, y: target_fuzzy_match(x, y, 0.65)
-    and target_prefix_match(x, y, 0.3),
+    match_func=AllOf(PrefixMatch(0.3), FuzzyMatch(0.65)),
 )
 def text_extract(pdf_blocks, targets):
     pass
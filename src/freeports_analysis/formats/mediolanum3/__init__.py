@@ -4,8 +4,9 @@ from freeports_analysis.formats_utils.pdf_filter import standard_pdf_filtering,
 from freeports_analysis.formats_utils.text_extract import standard_text_extraction
 from freeports_analysis.formats_utils.deserialize import standard_deserialization
 from freeports_analysis.formats_utils.text_extract.match import (
-    target_fuzzy_match,
-    target_prefix_match,
+    AllOf,
+    FuzzyMatch,
+    PrefixMatch,
 )
 
 
@@ -29,8 +30,7 @@ def pdf_filter(xml_root) -> dict:
     perc_net_assets_pos=+5,
     currency=+2,
     acquisition_cost_pos=+3,
-    match_func=lambda x, y: target_fuzzy_match(x, y, 0.8)
-    and target_prefix_match(x, y, 0.3),
+    match_func=AllOf(PrefixMatch(0.3), FuzzyMatch(0.8)),
 )
 def text_extract(pdf_blocks, targets):
     pass
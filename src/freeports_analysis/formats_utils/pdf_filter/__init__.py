@@ -4,27 +4,60 @@ This module provides decorators and utilities for filtering and processing PDF c
 based on XML elements, fonts, and positional data.
 """
 
-from typing import List, Optional, Tuple, TypeAlias, Callable, Union
+from numbers import Real
+from typing import (
+    List,
+    Sequence,
+    Optional,
+    Tuple,
+    TypeAlias,
+    Callable,
+    Union,
+    Set,
+    FrozenSet,
+    NamedTuple,
+)
 from enum import Enum, auto
 import logging as log
 from lxml import etree
 from freeports_analysis.formats import PdfBlock, ExpectedPdfBlockNotFound, TextBlock
 from freeports_analysis.i18n import _
-from .xml.font import get_lines_with_font, is_present_txt_font, get_lines_with_txt_font
-from .select_position import select_inside, get_table_positions, TablePosAlgorithm
+from freeports_analysis.pdf_page import PdfPage, font_in_page
+from .xml.font import is_present_txt_font
+from .select_position import (
+    select_inside,
+    get_table_positions,
+    TablePosAlgorithm,
+    ColumnLayouts,
+)
 from .pdf_parts.position import YRange
 from .pdf_parts.font import Font
-from .pdf_parts import ExtractedPdfLine
-from .select_font import deselect_txt_font
-from .xml.position import get_bounds
+from .pdf_parts import ExtractedPdfLines
+from .line_index import LineIndex, line_index, index_page_lines
 from .. import overwrite_if_implemented
 
 logger = log.getLogger(__name__)
 
+CLIP_MARGIN = 12
+"""Margin (in points) added around the vertical band extracted for the filters
+that declare it (see `clip_page_to`), so that the lines whose center lies near the
+edges of the band are extracted whole"""
 
-UpdateMetadataFunc: TypeAlias = Callable[[etree.Element], dict]
-FilterCondition: TypeAlias = Callable[[etree.Element], bool]
-PdfFilterFunc: TypeAlias = Callable[[etree.Element], List[TextBlock]]
+
+PageTree: TypeAlias = etree.Element | PdfPage | LineIndex
+UpdateMetadataFunc: TypeAlias = Callable[[PageTree], dict]
+FilterCondition: TypeAlias = Callable[[PageTree], bool]
+PdfFilterFunc: TypeAlias = Callable[[PageTree], List[TextBlock]]
+PageScreen: TypeAlias = Callable[[str], bool]
+FontScreen: TypeAlias = Callable[[Set[str]], bool]
+YLimit: TypeAlias = Optional[float | Tuple[str, Font]]
+
+_ALGORITHM_FLAGS = (
+    TablePosAlgorithm.ROW,
+    TablePosAlgorithm.BIG_RULE,
+    TablePosAlgorithm.RULER_AREA,
+    TablePosAlgorithm.TEST_POS,
+)
 
 
 class OnePdfBlockType(Enum):
@@ -49,7 +82,7 @@ def filter_page_if(
 
     Parameters
     ----------
-    condition : Callable[[etree.Element], bool]
+    condition : Callable[[PageTree], bool]
         A predicate function that determines whether the filter should be applied.
 
     Returns
@@ -59,7 +92,7 @@ def filter_page_if(
     """
 
     def wrapper(pdf_filter: PdfFilterFunc) -> PdfFilterFunc:
-        def conditionated_pdf_filter(xml_root: etree.Element) -> List[PdfBlock]:
+        def conditionated_pdf_filter(xml_root: PageTree) -> List[PdfBlock]:
             parts = []
             if condition(xml_root):
                 parts = pdf_filter(xml_root)
@@ -70,6 +103,98 @@ def filter_page_if(
     return wrapper
 
 
+def screen_page_if_txt(txt: str) -> Callable[[PdfFilterFunc], PdfFilterFunc]:
+    """Decorator factory attaching to a PDF filter a pre-screen of the pages
+    (`page_screen` attribute), a cheap test done on the plain text of the page
+    before extracting its lines. A page is discarded by the pipeline without
+    calling the filter if `txt` is not found in the plain text of the page,
+    so the decorated filter must return no blocks for such pages.
+
+    Parameters
+    ----------
+    txt : str
+        text that has to be present in the page for the filter to be applied.
+
+    Returns
+    -------
+    Callable[[PdfFilterFunc], PdfFilterFunc]
+        A decorator that attaches the pre-screen to the PDF filter.
+    """
+
+    def wrapper(pdf_filter: PdfFilterFunc) -> PdfFilterFunc:
+        def page_screen(page_txt: str) -> bool:
+            return txt in page_txt
+
+        pdf_filter.page_screen = page_screen
+        return pdf_filter
+
+    return wrapper
+
+
+def screen_page_if_fonts(
+    *fonts: Union[str, List[str]],
+) -> Callable[[PdfFilterFunc], PdfFilterFunc]:
+    """Decorator factory attaching to a PDF filter a pre-screen of the pages
+    on their fonts (`font_screen` attribute), done on the font resources of the
+    page before extracting any text. A page is discarded by the pipeline without
+    calling the filter if it does not use all the `fonts`, so the decorated filter
+    must return no blocks for such pages.
+
+    Parameters
+    ----------
+    *fonts : Union[str, List[str]]
+        fonts that have to be used in the page for the filter to be applied,
+        a list stands for alternative fonts (at least one has to be used).
+
+    Returns
+    -------
+    Callable[[PdfFilterFunc], PdfFilterFunc]
+        A decorator that attaches the font pre-screen to the PDF filter.
+    """
+    required = [[f] if isinstance(f, str) else f for f in fonts]
+
+    def wrapper(pdf_filter: PdfFilterFunc) -> PdfFilterFunc:
+        def font_screen(page_fonts: Set[str]) -> bool:
+            return all(
+                any(font_in_page(f, page_fonts) for f in alternatives)
+                for alternatives in required
+            )
+
+        pdf_filter.font_screen = font_screen
+        return pdf_filter
+
+    return wrapper
+
+
+def clip_page_to(*bands: YRange) -> Callable[[PdfFilterFunc], PdfFilterFunc]:
+    """Decorator factory attaching to a PDF filter the vertical band of the page
+    it needs (`page_clip` attribute), the smallest band containing all `bands`
+    widened by `CLIP_MARGIN`. The pipeline extracts only the text inside it, so
+    the decorated filter must not look at lines outside `bands`.
+
+    Parameters
+    ----------
+    *bands : YRange
+        vertical ranges used by the filter, a `None` edge stands for the edge
+        of the page.
+
+    Returns
+    -------
+    Callable[[PdfFilterFunc], PdfFilterFunc]
+        A decorator that attaches the band to the PDF filter.
+    """
+    tops = [b.start for b in bands]
+    bottoms = [b.end for b in bands]
+    top = None if None in tops else min(tops) - CLIP_MARGIN
+    bottom = None if None in bottoms else max(bottoms) + CLIP_MARGIN
+
+    def wrapper(pdf_filter: PdfFilterFunc) -> PdfFilterFunc:
+        pdf_filter.page_clip = YRange(top, bottom)
+        return pdf_filter
+
+    return wrapper
+
+
 def standard_extraction_subfund(
     subfund_height: YRange,
     subfund_font: str,
@@ -90,18 +215,20 @@ def standard_extraction_subfund(
     """
 
     def decorator(old_page_metadata):
-        def new_page_metadata(xml_root: etree.Element) -> List[PdfBlock]:
-            lines_with_font = get_lines_with_font(xml_root, subfund_font)
-            lines = [ExtractedPdfLine(blk) for blk in lines_with_font]
+        def new_page_metadata(xml_root: PageTree) -> List[PdfBlock]:
+            index = line_index(xml_root)
+            lines = ExtractedPdfLines.from_index(
+                index, index.with_fonts([subfund_font])
+            )
             top_lines = select_inside(lines, subfund_height)
             subfund = None
             if len(top_lines) > 0:
-                subfund = top_lines[0].xml_blk.xpath(".//@text")[0]
+                subfund = top_lines[0].text
             if subfund is None:
                 raise ExpectedPdfBlockNotFound(
                     _("subfund block on top of page not found")
                 )
-            metadata = old_page_metadata(xml_root)
+            metadata = old_page_metadata(index)
             metadata["subfund"] = subfund
             return metadata
 
@@ -110,6 +237,195 @@ def standard_extraction_subfund(
     return decorator
 
 
+class FilterPlan(NamedTuple):
+    """Settings of a filter made by `standard_pdf_filtering`, validated and converted
+    once (see `compile_filter_plan`) in the form used on each page
+
+    Attributes
+    ----------
+    header_txt : str
+        The text that must be present in the header to process the page.
+    header_font : Font
+        The font used by the header text.
+    body_fonts : FrozenSet[Font]
+        The fonts used by the body text.
+    deselection : FrozenSet[Tuple[str, Font]]
+        Text and font pairs to exclude from extraction.
+    y_top : YLimit
+        Top of the table: a coordinate, the text and font of the line whose
+        bottom is the top of the table, or `None` for the top of the page.
+    y_bottom : YLimit
+        Bottom of the table: a coordinate, the text and font of the line whose
+        top is the bottom of the table, or `None` for the bottom of the page.
+    algorithm : TablePosAlgorithm
+        Algorithm used to compute the columns of the table.
+    tolerance : float
+        Tolerance used to compute the columns of the table.
+    learn_columns : int
+        Number of pages the column layout of each subfund is learned from
+        (see `ColumnLayouts`), 0 to compute the columns of each page on its own.
+    column_deviation : float
+        Maximum deviation (in points) of the lines from a learned column layout.
+    """
+
+    header_txt: str
+    header_font: Font
+    body_fonts: FrozenSet[Font]
+    deselection: FrozenSet[Tuple[str, Font]]
+    y_top: YLimit
+    y_bottom: YLimit
+    algorithm: TablePosAlgorithm
+    tolerance: float
+    learn_columns: int
+    column_deviation: float
+
+    def table_range(self, xml_root: PageTree) -> YRange:
+        """Resolve the vertical range of the table in a page
+
+        Parameters
+        ----------
+        xml_root : PageTree
+            page
+
+        Returns
+        -------
+        YRange
+            vertical range of the table, with `None` edges for the limits whose
+            line is not found in the page
+        """
+        index = line_index(xml_root)
+        top = self.y_top
+        if isinstance(top, tuple):
+            top_limit_lines = index.with_txt_font(*top)
+            top = None
+            if len(top_limit_lines) > 0:
+                top = index.bboxes[top_limit_lines[0]][3]
+        bottom = self.y_bottom
+        if isinstance(bottom, tuple):
+            btm_limit_lines = index.with_txt_font(*bottom)
+            bottom = None
+            if len(btm_limit_lines) > 0:
+                bottom = index.bboxes[btm_limit_lines[0]][1]
+        return YRange(top, bottom)
+
+
+def _check_y_limit(limit) -> YLimit:
+    if limit is None or isinstance(limit, Real) and not isinstance(limit, bool):
+        return limit
+    if (
+        isinstance(limit, tuple)
+        and len(limit) == 2
+        and all(isinstance(part, str) for part in limit)
+    ):
+        return limit
+    raise ValueError(
+        _("y_range limits must be numbers, (text, font) pairs or None, not {}").format(
+            limit
+        )
+    )
+
+
+def compile_filter_plan(
+    header_txt: str,
+    header_font: Font,
+    body_font: Union[str, List[str]],
+    y_range: Optional[Tuple[YLimit, YLimit]] = None,
+    deselection_list: Optional[List[Tuple[str, Font]]] = None,
+    algorithm_flags: Sequence[bool] = (False, False, False, False),
+    tolerance: float = 0.0,
+    learn_columns: int = 0,
+    column_deviation: float = 6.0,
+) -> FilterPlan:
+    """Validate the settings of `standard_pdf_filtering` and convert them once in
+    the form used on each page, so that configuration errors are raised when the
+    format is imported
+
+    Parameters
+    ----------
+    header_txt : str
+        The text that must be present in the header to process the page.
+    header_font : Font
+        The font used by the header text.
+    body_font : Union[str, List[str]]
+        The font or list of fonts used by the body text.
+    y_range : Optional[Tuple[YLimit, YLimit]], optional
+        The vertical range for filtering lines, by default None.
+    deselection_list : Optional[List[Tuple[str, Font]]], optional
+        A list of text and font pairs to exclude from extraction, by default None.
+    algorithm_flags : Sequence[bool], optional
+        Which of `TablePosAlgorithm` ROW, BIG_RULE, RULER_AREA and TEST_POS
+        are enabled, by default none.
+    tolerance : float, optional
+        Tolerance used to compute the columns of the table, by default 0.0.
+    learn_columns : int, optional
+        Number of pages the column layout of each subfund is learned from
+        (see `ColumnLayouts`), by default 0 (columns computed on each page).
+    column_deviation : float, optional
+        Maximum deviation (in points) of the lines from a learned column layout,
+        by default 6.0.
+
+    Returns
+    -------
+    FilterPlan
+        the plan of the filter
+
+    Raises
+    ------
+    ValueError
+        If a setting is not valid.
+    """
+    body_fonts = frozenset([body_font] if isinstance(body_font, str) else body_font)
+    if len(body_fonts) == 0:
+        raise ValueError(_("At least one body font is required"))
+    if y_range is None:
+        y_range = (None, None)
+    if len(y_range) != 2:
+        raise ValueError(_("y_range must have two limits, not {}").format(y_range))
+    if len(algorithm_flags) > len(_ALGORITHM_FLAGS):
+        raise ValueError(
+            _("algorithm_flags can have at most {} flags, not {}").format(
+                len(_ALGORITHM_FLAGS), len(algorithm_flags)
+            )
+        )
+    algorithm = TablePosAlgorithm(0)
+    for flag, enabled in zip(_ALGORITHM_FLAGS, algorithm_flags):
+        if enabled:
+            algorithm |= flag
+    if not isinstance(tolerance, Real) or tolerance < 0:
+        raise ValueError(
+            _("tolerance must be a non-negative number, not {}").format(tolerance)
+        )
+    if not isinstance(learn_columns, int) or learn_columns < 0:
+        raise ValueError(
+            _("learn_columns must be a non-negative integer, not {}").format(
+                learn_columns
+            )
+        )
+    if learn_columns > 0 and TablePosAlgorithm.ROW in algorithm:
+        raise ValueError(_("learn_columns cannot be used to compute rows"))
+    if not isinstance(column_deviation, Real) or column_deviation < 0:
+        raise ValueError(
+            _("column_deviation must be a non-negative number, not {}").format(
+                column_deviation
+            )
+        )
+    deselection = frozenset(
+        tuple(pair) for pair in ([] if deselection_list is None else deselection_list)
+    )
+    return FilterPlan(
+        header_txt=header_txt,
+        header_font=header_font,
+        body_fonts=body_fonts,
+        deselection=deselection,
+        y_top=_check_y_limit(y_range[0]),
+        y_bottom=_check_y_limit(y_range[1]),
+        algorithm=algorithm,
+        tolerance=tolerance,
+        learn_columns=learn_columns,
+        column_deviation=column_deviation,
+    )
+
+
 def standard_pdf_filtering(
     header_txt: str,
     header_font: Font,
@@ -119,18 +435,30 @@ def standard_pdf_filtering(
     y_range: Optional[
         Tuple[Optional[float | Tuple[str, str]], Optional[float | Tuple[str, str]]]
     ] = None,
-    deselection_list: Optional[Tuple[str, Font]] = None,
-    algorithm_flags: List = [False, False, False, False],
+    deselection_list: Optional[List[Tuple[str, Font]]] = None,
+    algorithm_flags: Sequence[bool] = (False, False, False, False),
     tolerance: float = 0.0,
+    header_height: Optional[YRange] = None,
+    learn_columns: int = 0,
+    column_deviation: float = 6.0,
 ) -> Callable[[PdfFilterFunc], PdfFilterFunc]:
     """Decorator factory for creating PDF filters with standardized processing.
 
     Creates a filter that:
-    1. Processes pages containing the specified header text in the specified header font.
+    1. Processes pages containing the specified header text in the specified header font
+       (pages not using the header and body fonts or not containing the header text
+       are discarded by a pre-screen, see `screen_page_if_fonts` and
+       `screen_page_if_txt`).
     2. Extracts lines with the specified body font as relevant blocks.
     3. Extracts subfund text within a specified range or height.
     4. Allows customization of page metadata and block types.
 
+    The settings are validated and converted once, when the format is imported,
+    in a `FilterPlan` (`plan` attribute of the filter), see `compile_filter_plan`.
+    The lines of each page are read once, in the `LineIndex` of the page shared by
+    all the steps of the filter (and passed to the custom page metadata function),
+    see `index_page_lines`.
+
     Parameters
     ----------
     header_txt : str
@@ -145,87 +473,107 @@ def standard_pdf_filtering(
         The font or list of fonts used by the body text to extract as relevant blocks.
     y_range : Optional[Tuple[Optional[float | Tuple[str, str]], Optional[float | Tuple[str, str]]]
         The vertical range for filtering lines, by default None.
-    deselection_list : Optional[Tuple[str, Font]], optional
+    deselection_list : Optional[List[Tuple[str, Font]]], optional
         A list of text and font pairs to exclude from extraction, by default None.
+    algorithm_flags : Sequence[bool], optional
+        Which of `TablePosAlgorithm` ROW, BIG_RULE, RULER_AREA and TEST_POS
+        are enabled, by default none.
+    tolerance : float, optional
+        Tolerance used to compute the columns of the table, by default 0.0.
+    header_height : Optional[YRange], optional
+        The vertical range in which the header text is expected, by default None.
+        If given, only the band of the page containing the header, the subfund and
+        the table (`y_range`) is extracted, see `clip_page_to`.
+    learn_columns : int, optional
+        If not 0, the number of pages of each subfund the column layout is learned
+        from, so that the next pages of the subfund in the same batch get their
+        columns from the layout (see `ColumnLayouts`, available as
+        `column_layouts` attribute of the filter), by default 0.
+    column_deviation : float, optional
+        Maximum deviation (in points) of the lines from a learned column layout
+        before the page is clustered again, by default 6.0.
 
     Returns
     -------
     Callable[[PdfFilterFunc], PdfFilterFunc]
         A decorator that applies the standardized PDF filter.
+
+    Raises
+    ------
+    ValueError
+        If a setting is not valid.
     """
 
+    plan = compile_filter_plan(
+        header_txt,
+        header_font,
+        body_font,
+        y_range,
+        deselection_list,
+        algorithm_flags,
+        tolerance,
+        learn_columns,
+        column_deviation,
+    )
+
     def decorator(f):
+        column_layouts = None
+        if plan.learn_columns > 0:
+            column_layouts = ColumnLayouts(plan.learn_columns, plan.column_deviation)
+
         @standard_extraction_subfund(subfund_height, subfund_font)
         @overwrite_if_implemented(f)
-        def page_metadata(_: etree.Element) -> dict:
+        def page_metadata(_: PageTree) -> dict:
             return {}
 
+        @screen_page_if_fonts(header_font, body_font)
+        @screen_page_if_txt(header_txt)
+        @index_page_lines
         @filter_page_if(lambda x: is_present_txt_font(x, header_txt, header_font))
-        def pdf_filter(xml_root: etree.Element) -> List[PdfBlock]:
+        def pdf_filter(index: LineIndex) -> List[PdfBlock]:
             metadata = {}
             try:
-                metadata = page_metadata(xml_root)
+                metadata = page_metadata(index)
             except ExpectedPdfBlockNotFound as e:
                 logger.warn(e)
 
-            if isinstance(body_font, str):
-                body_fonts = [body_font]
+            rows = index.with_fonts(plan.body_fonts)
+            if len(plan.deselection) > 0:
+                deselected = index.deselected(plan.deselection)
+                rows = [i for i in rows if i not in deselected]
+            lines = ExtractedPdfLines.from_index(index, rows)
+            table_rows = select_inside(lines, plan.table_range(index))
+            if column_layouts is None:
+                table_positions = get_table_positions(
+                    table_rows, algorithm_flags=plan.algorithm, tolerance=plan.tolerance
+                )
             else:
-                body_fonts = body_font
-
-            rows = get_lines_with_font(xml_root, body_fonts)
-            lines = [ExtractedPdfLine(r) for r in rows]
-            y_range_numeric_top = None
-            y_range_numeric_btm = None
-
-            if deselection_list is not None:
-                lines = deselect_txt_font(
-                    deselection_list=deselection_list, lines=lines
+                table_positions = column_layouts.table_positions(
+                    metadata.get("subfund"),
+                    table_rows,
+                    algorithm_flags=plan.algorithm,
+                    tolerance=plan.tolerance,
                 )
-
-            if y_range is not None:
-                if isinstance(y_range[0], tuple):
-                    txt, font = y_range[0]
-                    top_limit_blk = get_lines_with_txt_font(xml_root, txt, font)
-                    if top_limit_blk is not None:
-                        y_range_numeric_top = get_bounds(top_limit_blk)[1][1]
-                else:
-                    y_range_numeric_top = y_range[0]
-                if isinstance(y_range[1], tuple):
-                    txt, font = y_range[1]
-                    btm_limit_blk = get_lines_with_txt_font(xml_root, txt, font)
-                    if btm_limit_blk is not None:
-                        y_range_numeric_btm = get_bounds(btm_limit_blk)[1][0]
-                else:
-                    y_range_numeric_btm = y_range[1]
-            table_rows = select_inside(
-                lines, YRange(y_range_numeric_top, y_range_numeric_btm)
-            )
-
-            all_flags = [
-                TablePosAlgorithm.ROW,
-                TablePosAlgorithm.BIG_RULE,
-                TablePosAlgorithm.RULER_AREA,
-                TablePosAlgorithm.TEST_POS,
-            ]
-
-            algo = TablePosAlgorithm(0)  # valore vuoto (nessun flag attivo)
-            for flag, enabled in zip(all_flags, algorithm_flags):
-                if enabled:
-                    algo |= flag
-
-            table_positions = get_table_positions(
-                table_rows, algorithm_flags=algo, tolerance=tolerance
-            )
             return [
                 PdfBlock(
                     OnePdfBlockType.RELEVANT_BLOCK,
                     {**metadata, "table-col": table_positions[i]},
-                    table_row.xml_blk,
+                    xml_blk,
                 )
-                for i, table_row in enumerate(table_rows)
+                for i, xml_blk in enumerate(table_rows.xml_blks)
             ]
 
+        pdf_filter.plan = plan
+        pdf_filter.column_layouts = column_layouts
+        if header_height is not None:
+            table_height = YRange(None, None)
+            if y_range is not None:
+                table_height = YRange(
+                    *[None if isinstance(lim, tuple) else lim for lim in y_range]
+                )
+            pdf_filter = clip_page_to(subfund_height, header_height, table_height)(
+                pdf_filter
+            )
         return pdf_filter
 
     return decorator
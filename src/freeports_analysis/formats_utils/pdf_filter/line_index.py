@@ -0,0 +1,199 @@
+"""Index of the lines of a page, built in a single traversal of the page and shared
+by the selection helpers of :py:mod:`freeports_analysis.formats_utils.pdf_filter.xml.font`,
+so that each selection is a lookup instead of a new traversal of the page.
+"""
+
+from typing import Callable, Iterable, List, Set, Tuple, Union
+import numpy as np
+from lxml import etree
+from freeports_analysis.pdf_page import PdfPage, PdfLine, page_lines
+
+
+class LineIndex:
+    """Lines of a page (xml tree or native page) with their text, fonts, text sizes
+    and bounding box, indexed by font and by text. Lines are identified by their
+    position in reading order
+
+    Parameters
+    ----------
+    blk : etree.Element | PdfPage | PdfLine
+        page (or part of it) to index
+
+    Attributes
+    ----------
+    page : etree.Element | PdfPage | PdfLine
+        the indexed page
+    lines : List[etree.Element | PdfLine]
+        lines of the page, as found in the page
+    texts : List[str]
+        text of each line
+    fonts : List[Tuple[str, ...]]
+        font names of the runs of text of each line
+    sizes : List[Tuple[float, ...]]
+        text sizes of the runs of text of each line
+    bboxes : List[Tuple[float, float, float, float]]
+        bounding box of each line as (x0, y0, x1, y1)
+    coords : np.ndarray
+        the bounding boxes as a (number of lines, 4) array
+    text_sizes : np.ndarray
+        text size of the first run of text of each line (NaN for lines without text)
+    by_font : Dict[str, List[int]]
+        positions of the lines using each font
+    by_text : Dict[str, List[int]]
+        positions of the lines with each text
+    """
+
+    __slots__ = (
+        "page",
+        "lines",
+        "texts",
+        "fonts",
+        "sizes",
+        "bboxes",
+        "coords",
+        "text_sizes",
+        "by_font",
+        "by_text",
+    )
+
+    def __init__(self, blk: etree.Element | PdfPage | PdfLine):
+        """Index the lines of a page
+
+        Parameters
+        ----------
+        blk : etree.Element | PdfPage | PdfLine
+            page (or part of it) to index
+        """
+        self.page = blk
+        if isinstance(blk, (PdfPage, PdfLine)):
+            self.lines = page_lines(blk)
+            self.texts = [line.text for line in self.lines]
+            self.fonts = [line.fonts for line in self.lines]
+            self.sizes = [line.sizes for line in self.lines]
+            self.bboxes = [line.bbox for line in self.lines]
+        else:
+            self.lines = []
+            self.texts = []
+            self.fonts = []
+            self.sizes = []
+            self.bboxes = []
+            for line in blk.iter("line"):
+                runs = line.findall("font")
+                self.lines.append(line)
+                self.texts.append(line.get("text", ""))
+                self.fonts.append(tuple(run.get("name") for run in runs))
+                self.sizes.append(tuple(float(run.get("size")) for run in runs))
+                self.bboxes.append(tuple(float(c) for c in line.get("bbox").split()))
+        self.coords = np.array(self.bboxes, dtype=float).reshape(-1, 4)
+        self.text_sizes = np.array(
+            [sizes[0] if len(sizes) > 0 else np.nan for sizes in self.sizes],
+            dtype=float,
+        )
+        self.by_font = {}
+        self.by_text = {}
+        for i, (text, fonts) in enumerate(zip(self.texts, self.fonts)):
+            for font in fonts if len(fonts) == 1 else dict.fromkeys(fonts):
+                self.by_font.setdefault(font, []).append(i)
+            self.by_text.setdefault(text, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def with_fonts(self, fonts: Iterable[str]) -> List[int]:
+        """Return the lines using at least one of some fonts
+
+        Parameters
+        ----------
+        fonts : Iterable[str]
+            fonts to search for
+
+        Returns
+        -------
+        List[int]
+            positions of the lines, in reading order
+        """
+        postings = [self.by_font[f] for f in set(fonts) if f in self.by_font]
+        if len(postings) == 1:
+            return list(postings[0])
+        return sorted(i for posting in postings for i in posting)
+
+    def with_txt_font(self, txt: str, font: str) -> List[int]:
+        """Return the lines containing a text and using a font
+
+        Parameters
+        ----------
+        txt : str
+            text to search for (also as part of the text of the line)
+        font : str
+            font to search for
+
+        Returns
+        -------
+        List[int]
+            positions of the lines, in reading order
+        """
+        return [i for i in self.by_font.get(font, []) if txt in self.texts[i]]
+
+    def deselected(self, deselection: Iterable[Tuple[str, str]]) -> Set[int]:
+        """Return the lines whose text and (first) font are one of some pairs,
+        as compared by
+        :py:func:`freeports_analysis.formats_utils.pdf_filter.select_font.deselect_txt_font`
+
+        Parameters
+        ----------
+        deselection : Iterable[Tuple[str, str]]
+            text and font pairs to search for
+
+        Returns
+        -------
+        Set[int]
+            positions of the lines
+        """
+        return {
+            i
+            for txt, font in deselection
+            for i in self.by_text.get(txt, [])
+            if self.fonts[i][:1] == (font,)
+        }
+
+
+def line_index(blk: etree.Element | PdfPage | PdfLine | LineIndex) -> LineIndex:
+    """Return the index of the lines of a page, building it if not already one
+
+    Parameters
+    ----------
+    blk : etree.Element | PdfPage | PdfLine | LineIndex
+        page or its index
+
+    Returns
+    -------
+    LineIndex
+        index of the page
+    """
+    if isinstance(blk, LineIndex):
+        return blk
+    return LineIndex(blk)
+
+
+def index_page_lines(
+    pdf_filter: Callable[[LineIndex], list],
+) -> Callable[[Union[etree.Element, PdfPage, LineIndex]], list]:
+    """Decorator passing to a PDF filter the `LineIndex` of the page in place of
+    the page, built only if the filter is not already called with an index, so
+    that the filters called by another filter share the same index
+
+    Parameters
+    ----------
+    pdf_filter : Callable[[LineIndex], list]
+        filter to decorate
+
+    Returns
+    -------
+    Callable[[Union[etree.Element, PdfPage, LineIndex]], list]
+        decorated filter
+    """
+
+    def indexed_pdf_filter(xml_root):
+        return pdf_filter(line_index(xml_root))
+
+    return indexed_pdf_filter
@@ -1,9 +1,14 @@
 """Pdf xml parts in a friendly format (custom python classes)."""
 
+from typing import Iterable, Iterator, List, Sequence
+import numpy as np
 from lxml import etree
 from freeports_analysis.i18n import _
+from freeports_analysis.pdf_page import PdfLine
 from .font import Font, TextSize
 from ..xml.position import get_bounds
+from ..xml.font import FONT_NAMES, FONT_SIZES, LINE_TEXT
+from ..line_index import LineIndex
 from .position import Area, XRange, YRange, Coord
 
 
@@ -11,29 +16,77 @@ class ExtractedPdfLine:
     """A class representing a line extracted from a PDF XML structure.
 
     This class provides a friendly interface to access geometric properties,
-    font information, and text size of a line in a PDF document.
+    font information, text size and text of a line in a PDF document.
 
     Parameters
     ----------
-    blk : etree.Element
-        The XML element containing the line data.
+    blk : etree.Element | PdfLine
+        The XML element (or native line) containing the line data.
     """
 
-    def __init__(self, blk: etree.Element):
-        """Initialize the ExtractedPdfLine from an XML element.
+    def __init__(self, blk: etree.Element | PdfLine):
+        """Initialize the ExtractedPdfLine from an XML element or a native line.
 
         Parameters
         ----------
-        blk : etree.Element
-            The XML element containing the line data.
+        blk : etree.Element | PdfLine
+            The XML element (or native line) containing the line data.
         """
         self._blk = blk
+        self._text = None
         bounds = get_bounds(blk)
         self._geometry = Area(
             XRange(bounds[0][0], bounds[0][1]), YRange(bounds[1][0], bounds[1][1])
         )
-        self._font = Font(blk.xpath(".//font/@name")[0])
-        self._txt_size = TextSize(blk.xpath(".//font/@size")[0])
+        if isinstance(blk, PdfLine):
+            self._font = Font(blk.fonts[0])
+            self._txt_size = TextSize(blk.sizes[0])
+        else:
+            self._font = Font(FONT_NAMES(blk)[0])
+            self._txt_size = TextSize(FONT_SIZES(blk)[0])
+
+    @classmethod
+    def from_index(cls, index: LineIndex, i: int) -> "ExtractedPdfLine":
+        """Build the line from its entry in the index of the page, without
+        looking again at the line
+
+        Parameters
+        ----------
+        index : LineIndex
+            index of the page
+        i : int
+            position of the line in the index
+
+        Returns
+        -------
+        ExtractedPdfLine
+            the line
+        """
+        return cls._from_parts(
+            index.lines[i],
+            index.bboxes[i],
+            index.fonts[i][0],
+            index.sizes[i][0],
+            index.texts[i],
+        )
+
+    @classmethod
+    def _from_parts(
+        cls,
+        blk: etree.Element | PdfLine,
+        bbox: Sequence[float],
+        font: Font,
+        txt_size: TextSize,
+        text: str,
+    ) -> "ExtractedPdfLine":
+        line = cls.__new__(cls)
+        line._blk = blk
+        x0, y0, x1, y1 = bbox
+        line._geometry = Area(XRange(x0, x1), YRange(y0, y1))
+        line._font = Font(font)
+        line._txt_size = TextSize(txt_size)
+        line._text = text
+        return line
 
     @property
     def geometry(self) -> Area:
@@ -92,13 +145,29 @@ class ExtractedPdfLine:
         return self._txt_size
 
     @property
-    def xml_blk(self) -> etree.Element:
-        """Get the original XML element containing the line data.
+    def text(self) -> str:
+        """Get the text of the line.
+
+        Returns
+        -------
+        str
+            The text of the line.
+        """
+        if self._text is None:
+            if isinstance(self._blk, PdfLine):
+                self._text = self._blk.text
+            else:
+                self._text = LINE_TEXT(self._blk)[0]
+        return self._text
+
+    @property
+    def xml_blk(self) -> etree.Element | PdfLine:
+        """Get the original XML element (or native line) containing the line data.
 
         Returns
         -------
-        etree.Element
-            The original XML element containing the line data.
+        etree.Element | PdfLine
+            The original XML element (or native line) containing the line data.
         """
         return self._blk
 
@@ -118,3 +187,251 @@ class ExtractedPdfLine:
         string += f"\t\t({x:.3f}, {y:.3f})\n"
         string += f"\t({x_bl:.3f}, {y_bl:.3f})\t({x_br:.3f}, {y_br:.3f})\n"
         return string
+
+
+class ExtractedPdfLines(Sequence):
+    """Lines extracted from a PDF page stored as a struct of arrays: the bounding
+    boxes and the text sizes of the lines are float arrays, so that selections and
+    measures on the geometry of all the lines are vectorized. Indexing with an
+    integer gives the line as an `ExtractedPdfLine` (a view built on request),
+    indexing with a slice, a boolean mask or an array of positions gives the
+    selected lines as a new `ExtractedPdfLines`.
+
+    Parameters
+    ----------
+    blks : List[etree.Element | PdfLine]
+        The XML elements (or native lines) containing the lines data.
+    coords : np.ndarray
+        The bounding boxes (x0, y0, x1, y1) of the lines, as a (n, 4) array.
+    text_sizes : np.ndarray
+        The text sizes of the lines.
+    fonts : List[Font]
+        The fonts of the lines.
+    texts : List[str]
+        The texts of the lines.
+    """
+
+    def __init__(
+        self,
+        blks: List[etree.Element | PdfLine],
+        coords: np.ndarray,
+        text_sizes: np.ndarray,
+        fonts: List[Font],
+        texts: List[str],
+    ):
+        """Initialize the lines from their arrays.
+
+        Parameters
+        ----------
+        blks : List[etree.Element | PdfLine]
+            The XML elements (or native lines) containing the lines data.
+        coords : np.ndarray
+            The bounding boxes (x0, y0, x1, y1) of the lines, as a (n, 4) array.
+        text_sizes : np.ndarray
+            The text sizes of the lines.
+        fonts : List[Font]
+            The fonts of the lines.
+        texts : List[str]
+            The texts of the lines.
+        """
+        self._blks = blks
+        self._coords = coords
+        self._text_sizes = text_sizes
+        self._fonts = fonts
+        self._texts = texts
+
+    @classmethod
+    def from_index(
+        cls, index: LineIndex, positions: Iterable[int]
+    ) -> "ExtractedPdfLines":
+        """Build the lines from their entries in the index of the page.
+
+        Parameters
+        ----------
+        index : LineIndex
+            index of the page
+        positions : Iterable[int]
+            positions of the lines in the index
+
+        Returns
+        -------
+        ExtractedPdfLines
+            the lines, in the order of `positions`
+        """
+        positions = np.fromiter(positions, dtype=np.intp)
+        return cls(
+            [index.lines[i] for i in positions],
+            index.coords[positions],
+            index.text_sizes[positions],
+            [Font(index.fonts[i][0]) for i in positions],
+            [index.texts[i] for i in positions],
+        )
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[ExtractedPdfLine]) -> "ExtractedPdfLines":
+        """Build the arrays of some lines.
+
+        Parameters
+        ----------
+        lines : Iterable[ExtractedPdfLine]
+            the lines
+
+        Returns
+        -------
+        ExtractedPdfLines
+            the lines, in the same order
+        """
+        if isinstance(lines, ExtractedPdfLines):
+            return lines
+        lines = list(lines)
+        coords = [
+            (ln.geometry.x_bounds.x0, ln.geometry.y_bounds.y0)
+            + (ln.geometry.x_bounds.x1, ln.geometry.y_bounds.y1)
+            for ln in lines
+        ]
+        return cls(
+            [ln.xml_blk for ln in lines],
+            np.array(coords, dtype=float).reshape(-1, 4),
+            np.array([ln.text_size for ln in lines], dtype=float),
+            [ln.font for ln in lines],
+            [ln.text for ln in lines],
+        )
+
+    def __len__(self) -> int:
+        return len(self._blks)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(_("line index out of range"))
+            return ExtractedPdfLine._from_parts(
+                self._blks[key],
+                self._coords[key].tolist(),
+                self._fonts[key],
+                self._text_sizes[key].item(),
+                self._texts[key],
+            )
+        positions = np.arange(len(self))[key]
+        return ExtractedPdfLines(
+            [self._blks[i] for i in positions],
+            self._coords[positions],
+            self._text_sizes[positions],
+            [self._fonts[i] for i in positions],
+            [self._texts[i] for i in positions],
+        )
+
+    def __iter__(self) -> Iterator[ExtractedPdfLine]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def x0(self) -> np.ndarray:
+        """Get the left edges of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The left edges of the lines.
+        """
+        return self._coords[:, 0]
+
+    @property
+    def y0(self) -> np.ndarray:
+        """Get the top edges of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The top edges of the lines.
+        """
+        return self._coords[:, 1]
+
+    @property
+    def x1(self) -> np.ndarray:
+        """Get the right edges of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The right edges of the lines.
+        """
+        return self._coords[:, 2]
+
+    @property
+    def y1(self) -> np.ndarray:
+        """Get the bottom edges of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The bottom edges of the lines.
+        """
+        return self._coords[:, 3]
+
+    @property
+    def cx(self) -> np.ndarray:
+        """Get the horizontal coordinates of the centers of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The x of the centers, as given by `Area.c`.
+        """
+        return (self.x1 + self.x0) / 2.0
+
+    @property
+    def cy(self) -> np.ndarray:
+        """Get the vertical coordinates of the centers of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The y of the centers, as given by `Area.c`.
+        """
+        return (self.y1 + self.y0) / 2.0
+
+    @property
+    def widths(self) -> np.ndarray:
+        """Get the widths of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The widths of the lines.
+        """
+        return self.x1 - self.x0
+
+    @property
+    def heights(self) -> np.ndarray:
+        """Get the heights of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The heights of the lines.
+        """
+        return self.y1 - self.y0
+
+    @property
+    def text_sizes(self) -> np.ndarray:
+        """Get the text sizes of the lines.
+
+        Returns
+        -------
+        np.ndarray
+            The text sizes of the lines.
+        """
+        return self._text_sizes
+
+    @property
+    def xml_blks(self) -> List[etree.Element | PdfLine]:
+        """Get the original XML elements (or native lines) of the lines.
+
+        Returns
+        -------
+        List[etree.Element | PdfLine]
+            The original XML elements (or native lines) of the lines.
+        """
+        return self._blks
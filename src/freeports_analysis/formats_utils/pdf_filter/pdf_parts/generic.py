@@ -1,5 +1,7 @@
 """Utilities for handling generic PDF parts and components."""
 
+import numpy as np
+
 
 class Range:
     """A class representing a range with start and end values.
@@ -76,6 +78,27 @@ class Range:
             self.end is None or value <= self.end
         )
 
+    def mask(self, values: np.ndarray) -> np.ndarray:
+        """Check which of some values are within the range, as `__contains__`
+        does for a single value
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The values to check.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean mask, True for the values within the range.
+        """
+        inside = np.ones(len(values), dtype=bool)
+        if self.start is not None:
+            inside &= self.start <= values
+        if self.end is not None:
+            inside &= values <= self.end
+        return inside
+
     def __str__(self) -> str:
         """Return a string representation of the range.
 
@@ -22,8 +22,4 @@ def deselect_txt_font(
     List[ExtractedPdfLine]
         filtered list
     """
-    return [
-        line
-        for line in lines
-        if (line.xml_blk.xpath(".//@text")[0], line.font) not in deselection_list
-    ]
+    return [line for line in lines if (line.text, line.font) not in deselection_list]
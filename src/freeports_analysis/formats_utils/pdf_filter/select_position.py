@@ -1,52 +1,66 @@
 """Utilities for selecting or deselecting lines or getting infos based of geometrical information"""
 
-from typing import List
+from bisect import bisect_left
+from typing import Dict, Hashable, List, Tuple
 from enum import Flag, Enum, auto
-
-from .pdf_parts import ExtractedPdfLine
+import numpy as np
+from .pdf_parts import ExtractedPdfLine, ExtractedPdfLines
 from .pdf_parts.position import XRange, YRange
 
 
+def _select_range(
+    lines: List[ExtractedPdfLine] | ExtractedPdfLines,
+    bounds: XRange | YRange,
+    inside: bool,
+) -> List[ExtractedPdfLine] | ExtractedPdfLines:
+    arrays = ExtractedPdfLines.from_lines(lines)
+    centers = arrays.cx if isinstance(bounds, XRange) else arrays.cy
+    mask = bounds.mask(centers)
+    if not inside:
+        mask = ~mask
+    if isinstance(lines, ExtractedPdfLines):
+        return lines[mask]
+    return [lines[i] for i in np.flatnonzero(mask)]
+
+
 def select_inside(
-    lines: List[ExtractedPdfLine], bounds: XRange | YRange
-) -> List[ExtractedPdfLine]:
+    lines: List[ExtractedPdfLine] | ExtractedPdfLines, bounds: XRange | YRange
+) -> List[ExtractedPdfLine] | ExtractedPdfLines:
     """Select only lines inside a range
 
     Parameters
     ----------
-    lines : List[ExtractedPdfLine]
+    lines : List[ExtractedPdfLine] | ExtractedPdfLines
         lines to filter
     bounds : XRange | YRange
         area to filter from
 
     Returns
     -------
-    List[ExtractedPdfLine]
-        lines inside `bounds`
+    List[ExtractedPdfLine] | ExtractedPdfLines
+        lines inside `bounds`, of the same type of `lines`
     """
-    coord = 0 if isinstance(bounds, XRange) else 1
-    return [line for line in lines if line.c[coord] in bounds]
+    return _select_range(lines, bounds, True)
 
 
 def select_outside(
-    lines: List[ExtractedPdfLine], bounds: XRange | YRange
-) -> List[ExtractedPdfLine]:
+    lines: List[ExtractedPdfLine] | ExtractedPdfLines, bounds: XRange | YRange
+) -> List[ExtractedPdfLine] | ExtractedPdfLines:
     """Select only lines outside a range
 
     Parameters
     ----------
-    lines : List[ExtractedPdfLine]
+    lines : List[ExtractedPdfLine] | ExtractedPdfLines
         lines to filter
     bounds : XRange | YRange
         area to filter from
 
     Returns
     -------
-    List[ExtractedPdfLine]
-        lines outside `bounds`
+    List[ExtractedPdfLine] | ExtractedPdfLines
+        lines outside `bounds`, of the same type of `lines`
     """
-    coord = 0 if isinstance(bounds, XRange) else 1
-    return [line for line in lines if line.c[coord] not in bounds]
+    return _select_range(lines, bounds, False)
 
 
 class TablePosAlgorithm(Flag):
@@ -62,128 +76,419 @@ class TablePosMeasureUnit(Enum):
     PT = auto()
 
 
-def _area_position_algorithm(
-    ruler_geometry, test_geometry, algorithm_flags, abs_tolerance
-):
-    test_pos, test_bounds = test_geometry
-    ruler_pos, ruler_bounds = ruler_geometry
-    if TablePosAlgorithm.RULER_AREA in algorithm_flags:
-        match_pos = test_pos
-        min_bound, max_bound = ruler_bounds
+class _PrefixMax:
+    """Fenwick tree of the maximum of the values set at positions (-1 where not
+    set), queried on the prefixes of the positions"""
+
+    __slots__ = ("_tree",)
+
+    def __init__(self, size: int):
+        self._tree = [-1] * (size + 1)
+
+    def update(self, i: int, value: int):
+        tree = self._tree
+        i += 1
+        while i < len(tree):
+            if tree[i] < value:
+                tree[i] = value
+            i += i & -i
+
+    def query(self, n: int) -> int:
+        tree = self._tree
+        result = -1
+        while n > 0:
+            if result < tree[n]:
+                result = tree[n]
+            n -= n & -n
+        return result
+
+
+def _count_below(
+    sorted_values: np.ndarray, shifts: np.ndarray, limits: np.ndarray, strict: bool
+) -> np.ndarray:
+    """For each line, count the sorted values ``v`` with ``v + shift <= limit``
+    (``<`` if `strict`), evaluated exactly as the comparisons of the single values:
+    the search is done on ``limit - shift`` and moved across the values at the
+    boundary whose comparison is decided otherwise by the rounding"""
+    side = "left" if strict else "right"
+    if not shifts.any():
+        return np.searchsorted(sorted_values, limits, side)
+    compare = np.less if strict else np.less_equal
+    counts = np.searchsorted(sorted_values, limits - shifts, side)
+    n = len(sorted_values)
+    while True:
+        last = np.flatnonzero(counts > 0)
+        last = last[
+            ~compare(sorted_values[counts[last] - 1] + shifts[last], limits[last])
+        ]
+        first = np.flatnonzero(counts < n)
+        first = first[
+            compare(sorted_values[counts[first]] + shifts[first], limits[first])
+        ]
+        if len(last) == 0 and len(first) == 0:
+            return counts
+        counts[last] = np.searchsorted(
+            sorted_values, sorted_values[counts[last] - 1], "left"
+        )
+        counts[first] = np.searchsorted(
+            sorted_values, sorted_values[counts[first]], "right"
+        )
+
+
+def _ranks(values: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+    """Sort values, returning the sorted values and the rank of each value"""
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values), dtype=np.intp)
+    ranks[order] = np.arange(len(values))
+    return values[order], ranks.tolist()
+
+
+def _range_min(values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Minimum of ``values[start:stop]`` for each (non empty) range, on a sparse table"""
+    table = [values]
+    while 2 ** len(table) <= len(values):
+        half = 2 ** (len(table) - 1)
+        table.append(np.minimum(table[-1][:-half], table[-1][half:]))
+    levels = np.log2(stops - starts).astype(np.intp)
+    result = np.empty(len(starts), dtype=values.dtype)
+    for level in np.unique(levels).tolist():
+        selected = levels == level
+        row = table[level]
+        result[selected] = np.minimum(
+            row[starts[selected]], row[stops[selected] - 2**level]
+        )
+    return result
+
+
+def _match_ruler_positions(
+    positions: np.ndarray, low: np.ndarray, high: np.ndarray, sweep: List[int]
+) -> Tuple[List[int], np.ndarray]:
+    """Take the rulers and match the lines when a line matches a ruler if
+    the position of the ruler is between its `low` and `high`
+
+    The rulers a line matches are a range of the rulers sorted by position: the
+    line is a new ruler if the range is empty and its first ruler is the minimum
+    of the range
+    """
+    sorted_positions, ranks = _ranks(positions)
+    starts = np.searchsorted(sorted_positions, low, "left")
+    stops = np.searchsorted(sorted_positions, high, "right")
+    first, stop = starts.tolist(), stops.tolist()
+    ruler_ranks = []
+    rulers = []
+    for i in sweep:
+        k = bisect_left(ruler_ranks, first[i])
+        if k == len(ruler_ranks) or ruler_ranks[k] >= stop[i]:
+            # the rank of the line is in its own range, so it goes in k
+            ruler_ranks.insert(k, ranks[i])
+            rulers.append(i)
+    ruler_ranks = np.array(ruler_ranks)
+    indexes = _range_min(
+        np.argsort([ranks[i] for i in rulers]),
+        np.searchsorted(ruler_ranks, starts, "left"),
+        np.searchsorted(ruler_ranks, stops, "left"),
+    )
+    return rulers, indexes
+
+
+def _match_ruler_bounds(
+    min_bounds: np.ndarray,
+    max_bounds: np.ndarray,
+    points: List[np.ndarray],
+    abs_tolerance: np.ndarray,
+    sweep: List[int],
+) -> Tuple[List[int], np.ndarray]:
+    """Take the rulers and match the lines when a line matches a ruler if
+    one of its `points` is between the bounds of the ruler widened by its tolerance
+
+    The rulers a line matches through a point are the ones among the first P
+    of the rulers sorted by minimum bound and not among the first S of the ones
+    sorted by maximum bound: the maximum rank of the latter in a prefix of the
+    former (to check if the line is a new ruler) and the minimum order in which
+    the rulers were taken in the same set (to find its first ruler) are kept on
+    Fenwick trees
+    """
+    n = len(min_bounds)
+    sorted_min, min_rank = _ranks(min_bounds)
+    sorted_max, max_rank = _ranks(max_bounds)
+    tests = [
+        (
+            _count_below(sorted_min, -abs_tolerance, x, strict=False).tolist(),
+            _count_below(sorted_max, abs_tolerance, x, strict=True).tolist(),
+        )
+        for x in points
+    ]
+
+    taken = _PrefixMax(n)
+    rulers = []
+    for i in sweep:
+        for p, s in tests:
+            if taken.query(p[i]) >= s[i]:
+                break
+        else:
+            taken.update(min_rank[i], max_rank[i])
+            rulers.append(i)
+
+    # the first ruler is the one with the maximum of -(order in which it was taken)
+    by_min = sorted(range(len(rulers)), key=lambda k: min_rank[rulers[k]])
+    indexes = [len(rulers)] * n
+    for p, s in tests:
+        first = _PrefixMax(n)
+        inserted = 0
+        for i in sorted(range(n), key=p.__getitem__):
+            while inserted < len(by_min) and min_rank[rulers[by_min[inserted]]] < p[i]:
+                k = by_min[inserted]
+                first.update(n - 1 - max_rank[rulers[k]], len(rulers) - k)
+                inserted += 1
+            indexes[i] = min(indexes[i], len(rulers) - first.query(n - s[i]))
+    return rulers, np.array(indexes)
+
+
+def _table_geometry(
+    arrays: ExtractedPdfLines,
+    algorithm_flags: TablePosAlgorithm,
+    tolerance: float,
+    tolerance_mu: TablePosMeasureUnit,
+) -> Tuple[np.ndarray, ...]:
+    return_col = TablePosAlgorithm.ROW not in algorithm_flags
+    if return_col:
+        sizes, positions = arrays.widths, arrays.cx
+        min_bounds, max_bounds = arrays.x0, arrays.x1
     else:
-        match_pos = ruler_pos
-        min_bound, max_bound = test_bounds
-
-    return (min_bound - abs_tolerance) <= match_pos <= (max_bound + abs_tolerance)
-
-
-def _area_intersection_algorithm(
-    ruler_geometry, test_geometry, algorithm_flags, abs_tolerance
-):
-    test_bounds = test_geometry[1]
-    ruler_bounds = ruler_geometry[1]
-    min_bound_t, max_bound_t = test_bounds
-    min_bound_r, max_bound_r = ruler_bounds
-    return (
-        (min_bound_r - abs_tolerance) <= max_bound_t <= (max_bound_r + abs_tolerance)
-    ) or ((min_bound_r - abs_tolerance) <= min_bound_t <= (max_bound_r + abs_tolerance))
-
-
-def _algorithm_table_pos(ruler_geometry, test_geometry, algorithm_flags, abs_tolerance):
-    if (TablePosAlgorithm.RULER_AREA in algorithm_flags) and (
-        TablePosAlgorithm.TEST_POS not in algorithm_flags
-    ):
-        return _area_intersection_algorithm(
-            ruler_geometry, test_geometry, algorithm_flags, abs_tolerance
+        sizes, positions = arrays.heights, arrays.cy
+        min_bounds, max_bounds = arrays.y0, arrays.y1
+
+    abs_tolerance = np.zeros(len(arrays))
+    if tolerance_mu == TablePosMeasureUnit.PT:
+        abs_tolerance[:] = tolerance
+    elif tolerance_mu == TablePosMeasureUnit.PERC:
+        abs_tolerance = tolerance * arrays.widths if return_col else arrays.heights
+    elif tolerance_mu == TablePosMeasureUnit.EM:
+        abs_tolerance = tolerance * arrays.text_sizes
+    return sizes, positions, min_bounds, max_bounds, abs_tolerance
+
+
+def _ruler_order(sizes: np.ndarray, algorithm_flags: TablePosAlgorithm) -> np.ndarray:
+    # Rulers are taken from the first of the widest (or narrowest) lines
+    if TablePosAlgorithm.BIG_RULE in algorithm_flags:
+        return np.argsort(-sizes, kind="stable")
+    return np.argsort(sizes, kind="stable")
+
+
+def _cluster_table(
+    geometry: Tuple[np.ndarray, ...], algorithm_flags: TablePosAlgorithm
+) -> np.ndarray:
+    sizes, positions, min_bounds, max_bounds, abs_tolerance = geometry
+    sweep = _ruler_order(sizes, algorithm_flags).tolist()
+
+    if TablePosAlgorithm.RULER_AREA not in algorithm_flags:
+        rulers, indexes = _match_ruler_positions(
+            positions, min_bounds - abs_tolerance, max_bounds + abs_tolerance, sweep
         )
     else:
-        return _area_position_algorithm(
-            ruler_geometry, test_geometry, algorithm_flags, abs_tolerance
+        if TablePosAlgorithm.TEST_POS in algorithm_flags:
+            points = [positions]
+        else:
+            points = [max_bounds, min_bounds]
+        rulers, indexes = _match_ruler_bounds(
+            min_bounds, max_bounds, points, abs_tolerance, sweep
         )
 
+    # Sort rulers and create mapping
+    mapping = np.empty(len(rulers), dtype=np.intp)
+    mapping[np.argsort(positions[rulers], kind="stable")] = np.arange(len(rulers))
+    return mapping[indexes]
+
 
 def get_table_positions(
-    lines: List[ExtractedPdfLine],
+    lines: List[ExtractedPdfLine] | ExtractedPdfLines,
     algorithm_flags: TablePosAlgorithm = TablePosAlgorithm(0),
     tolerance: float = 0,
     tolerance_mu: TablePosMeasureUnit = TablePosMeasureUnit.EM,
 ) -> List[int]:
     """Compute either row or column indexes for areas in a tabular layout.
 
+    Rulers are taken one at a time, the widest (`TablePosAlgorithm.BIG_RULE`) or
+    the narrowest line not matching any previous ruler, and each line gets the
+    index of the first ruler it matches. Rulers are then numbered by position.
+    Since rulers are taken in order of width, they are all found in a single
+    sweep of the lines sorted by width, checking each line against the rulers
+    sorted by position (or bounds), in O(n log n) overall.
+
     Parameters
     ----------
-    return_columns : bool
-        Whether to return column indexes (True) or row indexes (False)
-    areas : list of Area
-        List of areas representing table cells
-    small_rule : bool
-        Whether to use smallest (True) or largest (False) dimension for rulers
-    use_ruler_pos : bool
-        Whether to use ruler position (True) or bounds (False) for classification
+    lines : List[ExtractedPdfLine] | ExtractedPdfLines
+        lines of the table
+    algorithm_flags : TablePosAlgorithm, optional
+        ROW to return row indexes instead of column ones, BIG_RULE to use the
+        biggest lines as rulers instead of the smallest, RULER_AREA to match
+        the lines against the bounds of the ruler instead of its position,
+        TEST_POS to match only the position of the lines against them,
+        by default none
+    tolerance : float, optional
+        tolerance of the matches, by default 0
+    tolerance_mu : TablePosMeasureUnit, optional
+        unit of measure of `tolerance`, by default `TablePosMeasureUnit.EM`
 
     Returns
     -------
     list of int
-        A list of indexes corresponding to each area
+        A list of indexes corresponding to each line
     """
-    # Initialize indexes
-    indexes = [None for _ in lines]
-    areas = [line.geometry for line in lines]
-    font_sizes = [line.text_size for line in lines]
-    rulers = []
-
-    # Choose min/max function based on small_rule
-    choose = max if TablePosAlgorithm.BIG_RULE in algorithm_flags else min
-    return_col = TablePosAlgorithm.ROW not in algorithm_flags
-    while None in indexes:
-        curr_idx = len(rulers)
-        # Get unindexed areas
-        unindexed = [
-            (i, area.width if return_col else area.height)
-            for i, area in enumerate(areas)
-            if indexes[i] is None
-        ]
+    arrays = ExtractedPdfLines.from_lines(lines)
+    if len(arrays) == 0:
+        return []
+    geometry = _table_geometry(arrays, algorithm_flags, tolerance, tolerance_mu)
+    return _cluster_table(geometry, algorithm_flags).tolist()
+
+
+class ColumnLayouts:
+    """Column layouts of the tables of a document, learned from the columns found by
+    `get_table_positions` on the first pages of each subfund (or of the document).
+
+    The layout of a table is the span of the centers of the lines of each of its
+    columns, learned once `learn_pages` consecutive pages give the same number of
+    columns with spans not overlapping. On the next pages, the column of each line
+    is found by binary search of its center among the midpoints between the learned
+    spans, if every line lies within `deviation` points from the span of its
+    column and matches (as in `get_table_positions`) the line that would be the
+    ruler of its column; otherwise the page is clustered again by
+    `get_table_positions` and the learning restarts from it. As with
+    `get_table_positions`, the columns used by the lines of a page are numbered
+    from 0.
+
+    Layouts are kept until `clear` is called, as
+    :py:func:`freeports_analysis.formats.pdf_filter_exec` does at the start of each
+    batch of pages for the layouts of its filter (`column_layouts` attribute),
+    so that the columns of a page depend only on the pages of its batch.
 
-        # Select ruler for this axis
-        ruler_idx, _ = choose(unindexed, key=lambda x: x[1])
-        ruler_area = areas[ruler_idx]
-
-        # Get ruler bounds and position
-        ruler_bounds = ruler_area.x_bounds if return_col else ruler_area.y_bounds
-        ruler_pos = ruler_area.c[0] if return_col else ruler_area.c[1]
-        rulers.append((curr_idx, ruler_pos))
-
-        # Classify areas
-
-        ruler_geometry = (ruler_pos, ruler_bounds)
-        for i, table_pos in enumerate(indexes):
-            if table_pos is not None:
-                continue
-            test_bounds = areas[i].x_bounds if return_col else areas[i].y_bounds
-            test_pos = areas[i].c[0] if return_col else areas[i].c[1]
-            test_geometry = (test_pos, test_bounds)
-            effective_tolerance = 0
-            if tolerance_mu == TablePosMeasureUnit.PT:
-                effective_tolerance = tolerance
-            elif tolerance_mu == TablePosMeasureUnit.PERC:
-                effective_tolerance = (
-                    tolerance * areas[i].width if return_col else areas[i].height
-                )
-            elif tolerance_mu == TablePosMeasureUnit.EM:
-                effective_tolerance = tolerance * font_sizes[i]
-
-            if _algorithm_table_pos(
-                ruler_geometry=ruler_geometry,
-                test_geometry=test_geometry,
-                algorithm_flags=algorithm_flags,
-                abs_tolerance=effective_tolerance,
-            ):
-                indexes[i] = curr_idx
+    Parameters
+    ----------
+    learn_pages : int
+        number of pages a layout is learned from
+    deviation : float, optional
+        maximum distance (in points) of the center of a line from the learned span
+        of its column, by default 6.0
 
-    # Sort rulers and create mapping
-    mapping = {
-        old: new for new, (old, _) in enumerate(sorted(rulers, key=lambda x: x[1]))
-    }
+    Attributes
+    ----------
+    hits : int
+        pages whose columns were found from a learned layout
+    misses : int
+        pages with a learned layout clustered again since deviating from it
+    """
 
-    # Apply mapping
-    return [mapping[idx] for idx in indexes]
+    def __init__(self, learn_pages: int, deviation: float = 6.0):
+        """Initialize an empty store of layouts
+
+        Parameters
+        ----------
+        learn_pages : int
+            number of pages a layout is learned from
+        deviation : float, optional
+            maximum distance (in points) of the center of a line from the learned
+            span of its column, by default 6.0
+        """
+        self.learn_pages = learn_pages
+        self.deviation = deviation
+        self.hits = 0
+        self.misses = 0
+        self._layouts: Dict[Hashable, Tuple[np.ndarray, np.ndarray, int]] = {}
+
+    def clear(self):
+        """Forget the learned layouts, for example at the start of a new batch
+        of pages"""
+        self._layouts.clear()
+
+    def _assign(self, layout, arrays: ExtractedPdfLines, geometry, algorithm_flags):
+        lows, highs, _ = layout
+        sizes, centers, min_bounds, max_bounds, abs_tolerance = geometry
+        cols = np.searchsorted((highs[:-1] + lows[1:]) / 2, centers)
+        fits = (centers >= lows[cols] - self.deviation) & (
+            centers <= highs[cols] + self.deviation
+        )
+        if not fits.all():
+            return None
+        # The first line of each column in the order of the rulers
+        sweep = _ruler_order(sizes, algorithm_flags)
+        used, first = np.unique(cols[sweep], return_index=True)
+        rulers = sweep[first][np.searchsorted(used, cols)]
+        min_bounds, max_bounds = min_bounds - abs_tolerance, max_bounds + abs_tolerance
+        if TablePosAlgorithm.RULER_AREA not in algorithm_flags:
+            ruler_pos = centers[rulers]
+            fits = (min_bounds <= ruler_pos) & (ruler_pos <= max_bounds)
+        else:
+            ruler_min = arrays.x0[rulers] - abs_tolerance
+            ruler_max = arrays.x1[rulers] + abs_tolerance
+            if TablePosAlgorithm.TEST_POS in algorithm_flags:
+                points = [centers]
+            else:
+                points = [arrays.x1, arrays.x0]
+            fits = np.zeros(len(cols), dtype=bool)
+            for point in points:
+                fits |= (ruler_min <= point) & (point <= ruler_max)
+        if not fits.all():
+            return None
+        return np.searchsorted(used, cols).tolist()
+
+    def _learn(self, key: Hashable, centers: np.ndarray, cols: np.ndarray):
+        order = np.argsort(cols, kind="stable")
+        starts = np.flatnonzero(np.diff(cols[order], prepend=-1))
+        lows = np.minimum.reduceat(centers[order], starts)
+        highs = np.maximum.reduceat(centers[order], starts)
+        n_cols = len(starts)
+        n_pages = 1
+        layout = self._layouts.get(key)
+        if layout is not None and len(layout[0]) == n_cols:
+            merged_lows = np.minimum(layout[0], lows)
+            merged_highs = np.maximum(layout[1], highs)
+            if np.all(merged_lows[1:] > merged_highs[:-1]):
+                lows, highs, n_pages = merged_lows, merged_highs, layout[2] + 1
+        self._layouts[key] = (lows, highs, n_pages)
+
+    def table_positions(
+        self,
+        key: Hashable,
+        lines: List[ExtractedPdfLine] | ExtractedPdfLines,
+        algorithm_flags: TablePosAlgorithm = TablePosAlgorithm(0),
+        tolerance: float = 0,
+        tolerance_mu: TablePosMeasureUnit = TablePosMeasureUnit.EM,
+    ) -> List[int]:
+        """Compute the column indexes of the lines of a table, from the layout learned
+        for it if any, otherwise by `get_table_positions` (learning from the result)
+
+        Parameters
+        ----------
+        key : Hashable
+            table the lines belong to, such as the subfund of the page
+        lines : List[ExtractedPdfLine] | ExtractedPdfLines
+            lines of the table
+        algorithm_flags : TablePosAlgorithm, optional
+            algorithm of `get_table_positions` (without `TablePosAlgorithm.ROW`),
+            by default none
+        tolerance : float, optional
+            tolerance of `get_table_positions`, by default 0
+        tolerance_mu : TablePosMeasureUnit, optional
+            unit of measure of `tolerance`, by default `TablePosMeasureUnit.EM`
+
+        Returns
+        -------
+        list of int
+            A list of column indexes corresponding to each line
+        """
+        arrays = ExtractedPdfLines.from_lines(lines)
+        if len(arrays) == 0:
+            return []
+        geometry = _table_geometry(arrays, algorithm_flags, tolerance, tolerance_mu)
+        centers = geometry[1]
+        layout = self._layouts.get(key)
+        if layout is not None and layout[2] >= self.learn_pages:
+            cols = self._assign(layout, arrays, geometry, algorithm_flags)
+            if cols is not None:
+                self.hits += 1
+                return cols
+            self.misses += 1
+            del self._layouts[key]
+        cols = _cluster_table(geometry, algorithm_flags)
+        self._learn(key, centers, cols)
+        return cols.tolist()
@@ -1,15 +1,56 @@
-"""Low level utilities for handling typographic related aspects of the xml tree."""
+"""Low level utilities for handling typographic related aspects of the xml tree.
+The functions accept also the native rappresentation of the page
+(:py:mod:`freeports_analysis.pdf_page`) in place of the xml tree, or the
+`LineIndex` of the page, in which case they are lookups in the index.
+"""
 
-from typing import List, Union
+from functools import lru_cache
+from typing import Iterable, List, Union
 from lxml import etree
+from freeports_analysis.pdf_page import PdfPage, PdfLine, page_lines
+from ..line_index import LineIndex
 
+FONT_NAMES = etree.XPath(".//font/@name")
+"""Compiled query of the font names of the runs of text of a line"""
 
-def is_present_txt_font(blk: etree.Element, txt: str, font: str) -> bool:
+FONT_SIZES = etree.XPath(".//font/@size")
+"""Compiled query of the text sizes of the runs of text of a line"""
+
+LINE_TEXT = etree.XPath(".//@text")
+"""Compiled query of the text of a line"""
+
+_LINES_WITH_TXT_FONT = etree.XPath(
+    "./descendant-or-self::line[contains(@text, $txt) and font[@name=$font]]"
+)
+
+
+@lru_cache
+def _lines_with_fonts_query(n_fonts: int) -> etree.XPath:
+    """Compile (only the first time) the query of the lines using one of `n_fonts`
+    fonts, passed as the variables ``font0``, ``font1``...
+
+    Parameters
+    ----------
+    n_fonts : int
+        number of fonts
+
+    Returns
+    -------
+    etree.XPath
+        compiled query
+    """
+    font_conditions = " or ".join(f"font[@name=$font{i}]" for i in range(n_fonts))
+    return etree.XPath(f"./descendant-or-self::line[{font_conditions}]")
+
+
+def is_present_txt_font(
+    blk: etree.Element | PdfPage | PdfLine | LineIndex, txt: str, font: str
+) -> bool:
     """Return if a certain pdf block with a specific text and font is present in the tree
 
     Parameters
     ----------
-    blk : etree.Element
+    blk : etree.Element | PdfPage | PdfLine | LineIndex
         tree to search in
     txt : str
         text to search
@@ -26,13 +67,16 @@ def is_present_txt_font(blk: etree.Element, txt: str, font: str) -> bool:
 
 
 def get_lines_with_txt_font(
-    blk: etree.Element, txt: str, font: str, all_elem: bool = False
-) -> List[etree.Element] | etree.Element:
+    blk: etree.Element | PdfPage | PdfLine | LineIndex,
+    txt: str,
+    font: str,
+    all_elem: bool = False,
+) -> List[etree.Element | PdfLine] | etree.Element | PdfLine:
     """Get lines with a certain txt and font
 
     Parameters
     ----------
-    blk : etree.Element
+    blk : etree.Element | PdfPage | PdfLine | LineIndex
         xml tree structure
     txt : str
         text to search for
@@ -44,39 +88,44 @@ def get_lines_with_txt_font(
 
     Returns
     -------
-    List[etree.Element] | etree.Element
+    List[etree.Element | PdfLine] | etree.Element | PdfLine
         matching lines
     """
-    blks = blk.xpath(
-        f"./descendant-or-self::line[contains(@text,'{txt}') and font[@name='{font}']]"
-    )
+    if isinstance(blk, LineIndex):
+        blks = [blk.lines[i] for i in blk.with_txt_font(txt, font)]
+    elif isinstance(blk, (PdfPage, PdfLine)):
+        blks = [ln for ln in page_lines(blk) if txt in ln.text and font in ln.fonts]
+    else:
+        blks = _LINES_WITH_TXT_FONT(blk, txt=txt, font=font)
     return blks if all_elem else blks[0] if len(blks) > 0 else None
 
 
 def get_lines_with_font(
-    blk: etree.Element, font: Union[str, List[str]]
-) -> List[etree.Element]:
+    blk: etree.Element | PdfPage | PdfLine | LineIndex, font: Union[str, Iterable[str]]
+) -> List[etree.Element | PdfLine]:
     """Return all the lines with certain font(s) in a tree
 
     Parameters
     ----------
-    blk : etree.Element
+    blk : etree.Element | PdfPage | PdfLine | LineIndex
         Tree from which to extract lines
-    font : Union[str, List[str]]
-        Font or list of fonts to extract
+    font : Union[str, Iterable[str]]
+        Font or fonts (list or set) to extract
 
     Returns
     -------
-    List[etree.Element]
+    List[etree.Element | PdfLine]
         List of relevant lines
     """
     if isinstance(font, str):
-        fonts = [font]
+        fonts = frozenset([font])
     else:
-        fonts = font
+        fonts = frozenset(font)
 
-    # Costruisci la condizione XPath per ogni font
-    font_conditions = " or ".join([f"font[@name='{f}']" for f in fonts])
-    xpath_query = f"./descendant-or-self::line[{font_conditions}]"
+    if isinstance(blk, LineIndex):
+        return [blk.lines[i] for i in blk.with_fonts(fonts)]
+    if isinstance(blk, (PdfPage, PdfLine)):
+        return [ln for ln in page_lines(blk) if not fonts.isdisjoint(ln.fonts)]
 
-    return blk.xpath(xpath_query)
+    query = _lines_with_fonts_query(len(fonts))
+    return query(blk, **{f"font{i}": f for i, f in enumerate(sorted(fonts))})
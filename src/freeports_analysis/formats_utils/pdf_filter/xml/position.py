@@ -3,14 +3,42 @@
 This module provides functions for working with PDF block elements (represented as lxml.etree.Element objects)
 that contain bounding box information. It includes utilities for checking spatial relationships,
 extracting coordinates, and calculating dimensions of PDF content blocks.
+The native lines of :py:mod:`freeports_analysis.pdf_page` can be used in place of
+the XML elements.
 """
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List
 from lxml import etree
+from freeports_analysis.pdf_page import PdfPage, PdfLine, page_lines
+from ..line_index import LineIndex
+
+_BBOX = etree.XPath(".//@bbox")
+
+
+def _get_bbox(blk: etree.Element | PdfPage | PdfLine) -> List[float] | None:
+    """Return the first bounding box found in a block (x0, y0, x1, y1)
+
+    Parameters
+    ----------
+    blk : etree.Element | PdfPage | PdfLine
+        block to search in
+
+    Returns
+    -------
+    List[float] | None
+        the bounding box, `None` if not present
+    """
+    if isinstance(blk, (PdfPage, PdfLine)):
+        lines = page_lines(blk)
+        return list(lines[0].bbox) if len(lines) > 0 else None
+    bbox = _BBOX(blk)
+    if not bbox:
+        return None
+    return [float(c) for c in bbox[0].split()]
 
 
 def is_contained(
-    blk: etree.Element,
+    blk: etree.Element | PdfPage | PdfLine,
     x_range: Optional[Tuple[float, float]] = None,
     y_range: Optional[Tuple[float, float]] = None,
 ) -> bool:
@@ -51,7 +79,7 @@ def is_contained(
     return True
 
 
-def get_bounds(blk: etree.Element) -> list | None:
+def get_bounds(blk: etree.Element | PdfPage | PdfLine) -> list | None:
     """Get the horizontal and vertical bounds of a block's bounding box.
 
     Parameters
@@ -65,16 +93,15 @@ def get_bounds(blk: etree.Element) -> list | None:
         A list containing two tuples representing horizontal (x0, x1) and vertical (y0, y1) bounds.
         Returns None if no 'bbox' attribute is found.
     """
-    bbox = blk.xpath(".//@bbox")
-    if not bbox:
+    coords = _get_bbox(blk)
+    if coords is None:
         return None
 
-    coords = [float(c) for c in bbox[0].split()]
     coords = ((coords[0], coords[2]), (coords[1], coords[3]))
     return coords
 
 
-def get_position(blk: etree.Element, mean: bool) -> list | None:
+def get_position(blk: etree.Element | PdfPage | PdfLine, mean: bool) -> list | None:
     """Return the coordinates or center of a bounding box from a PDF block element.
     Parameters
     ----------
@@ -90,12 +117,10 @@ def get_position(blk: etree.Element, mean: bool) -> list | None:
         Returns None if no 'bbox' attribute is found.
     """
 
-    bbox = blk.xpath(".//@bbox")
-    if not bbox:
+    coords = _get_bbox(blk)  # x0, y0, x1, y1
+    if coords is None:
         return None
 
-    coords = [float(c) for c in bbox[0].split()]  # x0, y0, x1, y1
-
     if mean:
         x_center = (coords[0] + coords[2]) / 2
         y_center = (coords[1] + coords[3]) / 2
@@ -109,7 +134,7 @@ def get_position(blk: etree.Element, mean: bool) -> list | None:
     return coords
 
 
-def get_size(blk: etree.Element) -> Tuple[float, float]:
+def get_size(blk: etree.Element | PdfPage | PdfLine) -> Tuple[float, float]:
     """Calculate the width and height of a block's bounding box.
 
     Parameters
@@ -127,7 +152,7 @@ def get_size(blk: etree.Element) -> Tuple[float, float]:
 
 
 def is_positioned(
-    blk: etree.Element,
+    blk: etree.Element | PdfPage | PdfLine,
     x_range: Optional[Tuple[float, float]] = None,
     y_range: Optional[Tuple[float, float]] = None,
 ) -> bool:
@@ -158,9 +183,14 @@ def is_positioned(
 
 
 def get_lines_contained(
-    blk: etree.Element,
+    blk: etree.Element | PdfPage | PdfLine | LineIndex,
     x_range: Optional[Tuple[float, float]] = None,
     y_range: Optional[Tuple[float, float]] = None,
 ):
-    lines = blk.findall(".//line")
+    if isinstance(blk, LineIndex):
+        lines = blk.lines
+    elif isinstance(blk, (PdfPage, PdfLine)):
+        lines = page_lines(blk)
+    else:
+        lines = blk.findall(".//line")
     return [ln for ln in lines if is_contained(ln, x_range, y_range)]
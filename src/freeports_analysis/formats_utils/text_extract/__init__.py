@@ -8,18 +8,21 @@ This module provides functionality for:
 
 Key components:
 - Matching functions (target_match, target_fuzzy_match, target_prefix_match)
+  and composable matchers (ExactMatch, PrefixMatch, FuzzyMatch, AllOf)
 - Decorators for text block type definition (one_txt_blk, EquityBondTextBlockType)
 - Standard text extraction functionality through standard_text_extraction decorator
 """
 
+from collections.abc import Sequence
 from enum import Enum, auto
+import copy
 import re
 import logging
-from typing import List, Optional
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
 from freeports_analysis.i18n import _
 from freeports_analysis.formats import TextBlock, PdfBlock
 from freeports_analysis.consts import Currency
-from .match import target_match
+from .match import target_match, Matcher, ExactMatch, TargetSet, CODE_REGEX
 from .. import normalize_string, overwrite_if_implemented
 
 logger = logging.getLogger(__name__)
@@ -40,6 +43,264 @@ class EquityBondTextBlockType(Enum):
     EQUITY_TARGET = auto()
 
 
+def _table_rows(pdf_blocks: List[PdfBlock]) -> List[int]:
+    """Return the row of the table of each block. The blocks come row by row and,
+    in each row, column by column (as the relative positions read by
+    `standard_text_extraction` assume), so a new row starts at each block whose
+    `table-col` is not after the one of the previous block.
+
+    Parameters
+    ----------
+    pdf_blocks : List[PdfBlock]
+        blocks of the table
+
+    Returns
+    -------
+    List[int]
+        index of the row of each block
+    """
+    rows = []
+    row = -1
+    prev_col = None
+    for blk in pdf_blocks:
+        col = blk.metadata["table-col"]
+        if prev_col is None or col <= prev_col:
+            row += 1
+        rows.append(row)
+        prev_col = col
+    return rows
+
+
+def _is_code_cell(content: str) -> bool:
+    """Whether a text is made only of codes (ISINs or LEIs), with no letters left
+    once the codes are removed
+
+    Parameters
+    ----------
+    content : str
+        text of a block
+
+    Returns
+    -------
+    bool
+        `True` if the text has no letters besides its codes
+    """
+    return not any(c.isalpha() for c in CODE_REGEX.sub("", content))
+
+
+def _matching_targets(
+    match_func, targets: TargetSet, pdf_blocks: List[PdfBlock]
+) -> Callable[[int, str], Iterator[str]]:
+    """Return a function that find the targets matching the text of a block. If the
+    targets carry codes (ISINs or LEIs), the codes are gathered from all the blocks
+    of each row of the table (see `_table_rows`), so that they can be in a column
+    of their own: a row containing codes is matched only once, on its anchor (its
+    first block with letters besides the codes, or its first block if it has
+    none), to the targets with those codes, or (by name, see `_matching_names`) to
+    the targets without any code; the other blocks of the row match nothing, and
+    the rows without codes are matched by name only.
+
+    Parameters
+    ----------
+    match_func : callable
+        Matching function to compare text against the names of the targets
+    targets : TargetSet
+        targets to match
+    pdf_blocks : List[PdfBlock]
+        blocks whose content will be matched
+
+    Returns
+    -------
+    Callable[[int, str], Iterator[str]]
+        function returning the targets that match the text of a block, given the
+        index of the block in `pdf_blocks` and the text
+    """
+    name_matches = _matching_names(match_func, targets, pdf_blocks)
+    if len(targets.codes) == 0:
+
+        def block_name_matches(i_block: int, content: str) -> Iterator[str]:
+            return name_matches(content)
+
+        return block_name_matches
+
+    rows = _table_rows(pdf_blocks)
+    row_texts = {}
+    row_anchors = {}
+    for i, (blk, row) in enumerate(zip(pdf_blocks, rows)):
+        content = blk.content
+        if CODE_REGEX.search(content) is not None:
+            row_texts.setdefault(row, []).append(content)
+        anchor = row_anchors.get(row)
+        if anchor is None or (
+            _is_code_cell(pdf_blocks[anchor].content) and not _is_code_cell(content)
+        ):
+            row_anchors[row] = i
+    # Codes of the targets found in each row, each target only once
+    row_targets = {
+        row: targets.match_codes(" ".join(texts)) for row, texts in row_texts.items()
+    }
+
+    def code_matches(i_block: int, content: str) -> Iterator[str]:
+        row = rows[i_block]
+        coded_targets = row_targets.get(row)
+        if coded_targets is None:
+            return name_matches(content)
+        if i_block != row_anchors[row]:
+            return iter(())
+        if len(coded_targets) > 0:
+            return iter(coded_targets)
+        return (t for t in name_matches(content) if t not in targets.codes)
+
+    return code_matches
+
+
+def _matching_names(
+    match_func, targets: TargetSet, pdf_blocks: List[PdfBlock]
+) -> Callable[[str], Iterator[str]]:
+    """Return a function that find the targets matching a text with `match_func`,
+    in the order of the targets. A text matches a target if it matches its name
+    or one of its aliases. For exact matching (`target_match` or an `ExactMatch`)
+    the automaton of the targets is used, so that each text is scanned only once;
+    for a `Matcher` that can screen (see `Matcher.screen`) all the texts that the
+    loop can compare (the content of each block, alone or joined with the next one
+    in the same column) are screened against all the targets at once. Any other
+    `match_func` is called with the text and each name or alias as written in the
+    list of targets (not normalized), skipping the ones normalized to nothing.
+
+    Parameters
+    ----------
+    match_func : callable
+        Matching function to compare text against targets
+    targets : TargetSet
+        targets to match
+    pdf_blocks : List[PdfBlock]
+        blocks whose content will be matched
+
+    Returns
+    -------
+    Callable[[str], Iterator[str]]
+        function returning the targets that match a text
+    """
+    patterns = targets.patterns
+    if match_func is target_match or isinstance(match_func, ExactMatch):
+        automaton = targets.automaton
+
+        def automaton_matches(content: str) -> Iterator[str]:
+            return targets.targets_of(automaton.matches(content))
+
+        return automaton_matches
+
+    if not isinstance(match_func, Matcher):
+        raw_patterns = targets.raw_patterns
+
+        def matches(content: str) -> Iterator[str]:
+            return targets.targets_of(
+                i
+                for i, pattern in enumerate(patterns)
+                if pattern != "" and match_func(content, raw_patterns[i])
+            )
+
+        return matches
+
+    texts = [blk.content for blk in pdf_blocks]
+    texts += [
+        blk.content + next_blk.content
+        for blk, next_blk in zip(pdf_blocks, pdf_blocks[1:])
+        if blk.metadata["table-col"] == next_blk.metadata["table-col"]
+    ]
+    candidates = match_func.screen(texts, patterns)
+
+    def screened_matches(content: str) -> Iterator[str]:
+        norm_content = normalize_string(content)
+        i_patterns = None
+        if candidates is not None:
+            i_patterns = candidates.get(norm_content)
+        if i_patterns is None:
+            i_patterns = range(len(patterns))
+        return targets.targets_of(
+            i
+            for i in i_patterns
+            if patterns[i] != ""
+            and match_func.match_normalized(norm_content, patterns[i])
+        )
+
+    return screened_matches
+
+
+class _MergedBlocks(Sequence):
+    """Read-only view of a list of blocks in which some blocks are merged with the
+    following one while the list is scanned from the beginning, without modifying
+    the list or its blocks. The view is made of the blocks already scanned (with the
+    merges done) followed by the ones still to scan, so that merging a block costs
+    as advancing past it.
+
+    Parameters
+    ----------
+    pdf_blocks : List[PdfBlock]
+        blocks to scan
+    """
+
+    def __init__(self, pdf_blocks: List[PdfBlock]):
+        """Initialize the view, with no block scanned
+
+        Parameters
+        ----------
+        pdf_blocks : List[PdfBlock]
+            blocks to scan
+        """
+        self._scanned: List[PdfBlock] = []
+        self._pdf_blocks = pdf_blocks
+        self._i_next = 0
+
+    @property
+    def current(self) -> PdfBlock:
+        """PdfBlock: first block still to scan"""
+        return self._pdf_blocks[self._i_next]
+
+    @property
+    def i_current(self) -> int:
+        """int: index in the list of blocks of the first block still to scan"""
+        return self._i_next
+
+    @property
+    def next(self) -> PdfBlock:
+        """PdfBlock: second block still to scan"""
+        return self._pdf_blocks[self._i_next + 1]
+
+    def advance(self):
+        """Scan the current block as it is"""
+        self._scanned.append(self._pdf_blocks[self._i_next])
+        self._i_next += 1
+
+    def merge(self, content: str):
+        """Scan the current block merged with the next one, as a copy
+        of the current block with a new content
+
+        Parameters
+        ----------
+        content : str
+            content of the merged block
+        """
+        merged = copy.copy(self._pdf_blocks[self._i_next])
+        merged.content = content
+        self._scanned.append(merged)
+        self._i_next += 2
+
+    def __len__(self) -> int:
+        return len(self._scanned) + len(self._pdf_blocks) - self._i_next
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(_("block index out of range"))
+        if i < len(self._scanned):
+            return self._scanned[i]
+        return self._pdf_blocks[i - len(self._scanned) + self._i_next]
+
+
 def standard_text_extraction_loop(match_func=target_match):
     """Decorator for standard text extraction loop.
 
@@ -53,12 +314,13 @@ def standard_text_extraction_loop(match_func=target_match):
       they are on the same column.
     - Use `match_func` to see if one between the target provided to the
       extraction function match with the content  of the block.
-    - If it does it overwrite the list of `PdfBlock` to persist the concatenation
-      of the block with is subsequent.
+    - If it does it persist the concatenation of the block with is subsequent
+      in a view of the list of `PdfBlock` (see `_MergedBlocks`), leaving the
+      list and its blocks untouched.
     - Add `company` metadata with the match
     - It create a `TextBlock` addint the metadata provided by the wrapped function.
       The wrapped function take as parameters the block list and the index
-      of the matched block. It takes the modified list with merged content
+      of the matched block. It takes the view with merged content
       for block in the same column that matches the target.
     """
 
@@ -67,42 +329,44 @@ def standard_text_extraction_loop(match_func=target_match):
             pdf_blocks: List[PdfBlock], targets: List[str]
         ) -> List[TextBlock]:
             text_part_list = []
-            i = 0
             if len(pdf_blocks) == 0:
                 return text_part_list
-            while True:
-                company_name = False
-                split = False
-                current_block = pdf_blocks[i]
-                next_block = pdf_blocks[i + 1]
-                col = current_block.metadata["table-col"]
-                next_col = next_block.metadata["table-col"]
+            matching_targets = _matching_targets(
+                match_func, TargetSet.of(targets), pdf_blocks
+            )
+            blocks = _MergedBlocks(pdf_blocks)
+            i = 0
+            while i < len(blocks) - 1:
+                current_block = blocks.current
+                next_block = blocks.next
+                split = (
+                    current_block.metadata["table-col"]
+                    == next_block.metadata["table-col"]
+                )
                 content = current_block.content
-                if col == next_col:
-                    split = True
-                    content += pdf_blocks[i + 1].content
-                for target in targets:
-                    target_n = normalize_string(target)
-                    if target_n != "" and match_func(content, target):
-                        company_name = True
-                        if company_name and split:
-                            pdf_blocks[i].content = content
-                            pdf_blocks.pop(i + 1)
-                        txt_blk = f(pdf_blocks, i)
-                        txt_blk.metadata["company"] = target
-                        text_part_list.append(txt_blk)
-                        break
+                if split:
+                    content += next_block.content
+                target = next(matching_targets(blocks.i_current, content), None)
+                if target is not None and split:
+                    blocks.merge(content)
+                else:
+                    blocks.advance()
+                if target is not None:
+                    txt_blk = f(blocks, i)
+                    txt_blk.metadata["company"] = target
+                    text_part_list.append(txt_blk)
                 i += 1
-                if i >= len(pdf_blocks) - 1:
-                    break
-            if i == len(pdf_blocks) - 1:
-                content = pdf_blocks[-1].content
-                for target in targets:
-                    target_n = normalize_string(target)
-                    if target_n != "" and match_func(content, target):
-                        txt_blk = f(pdf_blocks, i)
-                        txt_blk.metadata["company"] = target
-                        text_part_list.append(txt_blk)
+            if i == len(blocks) - 1:
+                content = blocks[-1].content
+                for target in matching_targets(len(pdf_blocks) - 1, content):
+                    txt_blk = f(blocks, i)
+                    txt_blk.metadata["company"] = target
+                    text_part_list.append(txt_blk)
+            if isinstance(match_func, Matcher):
+                logger.debug(
+                    _("Matcher counters (hits, rejects) so far: %s"),
+                    match_func.counters(),
+                )
             return text_part_list
 
         return text_extract
@@ -118,6 +382,86 @@ date_regexes = [
 perc_regexes = [r".*((\d+[\.,]\d+)\s*%).*"]
 
 
+class ExtractionPlan(NamedTuple):
+    """Settings of a text extraction made by `standard_text_extraction`, validated and
+    converted once (see `compile_extraction_plan`) in the form used on each row
+
+    Attributes
+    ----------
+    fields : Tuple[Tuple[str, int | str], ...]
+        metadata read for each matched row, in order: name of the metadata and
+        relative position of the block containing it or fixed value
+    perc_patterns : Tuple[re.Pattern, ...]
+        compiled `perc_regexes`
+    date_patterns : Tuple[re.Pattern, ...]
+        compiled `date_regexes`
+    """
+
+    fields: Tuple[Tuple[str, int | str], ...]
+    perc_patterns: Tuple[re.Pattern, ...]
+    date_patterns: Tuple[re.Pattern, ...]
+
+
+def compile_extraction_plan(
+    nominal_quantity_pos: int,
+    market_value_pos: int,
+    perc_net_assets_pos: int,
+    currency: Optional[int | Currency] = None,
+    acquisition_cost_pos: Optional[int] = None,
+) -> ExtractionPlan:
+    """Validate the settings of `standard_text_extraction` and convert them once in
+    the form used on each row, so that configuration errors are raised when the
+    format is imported
+
+    Parameters
+    ----------
+    nominal_quantity_pos : int
+        Relative position for nominal quantity metadata
+    market_value_pos : int
+        Relative position for market value metadata
+    perc_net_assets_pos : int
+        Relative position for percentage of net assets metadata
+    currency : Optional[Union[int, Currency]], optional
+        Either relative position for currency metadata or Currency enum value, by default None
+    acquisition_cost_pos : Optional[int], optional
+        Relative position for acquisition cost metadata, by default None
+
+    Returns
+    -------
+    ExtractionPlan
+        the plan of the text extraction
+
+    Raises
+    ------
+    ValueError
+        If the positions are zero or not different.
+    """
+    if nominal_quantity_pos * market_value_pos * perc_net_assets_pos == 0:
+        raise ValueError(_("All positions must be non-zero"))
+    if (
+        nominal_quantity_pos == market_value_pos
+        or nominal_quantity_pos == perc_net_assets_pos
+        or market_value_pos == perc_net_assets_pos
+    ):
+        raise ValueError(_("All positions should be different"))
+    fields = [
+        ("quantity", nominal_quantity_pos),
+        ("market value", market_value_pos),
+        ("% net assets", perc_net_assets_pos),
+    ]
+    if isinstance(currency, int):
+        fields.append(("currency", currency))
+    elif isinstance(currency, Currency):
+        fields.append(("currency", currency.name))
+    if acquisition_cost_pos is not None:
+        fields.append(("acquisition cost", acquisition_cost_pos))
+    return ExtractionPlan(
+        fields=tuple(fields),
+        perc_patterns=tuple(re.compile(r, re.DOTALL) for r in perc_regexes),
+        date_patterns=tuple(re.compile(r, re.DOTALL) for r in date_regexes),
+    )
+
+
 def standard_text_extraction(
     nominal_quantity_pos: int,
     market_value_pos: int,
@@ -149,6 +493,12 @@ def standard_text_extraction(
     callable
         A wrapped text extraction function that processes PDF blocks
         and returns matched TextBlock objects
+
+    Raises
+    ------
+    ValueError
+        If the positions are zero or not different, when the format is imported.
+
     Notes
     -----
     The decorated function can optionally be specified with
@@ -156,9 +506,18 @@ def standard_text_extraction(
     The extraction process:
     1. Normalizes and matches text against targets using the specified match_func
     2. Extracts metadata from surrounding blocks based on extract_positions
+       (validated once in an `ExtractionPlan`, `plan` attribute of the function)
     3. Creates TextBlock objects for successful matches
     """
 
+    plan = compile_extraction_plan(
+        nominal_quantity_pos,
+        market_value_pos,
+        perc_net_assets_pos,
+        currency,
+        acquisition_cost_pos,
+    )
+
     def wrapper(f):
         @overwrite_if_implemented(f)
         def add_metadata(blks: List[PdfBlock], i: int) -> dict:
@@ -166,45 +525,29 @@ def standard_text_extraction(
 
         @standard_text_extraction_loop(match_func)
         def text_extract(pdf_blocks: List[PdfBlock], i: int) -> TextBlock:
-            if nominal_quantity_pos * market_value_pos * perc_net_assets_pos == 0:
-                raise ValueError(_("All positions must be non-zero"))
-            if (
-                nominal_quantity_pos == market_value_pos
-                or nominal_quantity_pos == perc_net_assets_pos
-                or market_value_pos == perc_net_assets_pos
-            ):
-                raise ValueError(_("All positions should be different"))
-
             metadata = {}
             try:
                 metadata["subfund"] = pdf_blocks[i].metadata["subfund"]
                 metadata["page"] = pdf_blocks[i].metadata["page"]
-                metadata["quantity"] = pdf_blocks[i + nominal_quantity_pos].content
-                metadata["market value"] = pdf_blocks[i + market_value_pos].content
-                metadata["% net assets"] = pdf_blocks[i + perc_net_assets_pos].content
-                if isinstance(currency, int):
-                    metadata["currency"] = pdf_blocks[i + currency].content
-                elif isinstance(currency, Currency):
-                    metadata["currency"] = currency.name
-
-                if acquisition_cost_pos is not None:
-                    metadata["acquisition cost"] = pdf_blocks[
-                        i + acquisition_cost_pos
-                    ].content
+                for key, field in plan.fields:
+                    if isinstance(field, str):
+                        metadata[key] = field
+                    else:
+                        metadata[key] = pdf_blocks[i + field].content
             except IndexError as e:
                 logger.error(str(e))
                 return None
 
             content = pdf_blocks[i].content.replace("\n", "")
             instrument = EquityBondTextBlockType.EQUITY_TARGET
-            for reg in perc_regexes:
-                interest_rate_match = re.match(reg, content, re.DOTALL)
+            for pattern in plan.perc_patterns:
+                interest_rate_match = pattern.match(content)
                 if interest_rate_match:
                     instrument = EquityBondTextBlockType.BOND_TARGET
                     metadata["interest rate"] = interest_rate_match[1]
                     break
-            for reg in date_regexes:
-                date_match = re.match(reg, content, re.DOTALL)
+            for pattern in plan.date_patterns:
+                date_match = pattern.match(content)
                 if date_match:
                     instrument = EquityBondTextBlockType.BOND_TARGET
                     metadata["maturity"] = date_match[1]
@@ -213,6 +556,7 @@ def standard_text_extraction(
             metadata.update(add_metadata(pdf_blocks, i))
             return TextBlock(instrument, metadata, pdf_blocks[i])
 
+        text_extract.plan = plan
         return text_extract
 
     return wrapper
@@ -1,8 +1,31 @@
 """Functions for different target matching algorithms"""
 
+import logging
+import re
+from collections import deque
+from collections.abc import Sequence
 from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from rapidfuzz import fuzz, process
+from freeports_analysis.i18n import _
 from .. import normalize_string
 
+logger = logging.getLogger(__name__)
+
+SCREEN_TOLERANCE = 1e-3
+"""Margin (on the 0-100 scale of `rapidfuzz`) subtracted from the threshold of the
+screen of `FuzzyMatch`, so that rounding errors cannot discard a matching pair"""
+
+CODE_REGEX = re.compile(r"\b(?:[A-Z0-9]{18}[0-9]{2}|[A-Z]{2}[A-Z0-9]{9}[0-9])\b")
+"""Candidate security codes in a text: ISINs (country, 9 alphanumeric characters and
+check digit) and LEIs (18 alphanumeric characters and 2 check digits)"""
+
+INDEX_MIN_TARGETS = 1000
+"""Number of targets from which `FuzzyMatch` screens the texts only against the
+targets proposed by their `TargetIndex`, instead of against all of them"""
+
 
 def prefix_similarity(a: str, b: str) -> float:
     """Compute a similarity ratio from the beginning of the two strings.
@@ -90,3 +113,668 @@ def target_prefix_match(text: str, target: str, ratio: float) -> bool:
     text = normalize_string(text)
     target = normalize_string(target)
     return prefix_similarity(target, text) >= ratio
+
+
+class Matcher:
+    """Base class of the criteria to match a text against a target. Unlike plain
+    functions (and lambdas) they can be pickled, combined with `AllOf` in order
+    of `cost`, and keep count of the pairs they accepted (`hits`) and rejected
+    (`rejects`). Text and target are normalized once, before being compared.
+
+    Attributes
+    ----------
+    cost : int
+        rough cost of a comparison, cheaper criteria are checked first by `AllOf`
+    hits : int
+        number of pairs accepted
+    rejects : int
+        number of pairs rejected
+    """
+
+    cost: int = 0
+
+    def __init__(self):
+        """Initialize the counters"""
+        self.hits = 0
+        self.rejects = 0
+
+    def __call__(self, text: str, target: str) -> bool:
+        """Check if a text matches a target
+
+        Parameters
+        ----------
+        text : str
+            The input text to compare
+        target : str
+            The target string to compare against
+
+        Returns
+        -------
+        bool
+            True if the text matches the target, False otherwise
+        """
+        return self.match_normalized(normalize_string(text), normalize_string(target))
+
+    def match_normalized(self, text: str, target: str) -> bool:
+        """Check if an already normalized text matches an already normalized target,
+        updating the counters
+
+        Parameters
+        ----------
+        text : str
+            The normalized input text to compare
+        target : str
+            The normalized target string to compare against
+
+        Returns
+        -------
+        bool
+            True if the text matches the target, False otherwise
+        """
+        matched = self._match(text, target)
+        if matched:
+            self.hits += 1
+        else:
+            self.rejects += 1
+        return matched
+
+    def _match(self, text: str, target: str) -> bool:
+        raise NotImplementedError
+
+    def screen(
+        self, texts: List[str], targets: List[str]
+    ) -> Optional[Dict[str, List[int]]]:
+        """Find with a single vectorized call the targets that could match each text,
+        if the criterion supports it
+
+        Parameters
+        ----------
+        texts : List[str]
+            texts to compare
+        targets : List[str]
+            targets to compare against
+
+        Returns
+        -------
+        Optional[Dict[str, List[int]]]
+            for each normalized text, the indexes (in order) of the targets
+            that pass the screen, to be checked calling the instance;
+            `None` if the criterion cannot screen
+        """
+        return None
+
+    def counters(self) -> Dict[str, Tuple[int, int]]:
+        """Return the counters of the criterion (and of the ones it is made of)
+
+        Returns
+        -------
+        Dict[str, Tuple[int, int]]
+            hits and rejects of each criterion
+        """
+        return {repr(self): (self.hits, self.rejects)}
+
+
+class ExactMatch(Matcher):
+    """Match if the target is contained in the text, as `target_match`"""
+
+    cost = 1
+
+    def _match(self, text: str, target: str) -> bool:
+        return target in text
+
+    def __repr__(self) -> str:
+        return "ExactMatch()"
+
+
+class PrefixMatch(Matcher):
+    """Match if the similarity of the beginning of text and target is at least
+    `ratio`, as `target_prefix_match`
+
+    Parameters
+    ----------
+    ratio : float
+        The minimum similarity ratio threshold (0.0 to 1.0)
+    """
+
+    cost = 1
+
+    def __init__(self, ratio: float):
+        """Initialize the criterion
+
+        Parameters
+        ----------
+        ratio : float
+            The minimum similarity ratio threshold (0.0 to 1.0)
+        """
+        super().__init__()
+        self.ratio = ratio
+
+    def _match(self, text: str, target: str) -> bool:
+        return prefix_similarity(target, text) >= self.ratio
+
+    def __repr__(self) -> str:
+        return f"PrefixMatch({self.ratio})"
+
+
+class FuzzyMatch(Matcher):
+    """Match if the similarity of text and target (as computed by `SequenceMatcher`)
+    is at least `ratio`, as `target_fuzzy_match`. The similarity is bounded first
+    with the lengths of the strings and with the characters they have in common,
+    computing the full similarity only when the bounds are not enough.
+    It can screen many texts against many targets at once with
+    `rapidfuzz.process.cdist`: its ``fuzz.ratio`` counts the characters of the longest
+    common subsequence, never less than the ones matched by `SequenceMatcher`, so
+    a pair under the threshold for `rapidfuzz` cannot match.
+    With long lists of targets (at least `index_from`) each text is scored only
+    against the targets sharing at least a fraction `min_overlap` of their trigrams
+    with it, found with a `TargetIndex`: the screen is then not exact anymore, the
+    lower `min_overlap` the higher the recall.
+
+    Parameters
+    ----------
+    ratio : float
+        The minimum similarity ratio threshold (0.0 to 1.0)
+    min_overlap : float, optional
+        minimum fraction of the trigrams of a target found in a text for the pair
+        to be scored when the index is used (`0` to never use it), by default 0.3
+    index_from : int, optional
+        number of targets from which the index is used,
+        by default `INDEX_MIN_TARGETS`
+    audit : bool, optional
+        if the pairs pruned by the index are checked anyway, logging (and recording
+        in `missed`) the ones that match, by default `False`
+
+    Attributes
+    ----------
+    pruned : int
+        number of pairs pruned by the index
+    missed : List[Tuple[str, str]]
+        pairs (normalized text and target) pruned by the index that match,
+        recorded only if `audit`
+    """
+
+    cost = 3
+
+    def __init__(
+        self,
+        ratio: float,
+        min_overlap: float = 0.3,
+        index_from: int = INDEX_MIN_TARGETS,
+        audit: bool = False,
+    ):
+        """Initialize the criterion
+
+        Parameters
+        ----------
+        ratio : float
+            The minimum similarity ratio threshold (0.0 to 1.0)
+        min_overlap : float, optional
+            minimum fraction of the trigrams of a target found in a text for the
+            pair to be scored when the index is used (`0` to never use it),
+            by default 0.3
+        index_from : int, optional
+            number of targets from which the index is used,
+            by default `INDEX_MIN_TARGETS`
+        audit : bool, optional
+            if the pairs pruned by the index are checked anyway, logging (and
+            recording in `missed`) the ones that match, by default `False`
+        """
+        super().__init__()
+        self.ratio = ratio
+        self.min_overlap = min_overlap
+        self.index_from = index_from
+        self.audit = audit
+        self.pruned = 0
+        self.missed = []
+
+    def _match(self, text: str, target: str) -> bool:
+        matcher = SequenceMatcher(None, target, text)
+        return (
+            matcher.real_quick_ratio() >= self.ratio
+            and matcher.quick_ratio() >= self.ratio
+            and matcher.ratio() >= self.ratio
+        )
+
+    def screen(self, texts: List[str], targets: List[str]) -> Dict[str, List[int]]:
+        norm_texts = list(dict.fromkeys(normalize_string(t) for t in texts))
+        if len(norm_texts) == 0 or len(targets) == 0:
+            return {t: [] for t in norm_texts}
+        score_cutoff = self.ratio * 100 - SCREEN_TOLERANCE
+        if len(targets) < self.index_from or self.min_overlap <= 0:
+            scores = process.cdist(
+                norm_texts,
+                [normalize_string(t) for t in targets],
+                scorer=fuzz.ratio,
+                score_cutoff=score_cutoff,
+            )
+            return {t: row.nonzero()[0].tolist() for t, row in zip(norm_texts, scores)}
+        index = compile_index(tuple(targets))
+        candidates = {}
+        for text in norm_texts:
+            i_targets = index.candidates(text, self.min_overlap, self.ratio)
+            self.pruned += len(targets) - len(i_targets)
+            if self.audit:
+                self._audit(text, index.targets, i_targets)
+            if len(i_targets) == 0:
+                candidates[text] = []
+                continue
+            scores = process.cdist(
+                [text],
+                [index.targets[i] for i in i_targets],
+                scorer=fuzz.ratio,
+                score_cutoff=score_cutoff,
+            )
+            candidates[text] = [i_targets[j] for j in scores[0].nonzero()[0]]
+        return candidates
+
+    def _audit(self, text: str, norm_targets: List[str], i_targets: List[int]):
+        kept = set(i_targets)
+        for i, target in enumerate(norm_targets):
+            if i not in kept and target != "" and self._match(text, target):
+                self.missed.append((text, target))
+                logger.info(
+                    _("Fuzzy index pruned the matching target '%s' for '%s'"),
+                    target,
+                    text,
+                )
+
+    def __repr__(self) -> str:
+        return f"FuzzyMatch({self.ratio})"
+
+
+class AllOf(Matcher):
+    """Match if all the criteria match, checking them from the cheapest
+    and stopping at the first that rejects the pair
+
+    Parameters
+    ----------
+    *matchers : Matcher
+        criteria to check
+    """
+
+    def __init__(self, *matchers: Matcher):
+        """Initialize the criterion
+
+        Parameters
+        ----------
+        *matchers : Matcher
+            criteria to check
+        """
+        super().__init__()
+        self.matchers = sorted(matchers, key=lambda m: m.cost)
+        self.cost = sum(m.cost for m in matchers)
+
+    def _match(self, text: str, target: str) -> bool:
+        return all(m.match_normalized(text, target) for m in self.matchers)
+
+    def screen(
+        self, texts: List[str], targets: List[str]
+    ) -> Optional[Dict[str, List[int]]]:
+        for matcher in reversed(self.matchers):
+            candidates = matcher.screen(texts, targets)
+            if candidates is not None:
+                return candidates
+        return None
+
+    def counters(self) -> Dict[str, Tuple[int, int]]:
+        counters = super().counters()
+        for matcher in self.matchers:
+            counters |= matcher.counters()
+        return counters
+
+    def __repr__(self) -> str:
+        return f"AllOf({', '.join(repr(m) for m in self.matchers)})"
+
+
+class TargetAutomaton:
+    """Aho-Corasick automaton of a list of targets, finding with a single scan
+    of a normalized text all the normalized targets it contains, as `target_match`
+    would do on each target. The cost of a scan depends on the length of the text,
+    not on the number of targets.
+
+    Parameters
+    ----------
+    targets : List[str]
+        targets to search, empty ones (after normalization) are ignored
+    """
+
+    def __init__(self, targets: List[str]):
+        """Compile the automaton of the targets
+
+        Parameters
+        ----------
+        targets : List[str]
+            targets to search, empty ones (after normalization) are ignored
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for i_target, target in enumerate(targets):
+            state = 0
+            for c in normalize_string(target):
+                if c not in self._goto[state]:
+                    self._goto[state][c] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = self._goto[state][c]
+            if state != 0:
+                self._out[state] += (i_target,)
+
+        queue = deque(self._goto[0].values())
+        while len(queue) > 0:
+            state = queue.popleft()
+            for c, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail != 0 and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(c, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] += self._out[fail]
+
+    def matches(self, text: str) -> List[int]:
+        """Find the targets contained in a text, after normalizing both
+
+        Parameters
+        ----------
+        text : str
+            text to scan
+
+        Returns
+        -------
+        List[int]
+            indexes of the targets found, in the order of the list of targets
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = set()
+        state = 0
+        for c in normalize_string(text):
+            while state != 0 and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if out[state]:
+                found.update(out[state])
+        return sorted(found)
+
+
+@lru_cache(maxsize=8)
+def compile_targets(targets: Tuple[str, ...]) -> TargetAutomaton:
+    """Return the automaton of a list of targets, compiled only the first time
+    the same targets are requested
+
+    Parameters
+    ----------
+    targets : Tuple[str, ...]
+        targets to search
+
+    Returns
+    -------
+    TargetAutomaton
+        automaton of the targets
+    """
+    return TargetAutomaton(list(targets))
+
+
+class TargetIndex:
+    """Inverted index of the trigrams of a list of targets (normalized and padded
+    with a space at both ends, so that short words have trigrams too), to find
+    quickly the targets sharing enough trigrams with a text
+
+    Parameters
+    ----------
+    targets : List[str]
+        targets to index
+
+    Attributes
+    ----------
+    targets : List[str]
+        normalized targets
+    """
+
+    def __init__(self, targets: List[str]):
+        """Build the index of the targets
+
+        Parameters
+        ----------
+        targets : List[str]
+            targets to index
+        """
+        self.targets = [normalize_string(t) for t in targets]
+        postings: Dict[str, List[int]] = {}
+        n_trigrams = []
+        for i_target, target in enumerate(self.targets):
+            trigrams = _trigrams(target)
+            n_trigrams.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(i_target)
+        self._n_trigrams = np.array(n_trigrams)
+        self._lengths = np.array([len(t) for t in self.targets])
+        self._postings = {g: np.array(p) for g, p in postings.items()}
+
+    def candidates(
+        self, text: str, min_overlap: float, min_ratio: float = 0.0
+    ) -> List[int]:
+        """Find the targets sharing with a text at least a fraction of their trigrams
+        and whose length allows a similarity with the text of at least `min_ratio`
+        (``2 * min(len_a, len_b) / (len_a + len_b)`` bounds the similarity)
+
+        Parameters
+        ----------
+        text : str
+            text to search (normalized)
+        min_overlap : float
+            minimum fraction (0.0 to 1.0) of the trigrams of a target found in
+            the text, `0` to not filter on the trigrams
+        min_ratio : float, optional
+            minimum similarity ratio threshold (0.0 to 1.0), by default 0.0
+
+        Returns
+        -------
+        List[int]
+            indexes of the targets, in order
+        """
+        keep = 2 * np.minimum(self._lengths, len(text)) >= min_ratio * (
+            self._lengths + len(text)
+        )
+        if min_overlap > 0:
+            postings = [
+                self._postings[g] for g in _trigrams(text) if g in self._postings
+            ]
+            if len(postings) == 0:
+                return []
+            shared = np.bincount(np.concatenate(postings), minlength=len(self.targets))
+            keep &= (shared > 0) & (shared >= min_overlap * self._n_trigrams)
+        return keep.nonzero()[0].tolist()
+
+
+def _trigrams(string: str) -> set:
+    padded = f" {string} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=8)
+def compile_index(targets: Tuple[str, ...]) -> TargetIndex:
+    """Return the trigram index of a list of targets, built only the first time
+    the same targets are requested
+
+    Parameters
+    ----------
+    targets : Tuple[str, ...]
+        targets to index
+
+    Returns
+    -------
+    TargetIndex
+        index of the targets
+    """
+    return TargetIndex(list(targets))
+
+
+class TargetSet(Sequence):
+    """Targets of the analysis, as a sequence of their names normalized once when the
+    set is built. Each target can have aliases, other names under which it is
+    matched in the text; matching a name or an alias always gives the name of the
+    target. Targets can also carry the codes (ISINs and LEIs) of their securities,
+    looked up with a hash table in the codes found in the text (see `match_codes`).
+    Membership is checked with a hash set and the structures used to match
+    the targets (`TargetAutomaton` and `TargetIndex` of the names and aliases) are
+    built the first time they are needed in each process. Only names, aliases and
+    codes are pickled, so the set is cheap to send to the workers.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        names of the targets
+    aliases : Optional[Dict[str, Iterable[str]]], optional
+        aliases of the targets, by name, by default none
+    codes : Optional[Dict[str, Iterable[str]]], optional
+        ISINs and LEIs of the targets, by name, by default none
+
+    Attributes
+    ----------
+    names : Tuple[str, ...]
+        names of the targets
+    aliases : Dict[str, Tuple[str, ...]]
+        aliases of the targets that have some, by name
+    codes : Dict[str, Tuple[str, ...]]
+        codes of the targets that have some, by name
+    normalized : Tuple[str, ...]
+        normalized names of the targets
+    raw_patterns : Tuple[str, ...]
+        names and aliases as given (each name followed by its aliases)
+    patterns : Tuple[str, ...]
+        normalized `raw_patterns`
+    pattern_targets : Tuple[int, ...]
+        index of the target of each pattern
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        aliases: Optional[Dict[str, Iterable[str]]] = None,
+        codes: Optional[Dict[str, Iterable[str]]] = None,
+    ):
+        """Build the set of targets
+
+        Parameters
+        ----------
+        names : Iterable[str]
+            names of the targets
+        aliases : Optional[Dict[str, Iterable[str]]], optional
+            aliases of the targets, by name, by default none
+        codes : Optional[Dict[str, Iterable[str]]], optional
+            ISINs and LEIs of the targets, by name, by default none
+        """
+        self.names = tuple(names)
+        aliases = {} if aliases is None else aliases
+        self.aliases = {n: tuple(a) for n, a in aliases.items() if len(a) > 0}
+        codes = {} if codes is None else codes
+        self.codes = {n: tuple(c) for n, c in codes.items() if len(c) > 0}
+        self._build()
+
+    def _build(self):
+        self._names_set = frozenset(self.names)
+        i_targets = {name: i for i, name in reversed(list(enumerate(self.names)))}
+        self._code_targets = {
+            code: i_targets[name]
+            for name, codes in self.codes.items()
+            for code in codes
+        }
+        self.normalized = tuple(normalize_string(n) for n in self.names)
+        raw_patterns = []
+        pattern_targets = []
+        for i_target, name in enumerate(self.names):
+            for pattern in (name, *self.aliases.get(name, ())):
+                raw_patterns.append(pattern)
+                pattern_targets.append(i_target)
+        self.raw_patterns = tuple(raw_patterns)
+        self.patterns = tuple(normalize_string(p) for p in raw_patterns)
+        self.pattern_targets = tuple(pattern_targets)
+
+    @classmethod
+    def of(cls, targets: Iterable[str]) -> "TargetSet":
+        """Return `targets` if already a `TargetSet`, otherwise build one with them
+
+        Parameters
+        ----------
+        targets : Iterable[str]
+            names of the targets
+
+        Returns
+        -------
+        TargetSet
+            set of the targets
+        """
+        if isinstance(targets, cls):
+            return targets
+        return cls(targets)
+
+    @property
+    def automaton(self) -> TargetAutomaton:
+        """TargetAutomaton: automaton of the `patterns`"""
+        return compile_targets(self.patterns)
+
+    def targets_of(self, i_patterns: Iterable[int]) -> Iterator[str]:
+        """Return the names of the targets of some patterns, each only once and
+        in the order of the patterns
+
+        Parameters
+        ----------
+        i_patterns : Iterable[int]
+            indexes of the patterns, in order
+
+        Returns
+        -------
+        Iterator[str]
+            names of the targets
+        """
+        if len(self.aliases) == 0:
+            return (self.names[i] for i in i_patterns)
+        i_targets = dict.fromkeys(self.pattern_targets[i] for i in i_patterns)
+        return (self.names[i] for i in i_targets)
+
+    def match_codes(self, text: str) -> Optional[List[str]]:
+        """Find the targets whose codes are in a text
+
+        Parameters
+        ----------
+        text : str
+            text to search
+
+        Returns
+        -------
+        Optional[List[str]]
+            names of the targets, in order, `None` if the text contains no code
+            (the targets have to be searched by name)
+        """
+        codes = CODE_REGEX.findall(text)
+        if len(codes) == 0:
+            return None
+        i_targets = {self._code_targets.get(code) for code in codes}
+        i_targets.discard(None)
+        return [self.names[i] for i in sorted(i_targets)]
+
+    def __getitem__(self, i):
+        return self.names[i]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._names_set
+
+    def __getstate__(self):
+        return self.names, self.aliases, self.codes
+
+    def __setstate__(self, state):
+        self.names, self.aliases, self.codes = state
+        self._build()
+
+    def __repr__(self) -> str:
+        return f"TargetSet({len(self.names)} targets, {len(self.patterns)} patterns)"
@@ -13,12 +13,16 @@ Example:
 import os
 import re
 import tarfile
+import tempfile
 import shutil
 import logging as log
-from typing import List
+from enum import Enum, auto
+from itertools import islice
+from typing import List, Dict, Iterator, Tuple, Callable, Optional, Set
 from multiprocessing import Pool
+from queue import SimpleQueue
 import csv
-from lxml import etree
+from pathlib import Path
 import pymupdf as pypdf
 import pandas as pd
 from importlib_resources import files
@@ -36,11 +40,15 @@ from freeports_analysis.consts import (
     STANDARD_LOG_FORMATTER,
     STANDARD_LOG_FORMATTER_MP,
 )
+from freeports_analysis.pdf_page import PdfPage, FontInventory, get_textpage
+from freeports_analysis.cache import PageCache, file_digest, format_digest
 from freeports_analysis.formats import (
+    PdfBlock,
     pdf_filter_exec,
     text_extract_exec,
     deserialize_exec,
 )
+from freeports_analysis.formats_utils.text_extract.match import TargetSet, CODE_REGEX
 from freeports_analysis.conf_parse import (
     apply_config,
     log_config,
@@ -59,6 +67,17 @@ stderr_log.setFormatter(STANDARD_LOG_FORMATTER)
 logger.addHandler(stderr_log)
 
 
+PAGES_PER_TASK = 8
+"""Number of pages processed by a worker in a single task. Tasks are handed to
+the first free worker, so small tasks keep all the workers busy even when the
+relevant pages are concentrated in a section of the report"""
+
+JOBS_AHEAD = 2
+"""Maximum number of reports prepared (downloaded and hashed) whose batches are
+not all processed yet: the next report is prepared while the batches of the
+previous ones are processed, without keeping all the reports on disk"""
+
+
 class NoPDFormatDetected(Exception):
     """Exception that should rise when the script is not
     capable of detecting a PDF format to use to decode the
@@ -66,56 +85,261 @@ class NoPDFormatDetected(Exception):
     """
 
 
-def pipeline_batch(
-    batch_pages: List[str],
-    i_page_batch: int,
+class DocumentChanged(Exception):
+    """Exception that should rise when a report fetched to process
+    some of its pages is not the one whose digest was stored in
+    the cache (the report at its url changed)
+    """
+
+
+def _pdf_pages(
+    pdf_path: Path,
+    start_page: int,
+    end_page: int,
+    page_screen: Optional[Callable[[str], bool]] = None,
+    font_screen: Optional[Callable[[Set[str]], bool]] = None,
+    page_clip: Optional[Tuple[Optional[float], Optional[float]]] = None,
+) -> Iterator[PdfPage | None]:
+    """Lazily extract the text of a range of pages of a pdf file
+
+    Parameters
+    ----------
+    pdf_path : Path
+        pdf file on disk
+    start_page : int
+        first page to extract (0-based index)
+    end_page : int
+        page at which to stop (excluded)
+    page_screen : Optional[Callable[[str], bool]], optional
+        pre-screen applied on the plain text of each page, the lines of
+        the pages failing it are not extracted, by default no pre-screen
+    font_screen : Optional[Callable[[Set[str]], bool]], optional
+        pre-screen applied on the fonts used by each page before extracting
+        any text, by default no pre-screen
+    page_clip : Optional[Tuple[Optional[float], Optional[float]]], optional
+        vertical band (top, bottom) of the pages to extract, by default
+        the whole page
+
+    Yields
+    ------
+    PdfPage | None
+        native rappresentation of each page, `None` if discarded by a pre-screen
+    """
+    with pypdf.Document(pdf_path) as pdf_file:
+        font_inventory = FontInventory(pdf_file)
+        for i in range(start_page, end_page):
+            if font_screen is not None:
+                page_fonts = font_inventory.page_fonts(i)
+                if page_fonts is not None and not font_screen(page_fonts):
+                    yield None
+                    continue
+            page = pdf_file[i]
+            textpage = get_textpage(page, page_clip)
+            if page_screen is not None and not page_screen(textpage.extractText()):
+                yield None
+            else:
+                yield PdfPage.from_pymupdf(page, textpage)
+
+
+class _PreloadedFormat:
+    """Format-specific functions of a format, with the options of its pre-screens,
+    looked up once for each process
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module containing format-specific parsing functions
+    """
+
+    __slots__ = (
+        "pdf_filter",
+        "text_extract",
+        "deserialize",
+        "page_screen",
+        "font_screen",
+        "page_clip",
+    )
+
+    def __init__(self, module_name: str):
+        """Import the module of the format and read its options
+
+        Parameters
+        ----------
+        module_name : str
+            Name of the module containing format-specific parsing functions
+        """
+        module = _get_module(module_name)
+        self.pdf_filter = module.pdf_filter
+        self.text_extract = module.text_extract
+        self.deserialize = module.deserialize
+        self.page_screen = getattr(module.pdf_filter, "page_screen", None)
+        self.font_screen = getattr(module.pdf_filter, "font_screen", None)
+        self.page_clip = getattr(module.pdf_filter, "page_clip", None)
+        if self.page_clip is not None:
+            self.page_clip = tuple(self.page_clip)
+
+
+_worker_targets: TargetSet = TargetSet([])
+_worker_formats: Dict[str, _PreloadedFormat] = {}
+_worker_cache: Optional[PageCache] = None
+
+
+def _init_worker(targets: TargetSet, cache: Optional[PageCache] = None):
+    """Initialize a process executing `pipeline_batch`, loading the targets and
+    all the formats once, so that each task only has to carry the pages to process
+
+    Parameters
+    ----------
+    targets : TargetSet
+        relevant companies to extract from the reports
+    cache : Optional[PageCache], optional
+        cache of the results of the batches of pages, by default no cache
+    """
+    global _worker_targets, _worker_cache
+    _worker_targets = targets
+    _worker_cache = cache
+    for pdf_format in PdfFormats:
+        _preloaded_format(pdf_format.name)
+
+
+def _preloaded_format(module_name: str) -> _PreloadedFormat:
+    """Return the format-specific functions of a format, loading them
+    the first time they are requested by the process
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module containing format-specific parsing functions
+
+    Returns
+    -------
+    _PreloadedFormat
+        functions and options of the format
+    """
+    if module_name not in _worker_formats:
+        _worker_formats[module_name] = _PreloadedFormat(module_name)
+    return _worker_formats[module_name]
+
+
+def filter_batch(
+    pdf_path: Path,
+    start_page: int,
+    end_page: int,
     n_pages: int,
-    targets: List[str],
     module_name: str,
-) -> List[FinancialData | PromisesResolutionContext]:
-    """Apply the pipeline of actions in order to get financial data from PDF pages
+) -> List[PdfBlock]:
+    """First stage of `pipeline_batch`: extract the relevant blocks of the PDF pages.
+    The pages are read and decoded by the process executing the function, so
+    that only the location of the document has to be shared with it.
 
     Parameters
     ----------
-    batch_pages : List[str]
-        List of XML strings representing PDF pages to process
-    i_page_batch : int
-        Starting page number of this batch (1-based index)
+    pdf_path : Path
+        PDF file on disk containing the pages to process
+    start_page : int
+        First page of this batch (0-based index)
+    end_page : int
+        Page at which this batch stops (excluded)
     n_pages : int
         Total number of pages in the document
-    targets : List[str]
-        List of relevant company names to extract from the report
     module_name : str
         Name of the module containing format-specific parsing functions
 
     Returns
     -------
-    List[FinancialData | PromisesResolutionContext]
-        List of extracted financial data objects or promise resolution contexts
+    List[PdfBlock]
+        relevant blocks of the pages, with their metadata
     """
-    end_page_batch = i_page_batch + len(batch_pages)
-    logger.info(
-        _("Starting batch form page %i to %i"),
-        i_page_batch,
-        end_page_batch,
-    )
-    parser = etree.XMLParser(recover=True)
-    xml_roots = [etree.fromstring(page, parser=parser) for page in batch_pages]
-    module = _get_module(module_name)
+    i_page_batch = start_page + 1
     logger.info(
         _("Extracting relevant blocks of pdf from page %i to %i..."),
         i_page_batch,
-        end_page_batch,
+        end_page + 1,
     )
-    pdf_blocks = pdf_filter_exec(xml_roots, i_page_batch, n_pages, module.pdf_filter)
+    pdf_format = _preloaded_format(module_name)
+    pages = _pdf_pages(
+        pdf_path,
+        start_page,
+        end_page,
+        pdf_format.page_screen,
+        pdf_format.font_screen,
+        pdf_format.page_clip,
+    )
+    return pdf_filter_exec(pages, i_page_batch, n_pages, pdf_format.pdf_filter)
+
+
+def deserialize_batch(
+    pdf_blocks: List[PdfBlock], start_page: int, end_page: int, module_name: str
+) -> List[FinancialData | PromisesResolutionContext]:
+    """Second stage of `pipeline_batch`: get the financial data from the relevant blocks
+    of the PDF pages, using the targets loaded by `_init_worker`. It depends only on
+    the blocks, so it can be replayed on the blocks stored by a previous run.
+
+    Parameters
+    ----------
+    pdf_blocks : List[PdfBlock]
+        relevant blocks of the pages, as returned by `filter_batch`
+    start_page : int
+        First page of this batch (0-based index)
+    end_page : int
+        Page at which this batch stops (excluded)
+    module_name : str
+        Name of the module containing format-specific parsing functions
+
+    Returns
+    -------
+    List[FinancialData | PromisesResolutionContext]
+        List of extracted financial data objects or promise resolution contexts
+    """
     logger.info(
         _("Filtering relevant blocks of text from page %i to %i..."),
-        i_page_batch,
-        end_page_batch,
+        start_page + 1,
+        end_page + 1,
+    )
+    pdf_format = _preloaded_format(module_name)
+    filtered_text = text_extract_exec(
+        pdf_blocks, _worker_targets, pdf_format.text_extract
     )
-    filtered_text = text_extract_exec(pdf_blocks, targets, module.text_extract)
-    results = deserialize_exec(filtered_text, targets, module.deserialize)
-    return results
+    return deserialize_exec(filtered_text, _worker_targets, pdf_format.deserialize)
+
+
+def pipeline_batch(
+    pdf_path: Path,
+    start_page: int,
+    end_page: int,
+    n_pages: int,
+    module_name: str,
+) -> List[FinancialData | PromisesResolutionContext]:
+    """Apply the pipeline of actions in order to get financial data from PDF pages.
+    The pages are read and decoded by the process executing the function, so
+    that only the location of the document has to be shared with it. The targets
+    and the format-specific functions are the ones loaded by `_init_worker`.
+
+    Parameters
+    ----------
+    pdf_path : Path
+        PDF file on disk containing the pages to process
+    start_page : int
+        First page of this batch (0-based index)
+    end_page : int
+        Page at which this batch stops (excluded)
+    n_pages : int
+        Total number of pages in the document
+    module_name : str
+        Name of the module containing format-specific parsing functions
+
+    Returns
+    -------
+    List[FinancialData | PromisesResolutionContext]
+        List of extracted financial data objects or promise resolution contexts
+    """
+    logger.info(
+        _("Starting batch form page %i to %i"),
+        start_page + 1,
+        end_page + 1,
+    )
+    pdf_blocks = filter_batch(pdf_path, start_page, end_page, n_pages, module_name)
+    return deserialize_batch(pdf_blocks, start_page, end_page, module_name)
 
 
 def batch_job_confs(config: dict) -> List[dict]:
@@ -147,17 +371,18 @@ def batch_job_confs(config: dict) -> List[dict]:
     return result
 
 
-def get_targets() -> List[str]:
-    """Read target names from a CSV file and return them as a list.
+def get_targets() -> TargetSet:
+    """Read target names from a CSV file and return them as a `TargetSet`.
 
-    Reads the first column of 'target.csv' (excluding header row) and returns
-    the values as a list of strings. The file is expected to be in the package's
-    data directory.
+    Reads the first column of 'target.csv' (excluding header row) as the names
+    of the targets, the non-empty cells following the name (if any) as its codes
+    (the ones that look like ISINs or LEIs, see `CODE_REGEX`) and aliases.
+    The file is expected to be in the package's data directory.
 
     Returns
     -------
-    List[str]
-        list of target names extracted from the CSV file.
+    TargetSet
+        targets extracted from the CSV file.
 
     Raises
     ------
@@ -166,33 +391,110 @@ def get_targets() -> List[str]:
     IndexError
         If the CSV file is empty or malformed.
     """
-    targets = []
     with files(data).joinpath("target.csv").open("r") as f:
         target_csv = csv.reader(f)
-        targets = [row[0] for row in target_csv if row]  # Skip empty rows
-        targets.pop(0)  # Remove header
-    return targets
+        rows = [row for row in target_csv if row]  # Skip empty rows
+        rows.pop(0)  # Remove header
+    names = [row[0] for row in rows]
+    aliases = {}
+    codes = {}
+    for name, *others in rows:
+        others = [o.strip() for o in others if o.strip()]
+        aliases[name] = [o for o in others if not CODE_REGEX.fullmatch(o)]
+        codes[name] = [o for o in others if CODE_REGEX.fullmatch(o)]
+    return TargetSet(names, aliases, codes)
 
 
-def _get_document(config):
+def _is_local(config) -> bool:
+    """Whether the pdf of a job is read from the local file, instead of downloaded
+
+    Parameters
+    ----------
+    config : dict
+        job configuration
+
+    Returns
+    -------
+    bool
+        `True` if the local pdf file is used
+    """
+    return config["URL"] is None or config["PDF"] is not None and config["PDF"].exists()
+
+
+def _detect_format(url: str) -> Optional[PdfFormats]:
+    """Detect the format of a report from its url
+
+    Parameters
+    ----------
+    url : str
+        url of the report
+
+    Returns
+    -------
+    Optional[PdfFormats]
+        format matching the url, `None` if not detected
+    """
+    for fmt in PdfFormats.__members__:
+        for reg in PdfFormats.__members__[fmt].value:
+            if bool(re.search(reg, url)):
+                return PdfFormats.__members__[fmt]
+    return None
+
+
+def _document_key(config) -> str:
+    """Identity of the pdf of a job in the cache, known without downloading or
+    opening it: its url if downloaded, otherwise its path with its size and
+    modification time
+
+    Parameters
+    ----------
+    config : dict
+        job configuration
+
+    Returns
+    -------
+    str
+        key of the document
+    """
+    if not _is_local(config):
+        return f"url:{config['URL']}"
+    stat = config["PDF"].stat()
+    return f"file:{config['PDF'].resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _get_document(config) -> Tuple[Path, PdfFormats, bool]:
+    """Locate the pdf to process on disk, downloading it if needed
+
+    Parameters
+    ----------
+    config : dict
+        job configuration
+
+    Returns
+    -------
+    Tuple[Path, PdfFormats, bool]
+        path of the pdf file, format detected from the url (`None` if not detected)
+        and whether the file is a temporary copy to remove at the end of the job
+    """
     detected_format = None
-    if config["URL"] is None or config["PDF"] is not None and config["PDF"].exists():
+    temporary = False
+    if _is_local(config):
         logger.debug(_("Local PDF file used %s"), config["PDF"])
-        pdf_file = pypdf.Document(config["PDF"])
+        pdf_path = config["PDF"]
     else:
-        for fmt in PdfFormats.__members__:
-            for reg in PdfFormats.__members__[fmt].value:
-                if bool(re.search(reg, config["URL"])):
-                    detected_format = PdfFormats.__members__[fmt]
-                    break
+        detected_format = _detect_format(config["URL"])
         log_string = _("Remote URL %s/%s used [detected %s format]")
         logger.debug(log_string, config["URL"], config["PDF"], detected_format.name)
-        pdf_file = pypdf.Document(
-            stream=dw.download_pdf(
-                config["URL"], config["PDF"] if config["SAVE_PDF"] else None
-            )
-        )
-    return pdf_file, detected_format
+        save_pdf = config["PDF"] is not None and config["SAVE_PDF"]
+        pdf_stream = dw.download_pdf(config["URL"], config["PDF"] if save_pdf else None)
+        if save_pdf:
+            pdf_path = config["PDF"]
+        else:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                f.write(pdf_stream.getvalue())
+            pdf_path = Path(f.name)
+            temporary = True
+    return pdf_path, detected_format, temporary
 
 
 def _output_file(config, results):
@@ -258,66 +560,369 @@ def _update_format(config, detected_format):
     return format_pdf
 
 
-def _main_job(config, n_workers):
-    validate_conf(config)
-    logger.debug(_("Starting job with configuration %s"), str(config))
-    pdf_file, format_pdf = _get_document(config)
-    format_pdf = _update_format(config, format_pdf)
-    prefix_out = config["PREFIX_OUT"]
-    logger.debug(_("Starting decoding pdf to xml..."))
-    pdf_file_xml = [page.get_text("xml").encode() for page in pdf_file]
-    logger.debug(_("End decoding pdf to xml!"))
+def _stream_batches(pdf_path: Path, n_pages: int, module_name: str) -> Iterator[tuple]:
+    """Lazily produce the arguments of `pipeline_batch`, each task covering
+    `PAGES_PER_TASK` pages
+
+    Parameters
+    ----------
+    pdf_path : Path
+        pdf file on disk
+    n_pages : int
+        Total number of pages in the document
+    module_name : str
+        Name of the module containing format-specific parsing functions
+
+    Yields
+    ------
+    tuple
+        arguments for a `pipeline_batch` call
+    """
+    for start_idx in range(0, n_pages, PAGES_PER_TASK):
+        end_idx = min(start_idx + PAGES_PER_TASK, n_pages)
+        yield (pdf_path, start_idx, end_idx, n_pages, module_name)
+
+
+class _CacheLookup(Enum):
+    """What was found in the cache for a batch of pages"""
+
+    MISS = auto()
+    BLOCKS = auto()
+    RESULTS = auto()
+
+
+class _Job:
+    """A report to process, collecting the results of its batches of pages
+    (that can arrive in any order) and putting them back in page order
+
+    Parameters
+    ----------
+    config : dict
+        configuration of the job
+    """
+
+    def __init__(self, config: dict, cache: Optional[PageCache] = None):
+        """Validate the configuration of the job and locate its document. With a
+        cache, a document already in it is not fetched (downloaded if remote) nor
+        opened until a batch needs its pages, see `fetch`
+
+        Parameters
+        ----------
+        config : dict
+            configuration of the job
+        cache : Optional[PageCache], optional
+            cache in which the document and the results of the batches can be
+            looked up, by default no cache
+        """
+        validate_conf(config)
+        logger.debug(_("Starting job with configuration %s"), str(config))
+        self._config = config
+        self._cache = cache
+        detected_format = None
+        if not _is_local(config):
+            detected_format = _detect_format(config["URL"])
+        self.format_pdf = _update_format(config, detected_format)
+        self.prefix_out = config["PREFIX_OUT"]
+        self.pdf_path = None
+        self._temporary = False
+        self.pdf_digest = None
+        document = None
+        if cache is not None:
+            self._document_key = _document_key(config)
+            document = cache.get_document(self._document_key)
+        if document is None:
+            self.fetch()
+        else:
+            logger.debug(_("Document of the job found in the cache, not fetched"))
+            self.pdf_digest, self.n_pages = document
+        self.n_batches = -(-self.n_pages // PAGES_PER_TASK)
+        self.cache_lookups = {lookup: 0 for lookup in _CacheLookup}
+        self.promises_resolution_map = {}
+        self.results = []
+        self._waiting = {}
+        self._i_next = 0
+
+    def fetch(self):
+        """Locate the document on disk (downloading it if needed) and count its
+        pages, if not done yet; with a cache, hash it and store its digest and
+        number of pages in the cache
+
+        Raises
+        ------
+        DocumentChanged
+            if the document is not the one stored in the cache (the report at the
+            url changed): the cache is updated, so running the job again uses the
+            new document
+        """
+        if self.pdf_path is not None:
+            return
+        self.pdf_path, _detected, self._temporary = _get_document(self._config)
+        with pypdf.Document(self.pdf_path) as pdf_file:
+            n_pages = len(pdf_file)
+        if self._cache is None:
+            self.n_pages = n_pages
+            return
+        pdf_digest = file_digest(self.pdf_path)
+        self._cache.put_document(self._document_key, pdf_digest, n_pages)
+        if self.pdf_digest is not None and self.pdf_digest != pdf_digest:
+            raise DocumentChanged(
+                _("Document {} changed since it was stored in the cache").format(
+                    self._document_key
+                )
+            )
+        self.pdf_digest, self.n_pages = pdf_digest, n_pages
+
+    @property
+    def done(self) -> bool:
+        """If the results of all the batches have been collected"""
+        return self._i_next == self.n_batches
+
+    def batches(self) -> Iterator[tuple]:
+        """Arguments of the `pipeline_batch` calls needed by the job
+
+        Returns
+        -------
+        Iterator[tuple]
+            arguments of each `pipeline_batch` call
+        """
+        return _stream_batches(self.pdf_path, self.n_pages, self.format_pdf.name)
+
+    def collect(
+        self,
+        i_batch: int,
+        batch_results: List[FinancialData | PromisesResolutionContext],
+        lookup: _CacheLookup = _CacheLookup.MISS,
+    ):
+        """Collect the results of a batch of pages
+
+        Parameters
+        ----------
+        i_batch : int
+            index of the batch in the job
+        batch_results : List[FinancialData | PromisesResolutionContext]
+            results of the batch
+        lookup : _CacheLookup, optional
+            what was found in the cache for the batch, by default nothing
+        """
+        self.cache_lookups[lookup] += 1
+        self._waiting[i_batch] = batch_results
+        while self._i_next in self._waiting:
+            for result in self._waiting.pop(self._i_next):
+                if isinstance(result, PromisesResolutionContext):
+                    self.promises_resolution_map |= result
+                else:
+                    self.results.append(result)
+            self._i_next += 1
+        logger.info(_("%i relevant rows found so far"), len(self.results))
+        if self.done and self.pdf_digest is not None:
+            hits = self.cache_lookups[_CacheLookup.RESULTS]
+            logger.info(
+                _("Cache: %i hits, %i misses (%i replayed from the stored blocks)"),
+                hits,
+                self.n_batches - hits,
+                self.cache_lookups[_CacheLookup.BLOCKS],
+            )
+
+    def cleanup(self):
+        """Remove the document if it is a temporary copy"""
+        if self._temporary:
+            self.pdf_path.unlink(missing_ok=True)
+            self._temporary = False
+
+    def output(self, targets: TargetSet) -> Tuple[pd.DataFrame, PdfFormats, str]:
+        """Resolve the promises and format the results of the job
+
+        Parameters
+        ----------
+        targets : TargetSet
+            relevant companies to extract from the report
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, PdfFormats, str]
+            results, format of the document and prefix of the output of the job
+        """
+        flat_promises_map = flatten_promise_map(self.promises_resolution_map)
+        dict_results = []
+        error_msg = _("ERROR, SOMETHING WENT WRONG!!!!")
+        for result in self.results:
+            if result is not None:
+                result.fulfill_promises(flat_promises_map, targets)
+                dict_results.append(result.to_dict())
+            else:
+                dict_results.append(
+                    Equity(
+                        page=9999,
+                        targets=[error_msg],
+                        company=error_msg,
+                        subfund=None,
+                        nominal_quantity=None,
+                        market_value=None,
+                        perc_net_assets=0.0,
+                        currency=Currency.EUR,
+                    ).to_dict()
+                )
+
+        df = pd.DataFrame(dict_results)
+        return df, self.format_pdf, self.prefix_out
+
+
+def _job_pipeline_batch(
+    task: Tuple[int, int, Optional[str], tuple],
+) -> Tuple[
+    int, int, Optional[List[FinancialData | PromisesResolutionContext]], _CacheLookup
+]:
+    """Execute `pipeline_batch` returning also the job and the batch it belongs to,
+    used to assign to the right job the results collected as soon as they are ready.
+    When the process has a cache, the results are looked up in it before executing
+    `pipeline_batch`, then the blocks extracted by `filter_batch`, and both are
+    stored in it after. If the pages have to be extracted but the document was not
+    fetched (see `_Job.fetch`) no results are returned (`None`).
+
+    Parameters
+    ----------
+    task : Tuple[int, int, Optional[str], tuple]
+        index of the job, index of the batch in the job, ``sha256`` of the document
+        (`None` if the cache is not used) and arguments of `pipeline_batch`
+
+    Returns
+    -------
+    Tuple[int, int, Optional[List[FinancialData | PromisesResolutionContext]], _CacheLookup]
+        index of the job, index of the batch, its results (`None` if the document
+        is needed) and what was found in the cache
+    """
+    i_job, i_batch, pdf_digest, args = task
+    if _worker_cache is None or pdf_digest is None:
+        return i_job, i_batch, pipeline_batch(*args), _CacheLookup.MISS
+    pdf_path, start_page, end_page, n_pages, module_name = args
+    results = _worker_cache.get(pdf_digest, start_page, end_page, module_name)
+    if results is not None:
+        return i_job, i_batch, results, _CacheLookup.RESULTS
+    lookup = _CacheLookup.BLOCKS
+    stored_blocks = _worker_cache.get_blocks(
+        pdf_digest, start_page, end_page, module_name
+    )
+    if stored_blocks is None:
+        if pdf_path is None:
+            return i_job, i_batch, None, _CacheLookup.MISS
+        lookup = _CacheLookup.MISS
+        pdf_blocks = filter_batch(pdf_path, start_page, end_page, n_pages, module_name)
+        _worker_cache.put_blocks(
+            pdf_digest, start_page, end_page, module_name, pdf_blocks
+        )
+        blocks_digest = format_digest(module_name)
+    else:
+        blocks_digest, pdf_blocks = stored_blocks
+    results = deserialize_batch(pdf_blocks, start_page, end_page, module_name)
+    # Results of blocks extracted by another version of the format (`FROM_BLOCKS`)
+    # are not results of the current version
+    if blocks_digest == format_digest(module_name):
+        _worker_cache.put(pdf_digest, start_page, end_page, module_name, results)
+    return i_job, i_batch, results, lookup
+
+
+def _run_jobs(
+    configs: List[dict],
+    n_workers: int,
+    cache_dir: Optional[Path] = None,
+    from_blocks: bool = False,
+) -> List[Tuple[pd.DataFrame, PdfFormats, str]]:
+    """Process a list of reports, sharing the workers between all of them
+    at the granularity of batches of pages (handed to the first free worker).
+    Jobs are prepared (downloading the report if needed) in this thread while
+    the batches of the previous jobs are processed, at most `JOBS_AHEAD` at a
+    time, and each job is finalized as soon as all its batches are done. With a
+    cache, the reports stored in it are fetched only when a batch is not in it,
+    and the batch is submitted again.
+
+    Parameters
+    ----------
+    configs : List[dict]
+        configuration of each job
+    n_workers : int
+        number of processes to use
+    cache_dir : Optional[Path], optional
+        directory of the cache of the results of the batches of pages,
+        by default no cache
+    from_blocks : bool, optional
+        if the blocks stored in the cache are used even if the format
+        changed since they were extracted, by default `False`
+
+    Returns
+    -------
+    List[Tuple[pd.DataFrame, PdfFormats, str]]
+        results, format of the document and prefix of the output of each job
+    """
     targets = get_targets()
     logger.debug(_("First 5 targets: %s"), str(targets[: min(5, len(targets))]))
-    n_pages = len(pdf_file_xml)
-    batch_size = (n_pages + n_workers - 1) // n_workers
-    batches = []
-    for i in range(n_workers):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, n_pages)
-        batch_pages = pdf_file_xml[start_idx:end_idx]
-        batches.append((batch_pages, start_idx + 1, n_pages, targets, format_pdf.name))
-
-    results_batches = None
-    if n_workers > 1:
-        stderr_log.setFormatter(STANDARD_LOG_FORMATTER_MP)
-        with Pool(processes=n_workers) as pool:
-            results_batches = pool.starmap(pipeline_batch, batches)
-        stderr_log.setFormatter(STANDARD_LOG_FORMATTER)
-    else:
-        results_batches = [pipeline_batch(*batches[0])]
-    promises_resolution_map = {}
-    results = []
-    for batch in results_batches:
-        for result in batch:
-            if isinstance(result, PromisesResolutionContext):
-                promises_resolution_map |= result
-            else:
-                results.append(result)
-
-    flat_promises_map = flatten_promise_map(promises_resolution_map)
-    dict_results = []
-    error_msg = _("ERROR, SOMETHING WENT WRONG!!!!")
-    for result in results:
-        if result is not None:
-            result.fulfill_promises(flat_promises_map, targets)
-            dict_results.append(result.to_dict())
+    cache = None
+    if cache_dir is not None:
+        cache = PageCache(cache_dir, targets, from_blocks)
+    jobs = []
+    outputs = [None] * len(configs)
+    results_batches = SimpleQueue()
+    n_pending = 0
+    workers = None
+
+    def submit(i_job: int, i_batch: int, args: tuple):
+        nonlocal n_pending
+        task = (i_job, i_batch, jobs[i_job].pdf_digest, args)
+        n_pending += 1
+        if workers is None:
+            results_batches.put(_job_pipeline_batch(task))
         else:
-            dict_results.append(
-                Equity(
-                    page=9999,
-                    targets=[error_msg],
-                    company=error_msg,
-                    subfund=None,
-                    nominal_quantity=None,
-                    market_value=None,
-                    perc_net_assets=0.0,
-                    currency=Currency.EUR,
-                ).to_dict()
+            workers.apply_async(
+                _job_pipeline_batch,
+                (task,),
+                callback=results_batches.put,
+                error_callback=results_batches.put,
             )
 
-    df = pd.DataFrame(dict_results)
-    return df, format_pdf, prefix_out
+    def collect():
+        nonlocal n_pending
+        batch_results = results_batches.get()
+        n_pending -= 1
+        if isinstance(batch_results, BaseException):
+            raise batch_results
+        i_job, i_batch, batch_results, lookup = batch_results
+        job = jobs[i_job]
+        if batch_results is None:  # the pages are not in the cache
+            job.fetch()
+            submit(i_job, i_batch, next(islice(job.batches(), i_batch, None)))
+            return
+        job.collect(i_batch, batch_results, lookup)
+        if job.done:
+            job.cleanup()
+            outputs[i_job] = job.output(targets)
+
+    def run(pool: Optional[Pool]):
+        nonlocal workers
+        workers = pool
+        for i_job, config in enumerate(configs):
+            while sum(not job.done for job in jobs) >= JOBS_AHEAD:
+                collect()
+            jobs.append(_Job(config, cache))
+            for i_batch, args in enumerate(jobs[i_job].batches()):
+                submit(i_job, i_batch, args)
+        while n_pending > 0:
+            collect()
+
+    _init_worker(targets, cache)
+    try:
+        if n_workers > 1:
+            stderr_log.setFormatter(STANDARD_LOG_FORMATTER_MP)
+            with Pool(n_workers, _init_worker, (targets, cache)) as pool:
+                run(pool)
+            stderr_log.setFormatter(STANDARD_LOG_FORMATTER)
+        else:
+            run(None)
+    finally:
+        for job in jobs:
+            job.cleanup()
+    for i_job, job in enumerate(jobs):
+        if outputs[i_job] is None:  # document without pages
+            outputs[i_job] = job.output(targets)
+    return outputs
 
 
 def main(config):
@@ -332,19 +937,13 @@ def main(config):
         decode the pdf, so it raises this exception
     """
     n_workers = config["N_WORKERS"] if config["N_WORKERS"] > 0 else os.cpu_count()
-    results = None
     if config["BATCH"] is None:
-        results = [_main_job(config, n_workers)]
+        config_jobs = [config]
     else:
         config_jobs = batch_job_confs(config)
-        args = [(c, 1) for c in config_jobs]
-        if n_workers > 1:
-            stderr_log.setFormatter(STANDARD_LOG_FORMATTER_MP)
-            with Pool(n_workers) as p:
-                results = p.starmap(_main_job, args)
-            stderr_log.setFormatter(STANDARD_LOG_FORMATTER)
-        else:
-            results = [_main_job(*args[0])]
+    results = _run_jobs(
+        config_jobs, n_workers, config["CACHE_DIR"], config["FROM_BLOCKS"]
+    )
 
     _output_file(config, results)
 
@@ -0,0 +1,288 @@
+"""Native representation of the text of a pdf page.
+
+The page is built straight from the ``dict`` text extraction of PyMuPDF, so that
+the pipeline does not have to serialize each page to ``xml`` and parse it back.
+Only what the `pdf_filter` functions use is kept: the lines of the page with their
+text, bounding box and the runs of text (font name and size) they are made of,
+the same information found in the ``line`` and ``font`` elements of the ``xml``.
+"""
+
+import re
+from typing import List, Tuple, Optional, Set
+import pymupdf as pypdf
+from pymupdf import mupdf
+
+SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+"""Tag prepended to the name of subset fonts (e.g. ``ABCDEF+Helvetica``), not present
+in the font names of the extracted text"""
+
+
+def _xml_float(value: float) -> float:
+    """Round a number as MuPDF does when writing the ``xml`` rappresentation of
+    the page, so that the geometry of the lines (and every decision taken on it)
+    does not depend on the rappresentation used
+
+    Parameters
+    ----------
+    value : float
+        number to round
+
+    Returns
+    -------
+    float
+        rounded number
+    """
+    return float(mupdf.fz_format_double("%g", value))
+
+
+class PdfLine:
+    """Line of text of a pdf page
+
+    Attributes
+    ----------
+    bbox : Tuple[float, float, float, float]
+        bounding box of the line as (x0, y0, x1, y1)
+    text : str
+        text of the line
+    fonts : Tuple[str, ...]
+        font names of the consecutive runs of text of the line
+    sizes : Tuple[float, ...]
+        text sizes of the consecutive runs of text of the line
+    """
+
+    __slots__ = ("bbox", "text", "fonts", "sizes")
+
+    def __init__(
+        self,
+        bbox: Tuple[float, float, float, float],
+        text: str,
+        fonts: Tuple[str, ...],
+        sizes: Tuple[float, ...],
+    ):
+        """Initialize the line
+
+        Parameters
+        ----------
+        bbox : Tuple[float, float, float, float]
+            bounding box of the line as (x0, y0, x1, y1)
+        text : str
+            text of the line
+        fonts : Tuple[str, ...]
+            font names of the consecutive runs of text of the line
+        sizes : Tuple[float, ...]
+            text sizes of the consecutive runs of text of the line
+        """
+        self.bbox = bbox
+        self.text = text
+        self.fonts = fonts
+        self.sizes = sizes
+
+    @classmethod
+    def from_dict(cls, line: dict) -> "PdfLine":
+        """Build the line from its PyMuPDF ``dict`` rappresentation. Consecutive spans
+        with the same font and size are merged in a single run, as in the ``xml``
+        rappresentation (spans are split also on other char properties), and
+        numbers are rounded as in the ``xml``
+
+        Parameters
+        ----------
+        line : dict
+            line as found in the ``dict`` text extraction of PyMuPDF
+
+        Returns
+        -------
+        PdfLine
+            the line
+        """
+        text = ""
+        fonts = []
+        sizes = []
+        for span in line["spans"]:
+            if span["text"] == "":
+                continue
+            text += span["text"]
+            size = _xml_float(span["size"])
+            if len(fonts) > 0 and fonts[-1] == span["font"] and sizes[-1] == size:
+                continue
+            fonts.append(span["font"])
+            sizes.append(size)
+        bbox = tuple(_xml_float(c) for c in line["bbox"])
+        return cls(bbox, text, tuple(fonts), tuple(sizes))
+
+    def __repr__(self) -> str:
+        return f"PdfLine({self.bbox!r}, {self.text!r}, {self.fonts!r}, {self.sizes!r})"
+
+
+class PdfPage:
+    """Text of a pdf page, as a list of lines in reading order
+
+    Attributes
+    ----------
+    lines : List[PdfLine]
+        lines of the page
+    """
+
+    __slots__ = ("lines",)
+
+    def __init__(self, lines: List[PdfLine]):
+        """Initialize the page
+
+        Parameters
+        ----------
+        lines : List[PdfLine]
+            lines of the page
+        """
+        self.lines = lines
+
+    @classmethod
+    def from_pymupdf(
+        cls, page: pypdf.Page, textpage: Optional[pypdf.TextPage] = None
+    ) -> "PdfPage":
+        """Extract the text of a PyMuPDF page, with the same options used for
+        its ``xml`` rappresentation
+
+        Parameters
+        ----------
+        page : pymupdf.Page
+            page to extract
+        textpage : Optional[pymupdf.TextPage], optional
+            text page of `page` already built with :py:func:`get_textpage`,
+            by default built here
+
+        Returns
+        -------
+        PdfPage
+            the page
+        """
+        quad_corrections = pypdf.TOOLS.unset_quad_corrections()
+        pypdf.TOOLS.unset_quad_corrections(True)
+        try:
+            if textpage is None:
+                textpage = get_textpage(page)
+            text_dict = textpage.extractDICT()
+        finally:
+            pypdf.TOOLS.unset_quad_corrections(quad_corrections)
+        lines = [
+            PdfLine.from_dict(line)
+            for block in text_dict["blocks"]
+            if block["type"] == 0
+            for line in block["lines"]
+        ]
+        return cls(lines)
+
+
+def get_textpage(
+    page: pypdf.Page, y_band: Optional[Tuple[Optional[float], Optional[float]]] = None
+) -> pypdf.TextPage:
+    """Build the PyMuPDF text page of a page with the options used for its ``xml``
+    rappresentation. The same text page can be used first for a cheap look at the
+    plain text of the page (`extractText`) and then for :py:meth:`PdfPage.from_pymupdf`
+
+    Parameters
+    ----------
+    page : pymupdf.Page
+        page to extract
+    y_band : Optional[Tuple[Optional[float], Optional[float]]], optional
+        vertical band (top, bottom) of the page to extract, `None` edges stand for
+        the edges of the page, by default the whole page
+
+    Returns
+    -------
+    pymupdf.TextPage
+        the text page
+    """
+    clip = None
+    if y_band is not None:
+        top, bottom = y_band
+        clip = pypdf.Rect(page.rect)
+        if top is not None:
+            clip.y0 = max(clip.y0, top)
+        if bottom is not None:
+            clip.y1 = min(clip.y1, bottom)
+    return page.get_textpage(clip=clip, flags=pypdf.TEXTFLAGS_XML)
+
+
+def page_lines(blk: PdfPage | PdfLine) -> List[PdfLine]:
+    """Return the lines contained in a native page or line
+
+    Parameters
+    ----------
+    blk : PdfPage | PdfLine
+        page or single line
+
+    Returns
+    -------
+    List[PdfLine]
+        lines of the page, or the line itself
+    """
+    if isinstance(blk, PdfLine):
+        return [blk]
+    return blk.lines
+
+
+class FontInventory:
+    """Names of the fonts used by the pages of a document, read from the font
+    resources of the pages without extracting any text
+
+    Parameters
+    ----------
+    document : pymupdf.Document
+        document to inspect
+    """
+
+    def __init__(self, document: pypdf.Document):
+        """Initialize the inventory of a document
+
+        Parameters
+        ----------
+        document : pymupdf.Document
+            document to inspect
+        """
+        self._document = document
+        self._names = {}
+
+    def page_fonts(self, i_page: int) -> Optional[Set[str]]:
+        """Return the names of the fonts used by a page, as they appear in
+        the extracted text
+
+        Parameters
+        ----------
+        i_page : int
+            page (0-based index)
+
+        Returns
+        -------
+        Optional[Set[str]]
+            font names, `None` if they cannot be known from the resources of the
+            page (Type3 fonts or fonts without name)
+        """
+        fonts = set()
+        for xref, _, font_type, basefont, *_ in self._document.get_page_fonts(i_page):
+            if font_type == "Type3" or basefont == "":
+                return None
+            if xref not in self._names:
+                self._names[xref] = SUBSET_PREFIX.sub("", basefont)
+            fonts.add(self._names[xref])
+        return fonts
+
+
+def font_in_page(font: str, page_fonts: Set[str]) -> bool:
+    """Check if a font (as named in the extracted text) is among the ones of a page
+    given by :py:meth:`FontInventory.page_fonts`. Names that are one the prefix of
+    the other are considered matching, as MuPDF can truncate long font names
+
+    Parameters
+    ----------
+    font : str
+        font to search
+    page_fonts : Set[str]
+        fonts of the page
+
+    Returns
+    -------
+    bool
+        if the font is used by the page
+    """
+    if font in page_fonts:
+        return True
+    return any(f.startswith(font) or font.startswith(f) for f in page_fonts)
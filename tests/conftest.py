@@ -52,4 +52,6 @@ conf = {
     "CONFIG_FILE": None,
     "PREFIX_OUT": None,
     "SEPARATE_OUT_FILES": None,
+    "CACHE_DIR": None,
+    "FROM_BLOCKS": False,
 }
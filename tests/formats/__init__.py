@@ -4,6 +4,7 @@ import dill
 import pandas as pd
 from lxml import etree
 import freeports_analysis as fra
+from freeports_analysis.pdf_page import PdfPage, FontInventory, get_textpage
 from ..conftest import data_dir, out_dir, xml_parser, targets, conf
 
 
@@ -11,18 +12,34 @@ def generic_test_pdf_filter(fmt, page):
     pdf = Document(data_dir / fmt / "report.pdf")
     xml_str = pdf[page].get_text("xml")
     xml_tree = etree.fromstring(xml_str.encode(), parser=xml_parser)
+    native_page = PdfPage.from_pymupdf(pdf[page])
     module = importlib.import_module(f"freeports_analysis.formats.{fmt.lower()}")
-    pdf_blks = []
-    for r in module.pdf_filter(xml_tree):
-        r.metadata["page"] = page
-        pdf_blks.append(r)
-    # with (data_dir / fmt / f"pdf_blks-{page}.pkl").open("wb") as f:
-    #     dill.dump(pdf_blks,f)
+    page_screen = getattr(module.pdf_filter, "page_screen", None)
+    if page_screen is not None:
+        assert page_screen(get_textpage(pdf[page]).extractText())
+    font_screen = getattr(module.pdf_filter, "font_screen", None)
+    if font_screen is not None:
+        page_fonts = FontInventory(pdf).page_fonts(page)
+        assert page_fonts is None or font_screen(page_fonts)
     reference_pdf_blks = None
     with (data_dir / fmt / f"pdf_blks-{page}.pkl").open("rb") as f:
         reference_pdf_blks = dill.load(f)
 
-    assert pdf_blks == reference_pdf_blks
+    trees = [xml_tree, native_page]
+    page_clip = getattr(module.pdf_filter, "page_clip", None)
+    if page_clip is not None:
+        textpage = get_textpage(pdf[page], tuple(page_clip))
+        trees.append(PdfPage.from_pymupdf(pdf[page], textpage))
+
+    for tree in trees:
+        pdf_blks = []
+        for r in module.pdf_filter(tree):
+            r.metadata["page"] = page
+            pdf_blks.append(r)
+        # with (data_dir / fmt / f"pdf_blks-{page}.pkl").open("wb") as f:
+        #     dill.dump(pdf_blks,f)
+
+        assert pdf_blks == reference_pdf_blks
 
 
 def generic_test_text_extract(fmt, page):
@@ -39,6 +56,8 @@ def generic_test_text_extract(fmt, page):
         reference_txt_blks = dill.load(f)
 
     assert txt_blks == reference_txt_blks
+    with (data_dir / fmt / f"pdf_blks-{page}.pkl").open("rb") as f:
+        assert pdf_blks == dill.load(f)
 
 
 def generic_test_deserialize(fmt, page):
@@ -0,0 +1,134 @@
+from .conftest import out_dir, data_dir, targets, conf
+import sys
+import shutil
+import pandas as pd
+import freeports_analysis as fra
+from freeports_analysis.cache import PageCache, file_digest
+
+
+def test_cache_roundtrip():
+    cache_dir = out_dir / "cache-roundtrip"
+    pdf_digest = file_digest(data_dir / "ARCA" / "report.pdf")
+    cache = PageCache(cache_dir, targets)
+    assert cache.get(pdf_digest, 0, 8, "ARCA") is None
+    cache.put(pdf_digest, 0, 8, "ARCA", ["result"])
+    assert cache.get(pdf_digest, 0, 8, "ARCA") == ["result"]
+    assert cache.get(pdf_digest, 8, 16, "ARCA") is None
+    assert cache.get(pdf_digest, 0, 8, "FIDEURAM") is None
+    assert PageCache(cache_dir, targets[1:]).get(pdf_digest, 0, 8, "ARCA") is None
+
+
+def test_cache_pipeline(caplog):
+    fmt = "ARCA"
+    cache_conf = conf | {
+        "PDF": data_dir / fmt / "report.pdf",
+        "FORMAT": fra.consts.PdfFormats.__members__[fmt],
+        "CACHE_DIR": out_dir / "cache-pipeline",
+    }
+    out_cold = out_dir / f"cache-cold-{fmt}.csv"
+    out_warm = out_dir / f"cache-warm-{fmt}.csv"
+    out_blocks = out_dir / f"cache-blocks-{fmt}.csv"
+    logger = fra.main.logger
+    logger.addHandler(caplog.handler)
+    level = logger.level
+    logger.setLevel("INFO")
+    try:
+        fra.main.main(cache_conf | {"OUT_CSV": out_cold})
+        assert "Cache: 0 hits, 7 misses (0 replayed" in caplog.text
+        caplog.clear()
+        fra.main.main(cache_conf | {"OUT_CSV": out_warm})
+        assert "Cache: 7 hits, 0 misses (0 replayed" in caplog.text
+        caplog.clear()
+        shutil.rmtree(cache_conf["CACHE_DIR"] / "pages")
+        fra.main.main(cache_conf | {"OUT_CSV": out_blocks, "FROM_BLOCKS": True})
+        assert "Cache: 0 hits, 7 misses (7 replayed" in caplog.text
+    finally:
+        logger.removeHandler(caplog.handler)
+        logger.setLevel(level)
+    pd.testing.assert_frame_equal(pd.read_csv(out_cold), pd.read_csv(out_warm))
+    pd.testing.assert_frame_equal(pd.read_csv(out_cold), pd.read_csv(out_blocks))
+
+
+class _Renamed:
+    pass
+
+
+def test_cache_stale_entry(caplog, monkeypatch):
+    cache_dir = out_dir / "cache-stale"
+    pdf_digest = file_digest(data_dir / "ARCA" / "report.pdf")
+    cache = PageCache(cache_dir, targets)
+    cache.put(pdf_digest, 0, 8, "ARCA", [_Renamed()])
+    # As read by a version of the code where the class has another name
+    monkeypatch.delattr(sys.modules[__name__], "_Renamed")
+    assert cache.get(pdf_digest, 0, 8, "ARCA") is None
+    assert "Ignoring unreadable cache entry" in caplog.text
+
+
+def test_cache_from_blocks_stale_format(monkeypatch):
+    fmt = "ARCA"
+    pdf = data_dir / fmt / "report.pdf"
+    cache_conf = conf | {
+        "PDF": pdf,
+        "FORMAT": fra.consts.PdfFormats.__members__[fmt],
+        "CACHE_DIR": out_dir / "cache-from-blocks-stale",
+    }
+    out_fresh = out_dir / f"cache-fresh-{fmt}.csv"
+    out_stale = out_dir / f"cache-stale-{fmt}.csv"
+    out_rerun = out_dir / f"cache-rerun-{fmt}.csv"
+    shutil.rmtree(cache_conf["CACHE_DIR"], ignore_errors=True)
+    fra.main.main(
+        conf | {"PDF": pdf, "FORMAT": cache_conf["FORMAT"], "OUT_CSV": out_fresh}
+    )
+    # Blocks extracted by an older version of the format, which found nothing
+    cache = PageCache(cache_conf["CACHE_DIR"], targets)
+    pdf_digest = file_digest(pdf)
+    with monkeypatch.context() as m:
+        m.setattr(fra.cache, "format_digest", lambda module_name: "older")
+        for start in range(0, 7 * 8, 8):
+            cache.put_blocks(pdf_digest, start, start + 8, fmt, [])
+    fra.main.main(cache_conf | {"OUT_CSV": out_stale, "FROM_BLOCKS": True})
+    assert not out_stale.read_text().strip()
+    # The results replayed from stale blocks are not reused by a normal run
+    fra.main.main(cache_conf | {"OUT_CSV": out_rerun})
+    pd.testing.assert_frame_equal(pd.read_csv(out_fresh), pd.read_csv(out_rerun))
+
+
+def test_cache_document_not_fetched(caplog, monkeypatch):
+    fmt = "ARCA"
+    cache_conf = conf | {
+        "PDF": data_dir / fmt / "report.pdf",
+        "FORMAT": fra.consts.PdfFormats.__members__[fmt],
+        "CACHE_DIR": out_dir / "cache-document",
+    }
+    out_cold = out_dir / f"cache-document-cold-{fmt}.csv"
+    out_warm = out_dir / f"cache-document-warm-{fmt}.csv"
+    out_lost = out_dir / f"cache-document-lost-{fmt}.csv"
+    shutil.rmtree(cache_conf["CACHE_DIR"], ignore_errors=True)
+    fra.main.main(cache_conf | {"OUT_CSV": out_cold})
+    get_document = fra.main._get_document
+    fetched = []
+
+    def recording_get_document(config):
+        fetched.append(config["PDF"])
+        return get_document(config)
+
+    monkeypatch.setattr(fra.main, "_get_document", recording_get_document)
+    fra.main.main(cache_conf | {"OUT_CSV": out_warm})
+    assert fetched == []
+    # A batch lost from the cache requires the document
+    pdf_digest = file_digest(cache_conf["PDF"])
+    shutil.rmtree(cache_conf["CACHE_DIR"] / "pages")
+    (cache_conf["CACHE_DIR"] / "blocks" / pdf_digest / fmt / "8-16.pickle").unlink()
+    logger = fra.main.logger
+    logger.addHandler(caplog.handler)
+    level = logger.level
+    logger.setLevel("INFO")
+    try:
+        fra.main.main(cache_conf | {"OUT_CSV": out_lost, "N_WORKERS": 2})
+        assert "Cache: 0 hits, 7 misses (6 replayed" in caplog.text
+    finally:
+        logger.removeHandler(caplog.handler)
+        logger.setLevel(level)
+    assert fetched == [cache_conf["PDF"]]
+    pd.testing.assert_frame_equal(pd.read_csv(out_cold), pd.read_csv(out_warm))
+    pd.testing.assert_frame_equal(pd.read_csv(out_cold), pd.read_csv(out_lost))
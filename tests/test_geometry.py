@@ -0,0 +1,196 @@
+import random
+import numpy as np
+from pymupdf import Document
+from freeports_analysis.formats import pdf_filter_exec
+from freeports_analysis.formats import fideuram
+from freeports_analysis.pdf_page import PdfPage, PdfLine
+from freeports_analysis.formats_utils.pdf_filter import standard_pdf_filtering
+from freeports_analysis.formats_utils.pdf_filter.line_index import LineIndex
+from freeports_analysis.formats_utils.pdf_filter.pdf_parts import (
+    ExtractedPdfLine,
+    ExtractedPdfLines,
+)
+from freeports_analysis.formats_utils.pdf_filter.pdf_parts.position import (
+    XRange,
+    YRange,
+)
+from freeports_analysis.formats_utils.pdf_filter.select_position import (
+    ColumnLayouts,
+    TablePosAlgorithm,
+    TablePosMeasureUnit,
+    _count_below,
+    get_table_positions,
+    select_inside,
+    select_outside,
+)
+from .conftest import data_dir
+
+
+def _reference_table_positions(lines, algorithm_flags, tolerance, tolerance_mu):
+    """Line by line version of `get_table_positions`"""
+    return_col = TablePosAlgorithm.ROW not in algorithm_flags
+    choose = max if TablePosAlgorithm.BIG_RULE in algorithm_flags else min
+    ruler_area = TablePosAlgorithm.RULER_AREA in algorithm_flags
+    intersection = ruler_area and TablePosAlgorithm.TEST_POS not in algorithm_flags
+    geometry = []
+    for line in lines:
+        area = line.geometry
+        bounds = tuple(area.x_bounds if return_col else area.y_bounds)
+        size = area.width if return_col else area.height
+        tol = {
+            TablePosMeasureUnit.PT: tolerance,
+            TablePosMeasureUnit.PERC: tolerance * area.width
+            if return_col
+            else area.height,
+            TablePosMeasureUnit.EM: tolerance * line.text_size,
+        }[tolerance_mu]
+        geometry.append((size, area.c[0 if return_col else 1], bounds, tol))
+    indexes = [None] * len(lines)
+    rulers = []
+    while None in indexes:
+        unindexed = [(i, g[0]) for i, g in enumerate(geometry) if indexes[i] is None]
+        ruler = geometry[choose(unindexed, key=lambda x: x[1])[0]]
+        rulers.append((len(rulers), ruler[1]))
+        for i, (_, pos, (lo, hi), tol) in enumerate(geometry):
+            if indexes[i] is not None:
+                continue
+            r_lo, r_hi = ruler[2]
+            if intersection:
+                match = r_lo - tol <= hi <= r_hi + tol or r_lo - tol <= lo <= r_hi + tol
+            elif ruler_area:
+                match = r_lo - tol <= pos <= r_hi + tol
+            else:
+                match = lo - tol <= ruler[1] <= hi + tol
+            if match:
+                indexes[i] = rulers[-1][0]
+    mapping = {
+        old: new for new, (old, _) in enumerate(sorted(rulers, key=lambda x: x[1]))
+    }
+    return [mapping[i] for i in indexes]
+
+
+def _random_lines(rng, n):
+    lines = []
+    for i in range(n):
+        x0 = rng.choice([50, 120, 300, 420]) + rng.uniform(-20, 20)
+        y0 = 100 + 12 * (i // 4) + rng.uniform(-2, 2)
+        x1 = x0 + rng.uniform(5, 150)
+        pdf_line = PdfLine((x0, y0, x1, y0 + 9), str(i), ("F",), (rng.choice([7, 9]),))
+        lines.append(ExtractedPdfLine(pdf_line))
+    return lines
+
+
+def _grid_lines(rng, n):
+    lines = []
+    for i in range(n):
+        x0, y0 = rng.randint(0, 1000) * 0.1, rng.randint(0, 1000) * 0.1
+        x1, y1 = x0 + rng.randint(0, 300) * 0.1, y0 + rng.randint(0, 100) * 0.1
+        pdf_line = PdfLine((x0, y0, x1, y1), str(i), ("F",), (1 / 3,))
+        lines.append(ExtractedPdfLine(pdf_line))
+    return lines
+
+
+def _column_lines(rng, n, shift=0):
+    lines = []
+    for i in range(n):
+        x0 = [40, 200, 300, 380][i % 4] + shift * (i % 4 == 2) + rng.uniform(0, 4)
+        x1 = x0 + [120, 60, 50, 50][i % 4] * rng.uniform(0.3, 1)
+        pdf_line = PdfLine((x0, 10 * i, x1, 10 * i + 8), str(i), ("F",), (8,))
+        lines.append(ExtractedPdfLine(pdf_line))
+    return ExtractedPdfLines.from_lines(lines)
+
+
+def test_select_range():
+    rng = random.Random(0)
+    lines = _random_lines(rng, 60)
+    arrays = ExtractedPdfLines.from_lines(lines)
+    for bounds in [XRange(100, 300), YRange(None, 150), YRange(130.5, None)]:
+        coord = 0 if isinstance(bounds, XRange) else 1
+        inside = [ln for ln in lines if ln.c[coord] in bounds]
+        assert select_inside(lines, bounds) == inside
+        assert select_inside(arrays, bounds).xml_blks == [ln.xml_blk for ln in inside]
+        outside = select_outside(arrays, bounds)
+        assert len(outside) + len(inside) == len(lines)
+        assert [ln.xml_blk for ln in select_outside(lines, bounds)] == outside.xml_blks
+    line, view = lines[7], arrays[7]
+    assert (view.corners, view.font, view.text_size, view.text) == (
+        line.corners,
+        line.font,
+        line.text_size,
+        line.text,
+    )
+    assert arrays[-1].xml_blk is lines[-1].xml_blk
+
+
+def test_table_positions():
+    rng = random.Random(0)
+    pdf = Document(data_dir / "FIDEURAM" / "report.pdf")
+    index = LineIndex(PdfPage.from_pymupdf(pdf[33]))
+    tables = [
+        _random_lines(rng, 40),
+        _grid_lines(rng, 40),
+        ExtractedPdfLines.from_index(index, index.with_fonts(["Arial"])),
+    ]
+    for lines in tables:
+        for flags in range(16):
+            algorithm_flags = TablePosAlgorithm(flags)
+            for tolerance, tolerance_mu in [
+                (0, TablePosMeasureUnit.EM),
+                (0.5, TablePosMeasureUnit.EM),
+                (3, TablePosMeasureUnit.PT),
+                (0.1, TablePosMeasureUnit.PT),
+                (0.1, TablePosMeasureUnit.PERC),
+            ]:
+                assert get_table_positions(
+                    lines, algorithm_flags, tolerance, tolerance_mu
+                ) == _reference_table_positions(
+                    list(lines), algorithm_flags, tolerance, tolerance_mu
+                )
+
+
+def test_count_below_rounding():
+    values = np.array([0.0, 0.1, 0.1, 0.2])
+    shifts, limits = np.array([0.7, 0.7]), np.array([0.1 + 0.7, 0.2])
+    # 0.1 + 0.7 <= 0.1 + 0.7 but 0.1 > (0.1 + 0.7) - 0.7
+    assert _count_below(values, shifts, limits, strict=False).tolist() == [3, 0]
+    assert _count_below(values, shifts, limits, strict=True).tolist() == [1, 0]
+    assert _count_below(values, -shifts, limits, strict=False).tolist() == [4, 4]
+
+
+def test_column_layouts():
+    pdf = Document(data_dir / "FIDEURAM" / "report.pdf")
+    plan = fideuram.pdf_filter.plan
+    learning_filter = standard_pdf_filtering(
+        plan.header_txt,
+        plan.header_font,
+        YRange(None, 82),
+        "Arial-Bold",
+        list(plan.body_fonts),
+        y_range=(plan.y_top, plan.y_bottom),
+        deselection_list=list(plan.deselection),
+        learn_columns=2,
+    )(lambda _: {})
+    layouts = learning_filter.column_layouts
+    for start in range(0, len(pdf), 8):
+        pages = [PdfPage.from_pymupdf(page) for page in pdf.pages(start, start + 8)]
+        assert pdf_filter_exec(
+            pages, start, len(pdf), learning_filter
+        ) == pdf_filter_exec(pages, start, len(pdf), fideuram.pdf_filter)
+    assert layouts.hits > 0
+    pdf_filter_exec([PdfPage.from_pymupdf(pdf[33])], 33, len(pdf), learning_filter)
+    assert len(layouts._layouts) > 0
+    pdf_filter_exec([], 0, 1, learning_filter)
+    assert len(layouts._layouts) == 0
+
+    rng = random.Random(0)
+    pages = [_column_lines(rng, 40) for _ in range(4)]
+    layouts = ColumnLayouts(2)
+    for lines in pages:
+        assert layouts.table_positions(None, lines) == get_table_positions(lines)
+    assert layouts.hits == 2
+    moved = _column_lines(rng, 40, shift=30)
+    assert layouts.table_positions(None, moved) == get_table_positions(moved)
+    assert layouts.misses == 1
+    layouts.clear()
+    assert layouts.table_positions(None, pages[0]) == get_table_positions(pages[0])
+    assert layouts.hits == 2
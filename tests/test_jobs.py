@@ -0,0 +1,30 @@
+import threading
+import pandas as pd
+import freeports_analysis as fra
+from .conftest import data_dir, out_dir, conf
+
+
+def test_run_jobs_lookahead(monkeypatch):
+    job_conf = conf | {
+        "PDF": data_dir / "ARCA" / "report.pdf",
+        "FORMAT": fra.consts.PdfFormats.ARCA,
+        "OUT_CSV": out_dir / "jobs-ARCA.csv",
+    }
+    open_jobs = []
+    max_open = 0
+
+    class RecordingJob(fra.main._Job):
+        def __init__(self, config, cache=None):
+            nonlocal max_open
+            assert threading.current_thread() is threading.main_thread()
+            super().__init__(config, cache)
+            open_jobs.append(self)
+            max_open = max(max_open, sum(not job.done for job in open_jobs))
+
+    monkeypatch.setattr(fra.main, "_Job", RecordingJob)
+    for n_workers in [1, 2]:
+        open_jobs.clear()
+        outputs = fra.main._run_jobs([job_conf] * 4, n_workers)
+        assert len(outputs) == 4 and max_open <= fra.main.JOBS_AHEAD
+        for df, _, _ in outputs[1:]:
+            pd.testing.assert_frame_equal(df, outputs[0][0])
@@ -0,0 +1,229 @@
+import pickle
+import random
+from .conftest import targets
+from freeports_analysis.formats import PdfBlock, TextBlock
+from freeports_analysis.pdf_page import PdfLine
+from freeports_analysis.formats_utils import normalize_string
+from freeports_analysis.formats_utils.text_extract import (
+    _matching_targets,
+    standard_text_extraction_loop,
+)
+from freeports_analysis.formats_utils.text_extract.match import (
+    AllOf,
+    FuzzyMatch,
+    PrefixMatch,
+    TargetAutomaton,
+    TargetSet,
+    compile_index,
+    target_fuzzy_match,
+    target_match,
+    target_prefix_match,
+)
+
+
+def _brute_force(automaton_targets, text):
+    return [
+        i
+        for i, target in enumerate(automaton_targets)
+        if target.strip() != "" and target_match(text, target)
+    ]
+
+
+def test_automaton_overlapping_targets():
+    words = ["he", "she", "his", "hers", "", "  ", "S  He"]
+    automaton = TargetAutomaton(words)
+    for text in ["ushers", "this", "Ahishers", "h", "", "s he", "SHE\nhe"]:
+        assert automaton.matches(text) == _brute_force(words, text)
+
+
+def test_automaton_targets():
+    rng = random.Random(0)
+    automaton = TargetAutomaton(targets)
+    for _ in range(200):
+        text = " ".join(
+            rng.choice(targets)[: rng.randint(1, 30)] for _ in range(rng.randint(1, 4))
+        )
+        text = "".join(c.upper() if rng.random() < 0.3 else c for c in text)
+        assert automaton.matches(text) == _brute_force(targets, text)
+
+
+def _noisy_texts(n):
+    rng = random.Random(0)
+    texts = []
+    for _ in range(n):
+        text = rng.choice(targets)
+        for _ in range(rng.randint(0, 6)):
+            i = rng.randint(0, len(text))
+            text = text[:i] + rng.choice("abcxyz .") + text[i + rng.randint(0, 2) :]
+        texts.append(text)
+    return texts
+
+
+def test_fuzzy_screen():
+    texts = _noisy_texts(300)
+    for fuzzy_match in [FuzzyMatch(0.8), AllOf(PrefixMatch(0.3), FuzzyMatch(0.65))]:
+        candidates = fuzzy_match.screen(texts, targets)
+        n_matches = 0
+        for text in texts:
+            expected = [i for i, t in enumerate(targets) if fuzzy_match(text, t)]
+            screened = [
+                i
+                for i in candidates[normalize_string(text)]
+                if fuzzy_match(text, targets[i])
+            ]
+            assert screened == expected
+            n_matches += len(expected)
+        assert n_matches > 0
+
+
+def test_composite_matcher():
+    rng = random.Random(0)
+    matcher = pickle.loads(pickle.dumps(AllOf(FuzzyMatch(0.65), PrefixMatch(0.3))))
+    assert [type(m) for m in matcher.matchers] == [PrefixMatch, FuzzyMatch]
+    n_matches = 0
+    for _ in range(300):
+        text = rng.choice(targets)[rng.randint(0, 3) :] + rng.choice(["", " S.p.A."])
+        target = rng.choice(targets)
+        expected = target_prefix_match(text, target, 0.3) and target_fuzzy_match(
+            text, target, 0.65
+        )
+        assert matcher(text, target) == expected
+        n_matches += expected
+    assert n_matches > 0
+    prefix, fuzzy = matcher.matchers
+    assert matcher.hits == n_matches and matcher.hits + matcher.rejects == 300
+    assert prefix.hits + prefix.rejects == 300
+    assert fuzzy.hits == n_matches and fuzzy.hits + fuzzy.rejects == prefix.hits
+    assert matcher.counters()[repr(fuzzy)] == (fuzzy.hits, fuzzy.rejects)
+
+
+def test_fuzzy_index_screen():
+    texts = _noisy_texts(300)
+    exact = FuzzyMatch(0.8).screen(texts, targets)
+    index = compile_index(tuple(targets))
+    for text, i_targets in exact.items():
+        assert set(i_targets) <= set(index.candidates(text, 0, 0.8))
+    fuzzy_match = FuzzyMatch(0.8, min_overlap=0.5, index_from=0, audit=True)
+    candidates = fuzzy_match.screen(texts, targets)
+    assert fuzzy_match.pruned > 0
+    n_matches = 0
+    for text in set(normalize_string(t) for t in texts):
+        expected = {targets[i] for i in exact[text] if fuzzy_match(text, targets[i])}
+        screened = {
+            targets[i] for i in candidates[text] if fuzzy_match(text, targets[i])
+        }
+        missed = {normalize_string(t) for m, t in fuzzy_match.missed if m == text}
+        assert screened <= expected
+        assert {normalize_string(t) for t in expected - screened} == missed
+        n_matches += len(screened)
+    assert n_matches > 0
+
+
+def test_target_set_aliases():
+    target_set = TargetSet(
+        ["Alstom", "Airbnb", "Leonardo"],
+        {"Airbnb": ["Air BnB Inc"], "Leonardo": ["Finmeccanica", "Leonardo"]},
+    )
+    target_set = pickle.loads(pickle.dumps(target_set))
+    assert "Airbnb" in target_set and "Air BnB Inc" not in target_set
+    assert list(target_set) == ["Alstom", "Airbnb", "Leonardo"]
+    assert target_set.index("Airbnb") == 1 and target_set.count("Leonardo") == 1
+    lines = ["x", "AIR  bnb inc.", "y", "Finmeccanica SpA", "Leonardo", "Alstom"]
+    pdf_blocks = [
+        PdfBlock(None, {"table-col": i}, PdfLine((0, 0, 1, 1), line, (), ()))
+        for i, line in enumerate(lines)
+    ]
+    for match_func in [target_match, FuzzyMatch(0.6)]:
+        matching_targets = _matching_targets(match_func, target_set, pdf_blocks)
+        assert [list(matching_targets(i, line)) for i, line in enumerate(lines)] == [
+            [],
+            ["Airbnb"],
+            [],
+            ["Leonardo"],
+            ["Leonardo"],
+            ["Alstom"],
+        ]
+
+
+def test_target_set_codes():
+    target_set = TargetSet(
+        ["Alstom", "Airbnb", "Leonardo"],
+        codes={"Airbnb": ["US0090661010"], "Alstom": ["FR0010220475"]},
+    )
+    target_set = pickle.loads(pickle.dumps(target_set))
+    lines = [
+        "US0090661010 Class A shares",
+        "IT0000000001 Alstom SA",
+        "IT0003856405 Leonardo SpA",
+        "Alstom SA 0.25% 2026",
+        "FR0010220475 US0090661010",
+    ]
+    # One row per line
+    pdf_blocks = [
+        PdfBlock(None, {"table-col": 0}, PdfLine((0, 0, 1, 1), line, (), ()))
+        for line in lines
+    ]
+    matching_targets = _matching_targets(target_match, target_set, pdf_blocks)
+    assert [list(matching_targets(i, line)) for i, line in enumerate(lines)] == [
+        ["Airbnb"],
+        [],
+        ["Leonardo"],
+        ["Alstom"],
+        ["Alstom", "Airbnb"],
+    ]
+
+
+def test_target_set_code_column():
+    target_set = TargetSet(
+        ["Alstom", "Airbnb", "Leonardo"],
+        codes={"Airbnb": ["US0090661010"], "Alstom": ["FR0010220475"]},
+    )
+    rows = [
+        ["100", "Airbnb Inc Class A", "US0090661010", "1.000,00", "0,10%"],
+        ["200", "Alstom SA", "IT0000000001", "2.000,00", "0,20%"],
+        ["300", "Leonardo SpA", "IT0003856405", "3.000,00", "0,30%"],
+        ["400", "Alstom Holdings", "FR0010220475", "4.000,00", "0,40%"],
+        ["500", "Alstom SA 0.25% 2026", "5.000,00", "0,50%"],
+    ]
+    pdf_blocks = [
+        PdfBlock(None, {"table-col": col}, PdfLine((0, 0, 1, 1), cell, (), ()))
+        for row in rows
+        for col, cell in enumerate(row)
+    ]
+    matching_targets = _matching_targets(target_match, target_set, pdf_blocks)
+    matches = [
+        (blk.content.strip(), target)
+        for i, blk in enumerate(pdf_blocks)
+        for target in matching_targets(i, blk.content)
+    ]
+    assert matches == [
+        ("Airbnb Inc Class A", "Airbnb"),
+        ("Leonardo SpA", "Leonardo"),
+        ("Alstom Holdings", "Alstom"),
+        ("Alstom SA 0.25% 2026", "Alstom"),
+    ]
+
+    @standard_text_extraction_loop()
+    def text_extract(pdf_blocks, i):
+        return TextBlock(
+            None, {"quantity": pdf_blocks[i - 1].content.strip()}, pdf_blocks[i]
+        )
+
+    text_blocks = text_extract(pdf_blocks, target_set)
+    assert [
+        (blk.metadata["company"], blk.metadata["quantity"]) for blk in text_blocks
+    ] == [("Airbnb", "100"), ("Leonardo", "300"), ("Alstom", "400"), ("Alstom", "500")]
+
+
+def test_custom_match_func_raw_targets():
+    target_set = TargetSet(["Alstom S.A.", "  "], {"Alstom S.A.": ["ALSTOM"]})
+    compared = []
+
+    def match_func(text, target):
+        compared.append(target)
+        return text == target
+
+    pdf_blocks = [PdfBlock(None, {"table-col": 0}, PdfLine((0, 0, 1, 1), "x", (), ()))]
+    matching_targets = _matching_targets(match_func, target_set, pdf_blocks)
+    assert list(matching_targets(0, "ALSTOM")) == ["Alstom S.A."]
+    assert compared == ["Alstom S.A.", "ALSTOM"]
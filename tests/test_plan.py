@@ -0,0 +1,63 @@
+import pytest
+from freeports_analysis.consts import Currency
+from freeports_analysis.formats.fideuram import pdf_filter
+from freeports_analysis.formats_utils.pdf_filter import (
+    compile_filter_plan,
+    standard_pdf_filtering,
+    YRange,
+)
+from freeports_analysis.formats_utils.pdf_filter.select_position import (
+    TablePosAlgorithm,
+)
+from freeports_analysis.formats_utils.text_extract import (
+    compile_extraction_plan,
+    standard_text_extraction,
+)
+
+
+def test_filter_plan():
+    plan = compile_filter_plan(
+        "Header",
+        "Bold",
+        ["Body", "BodyItalic"],
+        y_range=(100, ("Total", "Bold")),
+        deselection_list=[["Total", "Bold"]],
+        algorithm_flags=[False, True, True],
+    )
+    assert plan.body_fonts == {"Body", "BodyItalic"}
+    assert plan.deselection == {("Total", "Bold")}
+    assert plan.y_top == 100 and plan.y_bottom == ("Total", "Bold")
+    assert plan.algorithm == TablePosAlgorithm.BIG_RULE | TablePosAlgorithm.RULER_AREA
+    assert pdf_filter.plan.body_fonts == {"Arial"}
+    assert pdf_filter.plan.learn_columns == 0 and pdf_filter.column_layouts is None
+    with pytest.raises(ValueError):
+        compile_filter_plan("Header", "Bold", [])
+    with pytest.raises(ValueError):
+        compile_filter_plan("Header", "Bold", "Body", y_range=(100, "Total"))
+    with pytest.raises(ValueError):
+        compile_filter_plan("Header", "Bold", "Body", algorithm_flags=[False] * 5)
+    with pytest.raises(ValueError):
+        compile_filter_plan(
+            "Header", "Bold", "Body", algorithm_flags=[True], learn_columns=2
+        )
+    with pytest.raises(ValueError):
+        compile_filter_plan("Header", "Bold", "Body", learn_columns=-1)
+    with pytest.raises(ValueError):
+        standard_pdf_filtering(
+            "Header", "Bold", YRange(0, 10), "Bold", "Body", y_range=(1, 2, 3)
+        )
+
+
+def test_extraction_plan():
+    plan = compile_extraction_plan(-1, +1, +2, Currency.EUR, +3)
+    assert plan.fields == (
+        ("quantity", -1),
+        ("market value", 1),
+        ("% net assets", 2),
+        ("currency", "EUR"),
+        ("acquisition cost", 3),
+    )
+    with pytest.raises(ValueError):
+        standard_text_extraction(0, 1, 2)
+    with pytest.raises(ValueError):
+        standard_text_extraction(1, 1, 2)
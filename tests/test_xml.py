@@ -0,0 +1,79 @@
+import pickle
+from lxml import etree
+from pymupdf import Document
+from freeports_analysis.formats import PdfBlock
+from freeports_analysis.pdf_page import PdfPage
+from freeports_analysis.formats_utils.pdf_filter.line_index import LineIndex
+from freeports_analysis.formats_utils.pdf_filter.xml.font import (
+    get_lines_with_font,
+    get_lines_with_txt_font,
+    is_present_txt_font,
+)
+from freeports_analysis.formats_utils.pdf_filter.pdf_parts import ExtractedPdfLine
+from .conftest import data_dir, xml_parser
+
+
+def test_xml_font_queries():
+    page = etree.fromstring(
+        """<page>
+        <line bbox="0 0 100 10" text="Investors' holdings"><font name="Bold" size="9"/></line>
+        <line bbox="0 10 100 20" text="Alstom"><font name="Body" size="7"/></line>
+        <line bbox="0 20 100 30" text="Airbnb"><font name="Body-It" size="7"/></line>
+        </page>"""
+    )
+    assert is_present_txt_font(page, "Investors' holdings", "Bold")
+    assert not is_present_txt_font(page, "Investors' holdings", "Body")
+    assert get_lines_with_txt_font(page, "Alstom", "Body").get("text") == "Alstom"
+    assert [ln.get("text") for ln in get_lines_with_font(page, "Body")] == ["Alstom"]
+    lines = get_lines_with_font(page, {"Body-It", "Body", "Bold"})
+    assert [ln.get("text") for ln in lines] == [
+        "Investors' holdings",
+        "Alstom",
+        "Airbnb",
+    ]
+    line = ExtractedPdfLine(lines[2])
+    assert (line.font, line.text_size, line.text) == ("Body-It", 7.0, "Airbnb")
+
+
+def test_line_index():
+    pdf = Document(data_dir / "FIDEURAM" / "report.pdf")
+    xml_tree = etree.fromstring(pdf[33].get_text("xml").encode(), parser=xml_parser)
+    for page in [xml_tree, PdfPage.from_pymupdf(pdf[33])]:
+        index = LineIndex(page)
+        for font in [*index.by_font, "Missing", ["Arial", "Arial-Bold"]]:
+            assert get_lines_with_font(index, font) == get_lines_with_font(page, font)
+        for txt, font in [("Description", "Arial"), ("EUR", "Arial"), ("x", "y")]:
+            assert get_lines_with_txt_font(index, txt, font, True) == (
+                get_lines_with_txt_font(page, txt, font, True)
+            )
+        for i in range(len(index)):
+            indexed, line = (
+                ExtractedPdfLine.from_index(index, i),
+                ExtractedPdfLine(index.lines[i]),
+            )
+            assert (indexed.corners, indexed.font, indexed.text_size) == (
+                line.corners,
+                line.font,
+                line.text_size,
+            )
+            assert indexed.text == line.text
+        deselection = {(index.texts[3], index.fonts[3][0]), ("x", "Arial")}
+        assert 3 in index.deselected(deselection)
+
+
+def test_lazy_pdf_block_content():
+    page = etree.fromstring(
+        """<page>
+        <line text="Alstom"><font><char c="A"/><char c="l"/></font></line>
+        <line text="(\ufffdVaR\ufffd)"><font><char c="("/><char c="V"/><char c=")"/></font></line>
+        <line><font><char c="E"/><char/><char c="U"/></font></line>
+        </page>"""
+    )
+    lines = page.findall("line")
+    blk = PdfBlock(None, {"table-col": 0}, lines[0])
+    assert blk._content is None and blk.content == "Alstom\n"
+    assert PdfBlock(None, {}, page).content == "Alstom\n(V)\nEU\n"
+    assert PdfBlock(None, {}, lines[1:]).content == "(V)\nEU\n"
+    unpickled = pickle.loads(pickle.dumps(PdfBlock(None, {"page": 1}, lines[2])))
+    assert unpickled == PdfBlock(None, {"page": 1}, lines[2])
+    assert unpickled.content == "EU\n"